@@ -1,16 +1,44 @@
+import asyncio
 import os
 import sqlite3
+import threading
+import time
+from collections import deque
 from dataclasses import dataclass
-from typing import Any, Optional, Protocol, Sequence
+from typing import Any, Callable, Dict, Optional, Protocol, Sequence
 
 DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.db")
 
+
+def _env_int(key: str, default: int) -> int:
+    try:
+        return int(os.getenv(key, str(default)))
+    except Exception:
+        return default
+
+
+# Connection pool tuning (per worker process)
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 10)                                  # max idle connections kept
+DB_POOL_IDLE_TIMEOUT = _env_int("DB_POOL_IDLE_TIMEOUT", 300)                 # seconds before an idle conn is reaped
+DB_POOL_HEALTHCHECK_INTERVAL = _env_int("DB_POOL_HEALTHCHECK_INTERVAL", 30)  # re-check conns idle longer than this
+DB_POOL_MAX_SIZE = _env_int("DB_POOL_MAX_SIZE", 40)                          # max open conns (idle + in use) per pool
+DB_POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 5)                             # seconds to wait for a conn once at max
+
+
+class PoolExhausted(RuntimeError):
+    """Every connection the pool may open is in use; the API answers 503."""
+
 def _get_database_url() -> Optional[str]:
     return os.getenv("DATABASE_URL") or os.getenv("SUPABASE_DB_URL")
 
 def _is_postgres_url(url: str) -> bool:
     return url.startswith("postgres://") or url.startswith("postgresql://")
 
+def get_postgres_url() -> Optional[str]:
+    """The configured Postgres URL, or None when running on SQLite."""
+    url = _get_database_url()
+    return url if url and _is_postgres_url(url) else None
+
 def _translate_sqlite_to_postgres_query(query: str) -> str:
     q = query
     # SQLite convenience -> Postgres equivalent
@@ -42,6 +70,12 @@ class CompatCursor:
             self._cursor.execute(query, params)
         return self
 
+    def executemany(self, query: str, seq_of_params: Sequence[Sequence[Any]]):
+        if self._translate_query:
+            query = _translate_sqlite_to_postgres_query(query)
+        self._cursor.executemany(query, seq_of_params)
+        return self
+
     def fetchone(self):
         return self._cursor.fetchone()
 
@@ -58,11 +92,21 @@ class CompatCursor:
     def lastrowid(self) -> Optional[int]:
         return getattr(self._cursor, "lastrowid", None)
 
+    @property
+    def rowcount(self) -> int:
+        return getattr(self._cursor, "rowcount", -1)
+
 
 @dataclass
 class CompatConnection:
     _conn: Any
     _is_postgres: bool
+    _pool: Optional["_ConnectionPool"] = None
+
+    @property
+    def is_postgres(self) -> bool:
+        """Whether this is a Postgres connection (else SQLite), for dialect-specific SQL."""
+        return self._is_postgres
 
     def cursor(self) -> CompatCursor:
         return CompatCursor(self._conn.cursor(), self._is_postgres)
@@ -75,6 +119,9 @@ class CompatConnection:
         cur = self._conn.execute(query, params or ())
         return CompatCursor(cur, False)
 
+    def executemany(self, query: str, seq_of_params: Sequence[Sequence[Any]]) -> CompatCursor:
+        return CompatCursor(self._conn.cursor(), self._is_postgres).executemany(query, seq_of_params)
+
     def commit(self):
         return self._conn.commit()
 
@@ -82,7 +129,119 @@ class CompatConnection:
         return self._conn.rollback()
 
     def close(self):
-        return self._conn.close()
+        if self._pool is None:
+            return self._conn.close()
+        # Pooled: hand the raw connection back instead of closing it.
+        # Idempotent, so handlers that close in both except and finally are safe.
+        if self._conn is None:
+            return None
+        raw, self._conn = self._conn, None
+        self._pool.release(raw)
+
+
+async def _invoke(offload: bool, fn, *args):
+    """Await a psycopg async method, or run a blocking sqlite3 call in a worker thread."""
+    if offload:
+        return await asyncio.to_thread(fn, *args)
+    return await fn(*args)
+
+
+@dataclass
+class AsyncCompatCursor:
+    """Awaitable CompatCursor: same `?` translation, same row objects."""
+    _cursor: Any
+    _translate_query: bool
+    _offload: bool
+
+    async def execute(self, query: str, params: Sequence[Any] | None = None):
+        if self._translate_query:
+            query = _translate_sqlite_to_postgres_query(query)
+        if params is None:
+            await _invoke(self._offload, self._cursor.execute, query)
+        else:
+            await _invoke(self._offload, self._cursor.execute, query, params)
+        return self
+
+    async def fetchone(self):
+        return await _invoke(self._offload, self._cursor.fetchone)
+
+    async def fetchall(self):
+        return await _invoke(self._offload, self._cursor.fetchall)
+
+    async def close(self):
+        try:
+            await _invoke(self._offload, self._cursor.close)
+        except Exception:
+            pass
+
+    @property
+    def lastrowid(self) -> Optional[int]:
+        return getattr(self._cursor, "lastrowid", None)
+
+    @property
+    def rowcount(self) -> int:
+        return getattr(self._cursor, "rowcount", -1)
+
+
+@dataclass
+class AsyncCompatConnection:
+    """
+    Async twin of CompatConnection for `async def` handlers.
+
+    Postgres uses psycopg's AsyncConnection; SQLite runs each blocking call
+    in a worker thread, so a slow query never stalls the event loop.
+    """
+    _conn: Any
+    _is_postgres: bool
+    _pool: Any = None
+
+    @property
+    def is_postgres(self) -> bool:
+        """Whether this is a Postgres connection (else SQLite), for dialect-specific SQL."""
+        return self._is_postgres
+
+    def cursor(self) -> AsyncCompatCursor:
+        return AsyncCompatCursor(self._conn.cursor(), self._is_postgres, not self._is_postgres)
+
+    async def execute(self, query: str, params: Sequence[Any] | None = None) -> AsyncCompatCursor:
+        if self._is_postgres:
+            return await self.cursor().execute(query, params)
+        cur = await asyncio.to_thread(self._conn.execute, query, params or ())
+        return AsyncCompatCursor(cur, False, True)
+
+    async def fetchone(self, query: str, params: Sequence[Any] | None = None):
+        """Shorthand for `await (await conn.execute(q, p)).fetchone()`."""
+        cur = await self.execute(query, params)
+        return await cur.fetchone()
+
+    async def fetchall(self, query: str, params: Sequence[Any] | None = None):
+        """Shorthand for `await (await conn.execute(q, p)).fetchall()`."""
+        cur = await self.execute(query, params)
+        return await cur.fetchall()
+
+    async def commit(self):
+        return await _invoke(not self._is_postgres, self._conn.commit)
+
+    async def rollback(self):
+        return await _invoke(not self._is_postgres, self._conn.rollback)
+
+    async def close(self):
+        if self._conn is None:
+            return None
+        raw, self._conn = self._conn, None
+        if self._pool is None:
+            return await _invoke(not self._is_postgres, raw.close)
+        if self._is_postgres:
+            await self._pool.release(raw)
+        else:
+            # The sync pool may roll back or close the connection
+            await asyncio.to_thread(self._pool.release, raw)
+
+    async def __aenter__(self) -> "AsyncCompatConnection":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
 
 
 class _CompatRow(dict):
@@ -115,22 +274,569 @@ def _compat_row_factory(cursor):
     return make
 
 
+def _connect_postgres(database_url: str):
+    try:
+        import psycopg  # noqa: F401
+    except Exception as e:
+        raise RuntimeError(
+            "Postgres configured via DATABASE_URL/SUPABASE_DB_URL, but psycopg is not installed."
+        ) from e
+
+    # prepare_threshold=None: pooled connections live long enough for psycopg's
+    # auto-prepare to kick in, which breaks behind Supabase's transaction pooler.
+    return psycopg.connect(
+        database_url,
+        row_factory=_compat_row_factory,
+        connect_timeout=10,
+        prepare_threshold=None,
+    )
+
+
+def _connect_sqlite(path: str):
+    # check_same_thread=False: a pooled connection may be borrowed from a
+    # different thread than the one that opened it (the pool guarantees
+    # only one borrower at a time).
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class _PoolBase:
+    """
+    Bookkeeping shared by the sync and async pools: the idle stack, counters
+    and the lock guarding them. The lock is only ever held for list/counter
+    updates, never across driver I/O.
+
+    When no idle connection is available a new one is opened, up to
+    `max_size` open at once; a connection returned while `max_idle` are
+    already parked is closed instead. At `max_size`, borrowers off the event
+    loop (worker threads, async pool users) wait up to `timeout` seconds for
+    one to come back; a sync borrow on the event loop thread can't wait
+    without stalling the worker, so it fails at once. Either way the
+    failure is PoolExhausted.
+
+    Idle connections are re-validated with `SELECT 1` when they have been
+    parked longer than `healthcheck_interval`, and closed once they have been
+    idle for `idle_timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        is_postgres: bool,
+        max_idle: int = DB_POOL_SIZE,
+        idle_timeout: float = DB_POOL_IDLE_TIMEOUT,
+        healthcheck_interval: float = DB_POOL_HEALTHCHECK_INTERVAL,
+        max_size: int = DB_POOL_MAX_SIZE,
+        timeout: float = DB_POOL_TIMEOUT,
+    ):
+        self._connect = connect
+        self.is_postgres = is_postgres
+        self.max_idle = max(max_idle, 0)
+        self.idle_timeout = idle_timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._idle: deque = deque()  # (raw_conn, released_at) — oldest on the left
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._returned = threading.Condition(self._lock)  # a conn was parked or closed
+        self._in_use = 0
+        self._open = 0  # idle + in use + being opened
+        self._counters = {
+            "opened": 0,
+            "reused": 0,
+            "closed": 0,
+            "reaped": 0,
+            "healthcheck_failures": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "exhausted": 0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "postgres" if self.is_postgres else "sqlite",
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "open": self._open,
+                "max_idle": self.max_idle,
+                "max_size": self.max_size,
+                "idle_timeout": self.idle_timeout,
+                **self._counters,
+            }
+
+    def _pop_idle(self):
+        """Take the most recently parked connection (LIFO keeps hot conns warm)."""
+        with self._lock:
+            return self._idle.pop() if self._idle else None
+
+    def _reserve(self) -> bool:
+        """Claim a slot for a new connection. False when max_size are already open."""
+        with self._lock:
+            if self._open >= self.max_size:
+                return False
+            self._open += 1
+            return True
+
+    def _unreserve(self):
+        """Give back a slot whose connect() failed."""
+        with self._lock:
+            self._open = max(self._open - 1, 0)
+            self._returned.notify()
+
+    def _exhausted(self) -> "PoolExhausted":
+        with self._lock:
+            return self._exhausted_locked()
+
+    def _exhausted_locked(self) -> "PoolExhausted":
+        self._counters["exhausted"] += 1
+        return PoolExhausted(f"all {self.max_size} database connections are in use")
+
+    def _needs_healthcheck(self, released_at: float) -> bool:
+        return time.monotonic() - released_at >= self.healthcheck_interval
+
+    def _mark_checkout(self, reused: bool):
+        with self._lock:
+            self._counters["reused" if reused else "opened"] += 1
+            self._counters["checkouts"] += 1
+            self._in_use += 1
+
+    def _mark_unhealthy(self):
+        with self._lock:
+            self._counters["healthcheck_failures"] += 1
+
+    def _park(self, raw, reusable: bool) -> bool:
+        """Return raw to the idle stack. False means the caller must close it."""
+        with self._lock:
+            self._in_use = max(self._in_use - 1, 0)
+            if reusable and len(self._idle) < self.max_idle:
+                self._idle.append((raw, time.monotonic()))
+                self._returned.notify()
+                return True
+        return False
+
+    def _expire_idle(self) -> list:
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = []
+        with self._lock:
+            while self._idle and self._idle[0][1] <= cutoff:
+                expired.append(self._idle.popleft()[0])
+            self._counters["reaped"] += len(expired)
+        return expired
+
+    def _drain_idle(self) -> list:
+        with self._lock:
+            idle = [raw for raw, _ in self._idle]
+            self._idle.clear()
+        return idle
+
+    def _mark_closed(self):
+        with self._lock:
+            self._counters["closed"] += 1
+            self._open = max(self._open - 1, 0)
+            self._returned.notify()
+
+
+class _ConnectionPool(_PoolBase):
+    """Per-process pool of blocking sqlite3/psycopg connections behind get_db_connection()."""
+
+    def acquire(self):
+        self.reap_idle()
+        deadline = None
+        while True:
+            item = self._pop_idle()
+            if item is None:
+                if self._reserve():
+                    break
+                if deadline is None:
+                    deadline = time.monotonic() + (0 if _on_event_loop() else self.timeout)
+                    with self._lock:
+                        self._counters["waits"] += 1
+                with self._lock:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._exhausted_locked()
+                    self._returned.wait(remaining)
+                continue
+            raw, released_at = item
+            if self._needs_healthcheck(released_at) and not self._is_healthy(raw):
+                self._mark_unhealthy()
+                self._close_raw(raw)
+                continue
+            self._mark_checkout(reused=True)
+            return raw
+
+        try:
+            raw = self._connect()
+        except BaseException:
+            self._unreserve()
+            raise
+        self._mark_checkout(reused=False)
+        return raw
+
+    def release(self, raw):
+        if not self._park(raw, self._reset(raw)):
+            self._close_raw(raw)
+
+    def reap_idle(self) -> int:
+        """Close connections that have sat idle longer than idle_timeout."""
+        expired = self._expire_idle()
+        for raw in expired:
+            self._close_raw(raw)
+        return len(expired)
+
+    def close_all(self):
+        for raw in self._drain_idle():
+            self._close_raw(raw)
+
+    def _reset(self, raw) -> bool:
+        """Roll back anything the borrower left open. Returns False if the conn is unusable."""
+        try:
+            if self.is_postgres:
+                from psycopg.pq import TransactionStatus
+
+                if raw.closed or raw.broken:
+                    return False
+                status = raw.info.transaction_status
+                if status == TransactionStatus.UNKNOWN:
+                    return False
+                if status != TransactionStatus.IDLE:
+                    raw.rollback()
+            elif raw.in_transaction:
+                raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _is_healthy(self, raw) -> bool:
+        try:
+            if self.is_postgres and raw.closed:
+                return False
+            raw.execute("SELECT 1").fetchone()
+            if self.is_postgres:
+                raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _close_raw(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        self._mark_closed()
+
+
+class _AsyncConnectionPool(_PoolBase):
+    """Pool of psycopg AsyncConnections behind get_async_db_connection() (Postgres only)."""
+
+    async def acquire(self):
+        await self.reap_idle()
+        deadline = None
+        while True:
+            item = self._pop_idle()
+            if item is None:
+                if self._reserve():
+                    break
+                if deadline is None:
+                    deadline = time.monotonic() + self.timeout
+                    with self._lock:
+                        self._counters["waits"] += 1
+                if time.monotonic() >= deadline:
+                    raise self._exhausted()
+                # Releases happen on this loop, so poll rather than block on the condition
+                await asyncio.sleep(0.01)
+                continue
+            raw, released_at = item
+            if self._needs_healthcheck(released_at) and not await self._is_healthy(raw):
+                self._mark_unhealthy()
+                await self._close_raw(raw)
+                continue
+            self._mark_checkout(reused=True)
+            return raw
+
+        try:
+            raw = await self._connect()
+        except BaseException:
+            self._unreserve()
+            raise
+        self._mark_checkout(reused=False)
+        return raw
+
+    async def release(self, raw):
+        if not self._park(raw, await self._reset(raw)):
+            await self._close_raw(raw)
+
+    async def reap_idle(self) -> int:
+        expired = self._expire_idle()
+        for raw in expired:
+            await self._close_raw(raw)
+        return len(expired)
+
+    async def close_all(self):
+        for raw in self._drain_idle():
+            await self._close_raw(raw)
+
+    def abandon(self):
+        """Close idle connections without awaiting: the loop they belong to is gone or elsewhere."""
+        for raw in self._drain_idle():
+            try:
+                raw.pgconn.finish()
+            except Exception:
+                pass
+            self._mark_closed()
+
+    async def _reset(self, raw) -> bool:
+        try:
+            from psycopg.pq import TransactionStatus
+
+            if raw.closed or raw.broken:
+                return False
+            status = raw.info.transaction_status
+            if status == TransactionStatus.UNKNOWN:
+                return False
+            if status != TransactionStatus.IDLE:
+                await raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    async def _is_healthy(self, raw) -> bool:
+        try:
+            if raw.closed:
+                return False
+            cur = await raw.execute("SELECT 1")
+            await cur.fetchone()
+            await raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    async def _close_raw(self, raw):
+        try:
+            await raw.close()
+        except Exception:
+            pass
+        self._mark_closed()
+
+
+_pool: Optional[_ConnectionPool] = None
+_pool_key: Optional[tuple] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> _ConnectionPool:
+    """Return this process's pool, rebuilding it after a fork or a DB target change."""
+    global _pool, _pool_key
+    database_url = _get_database_url()
+    is_postgres = bool(database_url and _is_postgres_url(database_url))
+    key = (os.getpid(), database_url if is_postgres else DB_PATH)
+
+    pool = _pool
+    if pool is not None and _pool_key == key:
+        return pool
+
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            # Connections inherited across a fork belong to the parent — drop, don't close.
+            if _pool is not None and _pool_key and _pool_key[0] == os.getpid():
+                _pool.close_all()
+            if is_postgres:
+                connect = lambda: _connect_postgres(database_url)  # noqa: E731
+            else:
+                path = DB_PATH
+                connect = lambda: _connect_sqlite(path)  # noqa: E731
+            _pool = _ConnectionPool(connect, is_postgres)
+            _pool_key = key
+        return _pool
+
+
 def get_db_connection() -> CompatConnection:
+    """Borrow a connection from the per-process pool. close() returns it."""
+    pool = _get_pool()
+    return CompatConnection(pool.acquire(), pool.is_postgres, pool)
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Pool metrics for the current worker (empty until the first connection)."""
+    pool = _pool
+    if pool is None or not _pool_key or _pool_key[0] != os.getpid():
+        return {}
+    return pool.stats()
+
+
+def close_pool():
+    """Close every idle pooled connection (called on shutdown)."""
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None and _pool_key and _pool_key[0] == os.getpid():
+            _pool.close_all()
+        _pool = None
+        _pool_key = None
+
+async def _connect_postgres_async(database_url: str):
+    try:
+        import psycopg  # noqa: F401
+    except Exception as e:
+        raise RuntimeError(
+            "Postgres configured via DATABASE_URL/SUPABASE_DB_URL, but psycopg is not installed."
+        ) from e
+
+    return await psycopg.AsyncConnection.connect(
+        database_url,
+        row_factory=_compat_row_factory,
+        connect_timeout=10,
+        prepare_threshold=None,
+    )
+
+
+_async_pool: Optional[_AsyncConnectionPool] = None
+_async_pool_key: Optional[tuple] = None
+
+
+def _get_async_pool(database_url: str) -> _AsyncConnectionPool:
+    """AsyncConnections are tied to the loop that opened them, so the pool is too."""
+    global _async_pool, _async_pool_key
+    key = (os.getpid(), database_url, id(asyncio.get_running_loop()))
+    if _async_pool is None or _async_pool_key != key:
+        # Same process, other loop: its idle connections can't be reused here, so close them
+        if _async_pool is not None and _async_pool_key and _async_pool_key[0] == os.getpid():
+            _async_pool.abandon()
+        _async_pool = _AsyncConnectionPool(lambda: _connect_postgres_async(database_url), True)
+        _async_pool_key = key
+    return _async_pool
+
+
+async def get_async_db_connection() -> AsyncCompatConnection:
+    """
+    Borrow a connection for use from `async def` code. Always `await conn.close()`.
+
+    SQLite shares the sync pool (its calls are offloaded to threads);
+    Postgres gets its own pool of psycopg AsyncConnections.
+    """
     database_url = _get_database_url()
     if database_url and _is_postgres_url(database_url):
-        try:
-            import psycopg  # noqa: F401
-        except Exception as e:
-            raise RuntimeError(
-                "Postgres configured via DATABASE_URL/SUPABASE_DB_URL, but psycopg is not installed."
-            ) from e
+        pool = _get_async_pool(database_url)
+        return AsyncCompatConnection(await pool.acquire(), True, pool)
+    pool = _get_pool()
+    # acquire() may open a connection, health-check or reap: keep it off the loop
+    return AsyncCompatConnection(await asyncio.to_thread(pool.acquire), False, pool)
 
-        conn = psycopg.connect(database_url, row_factory=_compat_row_factory, connect_timeout=10)
-        return CompatConnection(conn, True)
 
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return CompatConnection(conn, False)
+def get_async_pool_stats() -> Dict[str, Any]:
+    pool = _async_pool
+    if pool is None or not _async_pool_key or _async_pool_key[0] != os.getpid():
+        return {}
+    return pool.stats()
+
+
+async def close_async_pool():
+    global _async_pool, _async_pool_key
+    pool, key = _async_pool, _async_pool_key
+    _async_pool = None
+    _async_pool_key = None
+    if pool is not None and key and key[0] == os.getpid():
+        await pool.close_all()
+
+
+def _backfill_post_counters(c):
+    """Seed post_counters from `interactions` the first time the table is empty."""
+    if c.execute("SELECT 1 FROM post_counters LIMIT 1").fetchone():
+        return
+    c.execute("""
+        INSERT OR IGNORE INTO post_counters (post_cid, likes, dislikes, views)
+        SELECT post_cid,
+               SUM(CASE WHEN type = 'like' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN type = 'dislike' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN type = 'view' THEN 1 ELSE 0 END)
+        FROM interactions
+        WHERE post_cid IS NOT NULL
+        GROUP BY post_cid
+    """)
+
+
+# A message's parties for the `conversations` summary: chat (/api/chat) rows
+# carry uuid7s, /api/messages rows carry peer ids. A pair is stored once as
+# (peer_a, peer_b) with peer_a <= peer_b; unread_a counts messages peer_a has
+# received and not read, unread_b the same for peer_b.
+def _message_parties(row: str) -> tuple:
+    sender = f"COALESCE({row}.sender_uuid7, {row}.sender_peer_id)"
+    receiver = f"COALESCE({row}.receiver_uuid7, {row}.receiver_peer_id)"
+    unread = f"COALESCE({row}.is_read, 0) = 0"
+    return sender, receiver, f"({receiver} <= {sender} AND {unread})", f"({receiver} > {sender} AND {unread})"
+
+
+def _backfill_conversations(c, is_postgres: bool):
+    """Seed `conversations` from `messages` the first time the table is empty."""
+    if c.execute("SELECT 1 FROM conversations LIMIT 1").fetchone():
+        return
+    least, greatest = ("LEAST", "GREATEST") if is_postgres else ("min", "max")
+    c.execute(f"""
+        INSERT INTO conversations
+            (peer_a, peer_b, last_message, last_sender, last_timestamp, message_count, unread_a, unread_b)
+        SELECT a, b, text, s, timestamp, n, ua, ub FROM (
+            SELECT a, b, text, s, timestamp,
+                   ROW_NUMBER() OVER (PARTITION BY a, b ORDER BY timestamp DESC, id DESC) AS rn,
+                   COUNT(*) OVER (PARTITION BY a, b) AS n,
+                   SUM(CASE WHEN r <= s AND unread THEN 1 ELSE 0 END) OVER (PARTITION BY a, b) AS ua,
+                   SUM(CASE WHEN r > s AND unread THEN 1 ELSE 0 END) OVER (PARTITION BY a, b) AS ub
+            FROM (
+                SELECT id, text, timestamp, s, r, {least}(s, r) AS a, {greatest}(s, r) AS b,
+                       COALESCE(is_read, 0) = 0 AS unread
+                FROM (
+                    SELECT id, text, timestamp, is_read,
+                           COALESCE(sender_uuid7, sender_peer_id) AS s,
+                           COALESCE(receiver_uuid7, receiver_peer_id) AS r
+                    FROM messages
+                ) m
+                WHERE s IS NOT NULL AND r IS NOT NULL
+            ) pairs
+        ) ranked
+        WHERE rn = 1
+    """)
+
+
+def _create_fts_index(c, table: str, columns: list):
+    """FTS5 table `<table>_fts` over `columns` of `table`, plus sync triggers; built once from existing rows."""
+    fts = f"{table}_fts"
+    existed = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)).fetchone()
+    cols = ", ".join(columns)
+    new_vals = ", ".join(f"new.{col}" for col in columns)
+    old_vals = ", ".join(f"old.{col}" for col in columns)
+    c.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {cols}, content='{table}', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        );
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts} (rowid, {cols}) VALUES (new.rowid, {new_vals});
+        END;
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old_vals});
+        END;
+    """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old_vals});
+            INSERT INTO {fts} (rowid, {cols}) VALUES (new.rowid, {new_vals});
+        END;
+    """)
+    if not existed:
+        c.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild');")
+
 
 def init_db():
     conn = get_db_connection()
@@ -170,6 +876,8 @@ def _init_db_inner(conn: CompatConnection):
         c.execute("CREATE INDEX IF NOT EXISTS idx_posts_description ON posts(description);")
         c.execute("CREATE INDEX IF NOT EXISTS idx_posts_peer_id ON posts(peer_id);")
         c.execute("CREATE INDEX IF NOT EXISTS idx_posts_timestamp ON posts(timestamp);")
+        # Keyset pages sort NULL timestamps as '' (oldest) so every row has a place
+        c.execute("CREATE INDEX IF NOT EXISTS idx_posts_keyset ON posts((COALESCE(timestamp, '')), id);")
         c.execute("CREATE INDEX IF NOT EXISTS idx_posts_peer_ts ON posts(peer_id, timestamp);")
 
         c.execute("""
@@ -204,6 +912,9 @@ def _init_db_inner(conn: CompatConnection):
 
         # Now safe to create indexes on columns guaranteed to exist
         c.execute("CREATE INDEX IF NOT EXISTS idx_users_uuid7 ON users(uuid7);")
+        # Prefix lookups for user autocomplete (utils/user_index.py SQL fallback)
+        for col in ("username", "handle", "uuid7"):
+            c.execute(f"CREATE INDEX IF NOT EXISTS idx_users_{col}_lower ON users(lower({col}));")
 
         c.execute("""
             CREATE TABLE IF NOT EXISTS connections (
@@ -261,6 +972,10 @@ def _init_db_inner(conn: CompatConnection):
         c.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages(sender_peer_id);")
         c.execute("CREATE INDEX IF NOT EXISTS idx_messages_receiver ON messages(receiver_peer_id);")
         c.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(sender_peer_id, receiver_peer_id, timestamp);")
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_messages_conversation_keyset
+            ON messages(sender_peer_id, receiver_peer_id, (COALESCE(timestamp, '')), id);
+        """)
 
         c.execute("""
             CREATE TABLE IF NOT EXISTS guardians (
@@ -316,6 +1031,9 @@ def _init_db_inner(conn: CompatConnection):
                 is_read INTEGER DEFAULT 0
             );
         """)
+        # Stream replay (Last-Event-ID) reads a user's notifications after an id
+        c.execute("CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user_peer_id, id);")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_notifications_user_time ON notifications(user_peer_id, timestamp);")
 
         c.execute("""
             CREATE TABLE IF NOT EXISTS discovered_peers (
@@ -328,6 +1046,144 @@ def _init_db_inner(conn: CompatConnection):
             );
         """)
 
+        # Materialized timeline: one row per (follower, followed peer's post),
+        # maintained from pubsub feed updates and local uploads so the
+        # aggregated feed is a single keyset query instead of a DAG fan-in.
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS timeline (
+                user_peer_id TEXT,
+                post_cid TEXT,
+                timestamp TEXT,
+                author_peer_id TEXT,
+                author_username TEXT,
+                payload TEXT,
+                PRIMARY KEY (user_peer_id, post_cid)
+            );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_timeline_user_ts ON timeline(user_peer_id, timestamp, post_cid);")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_timeline_author ON timeline(author_peer_id);")
+
+        # Published library is sharded by the last character of each post cid;
+        # triggers bump a shard's version on any change so the manifest
+        # publisher re-puts only shards whose version moved past the published one.
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS library_shards (
+                shard TEXT PRIMARY KEY,
+                version INTEGER DEFAULT 0,
+                published_version INTEGER DEFAULT 0,
+                digest TEXT,
+                cid TEXT,
+                post_count INTEGER DEFAULT 0
+            );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_posts_shard ON posts(lower(substr(id, length(id), 1)));")
+        for event, row in [("INSERT", "NEW"), ("UPDATE", "NEW"), ("UPDATE", "OLD"), ("DELETE", "OLD")]:
+            c.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_posts_shard_{event.lower()}_{row.lower()}
+                AFTER {event} ON posts
+                BEGIN
+                    INSERT INTO library_shards (shard, version)
+                    VALUES (lower(substr({row}.id, length({row}.id), 1)), 1)
+                    ON CONFLICT(shard) DO UPDATE SET version = version + 1;
+                END;
+            """)
+        c.execute("""
+            INSERT OR IGNORE INTO library_shards (shard, version)
+            SELECT DISTINCT lower(substr(id, length(id), 1)), 1 FROM posts WHERE id IS NOT NULL
+        """)
+
+        # Per-post like/dislike/view counters, kept in step with `interactions`
+        # by triggers so counts are a primary-key read. utils/counters.py
+        # reconciles them against a full recount.
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS post_counters (
+                post_cid TEXT PRIMARY KEY,
+                likes INTEGER DEFAULT 0,
+                dislikes INTEGER DEFAULT 0,
+                views INTEGER DEFAULT 0
+            );
+        """)
+        c.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_interactions_count_insert
+            AFTER INSERT ON interactions
+            WHEN NEW.post_cid IS NOT NULL
+            BEGIN
+                INSERT INTO post_counters (post_cid, likes, dislikes, views)
+                VALUES (NEW.post_cid, NEW.type = 'like', NEW.type = 'dislike', NEW.type = 'view')
+                ON CONFLICT(post_cid) DO UPDATE SET
+                    likes = likes + excluded.likes,
+                    dislikes = dislikes + excluded.dislikes,
+                    views = views + excluded.views;
+            END;
+        """)
+        c.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_interactions_count_delete
+            AFTER DELETE ON interactions
+            BEGIN
+                UPDATE post_counters SET
+                    likes = likes - (OLD.type = 'like'),
+                    dislikes = dislikes - (OLD.type = 'dislike'),
+                    views = views - (OLD.type = 'view')
+                WHERE post_cid = OLD.post_cid;
+            END;
+        """)
+        c.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_interactions_count_update
+            AFTER UPDATE OF post_cid, type ON interactions
+            BEGIN
+                UPDATE post_counters SET
+                    likes = likes - (OLD.type = 'like'),
+                    dislikes = dislikes - (OLD.type = 'dislike'),
+                    views = views - (OLD.type = 'view')
+                WHERE post_cid = OLD.post_cid;
+                INSERT INTO post_counters (post_cid, likes, dislikes, views)
+                VALUES (NEW.post_cid, NEW.type = 'like', NEW.type = 'dislike', NEW.type = 'view')
+                ON CONFLICT(post_cid) DO UPDATE SET
+                    likes = likes + excluded.likes,
+                    dislikes = dislikes + excluded.dislikes,
+                    views = views + excluded.views;
+            END;
+        """)
+        _backfill_post_counters(c)
+
+        # Durable background jobs (utils/jobs.py): post-upload DAG, pubsub,
+        # thumbnail and pin work. Times are epoch seconds.
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT UNIQUE,
+                kind TEXT,
+                payload TEXT,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                max_attempts INTEGER DEFAULT 5,
+                next_run_at REAL,
+                claimed_by TEXT,
+                last_error TEXT,
+                result TEXT,
+                created_at REAL,
+                updated_at REAL
+            );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(status, next_run_at);")
+
+        # Full-text search (utils/search.py): FTS5 indexes over posts/users,
+        # external-content so the text isn't stored twice, synced by triggers.
+        # They key on rowid, which VACUUM may renumber for these tables — after
+        # a VACUUM run `INSERT INTO posts_fts(posts_fts) VALUES('rebuild')` (same for users_fts).
+        _create_fts_index(c, "posts", ["name", "description", "author", "filename"])
+        _create_fts_index(c, "users", ["username", "handle"])
+
+        # Rendered previews by source content CID (utils/previews.py)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS previews (
+                source_cid TEXT PRIMARY KEY,
+                preview_cid TEXT,
+                kind TEXT,
+                created_at REAL
+            );
+        """)
+
         # Lightweight SQLite migrations for older DBs (messages + following)
         for col, coltype in [("filename", "TEXT"), ("mime_type", "TEXT"), ("sender_uuid7", "TEXT"), ("receiver_uuid7", "TEXT")]:
             try:
@@ -340,6 +1196,90 @@ def _init_db_inner(conn: CompatConnection):
             except Exception:
                 pass
         # users column migrations already handled above (before CREATE INDEX)
+
+        # One row per conversation (utils/conversations.py), kept in step
+        # with `messages` by triggers so the conversation list is one
+        # indexed query. last_message can lag if the newest message of a
+        # conversation is deleted; nothing deletes single messages today.
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                peer_a TEXT NOT NULL,
+                peer_b TEXT NOT NULL,
+                last_message TEXT,
+                last_sender TEXT,
+                last_timestamp TEXT,
+                message_count INTEGER DEFAULT 0,
+                unread_a INTEGER DEFAULT 0,
+                unread_b INTEGER DEFAULT 0,
+                PRIMARY KEY (peer_a, peer_b)
+            );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_conversations_peer_b ON conversations(peer_b);")
+        # Mark-read updates only touch a reader's unread rows
+        c.execute("CREATE INDEX IF NOT EXISTS idx_messages_unread ON messages(receiver_peer_id, sender_peer_id) WHERE is_read = 0;")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_messages_unread_uuid7 ON messages(receiver_uuid7, sender_uuid7) WHERE is_read = 0;")
+        new_s, new_r, new_ua, new_ub = _message_parties("NEW")
+        old_s, old_r, old_ua, old_ub = _message_parties("OLD")
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_messages_conversation_insert
+            AFTER INSERT ON messages
+            WHEN {new_s} IS NOT NULL AND {new_r} IS NOT NULL
+            BEGIN
+                INSERT INTO conversations
+                    (peer_a, peer_b, last_message, last_sender, last_timestamp, message_count, unread_a, unread_b)
+                VALUES (min({new_s}, {new_r}), max({new_s}, {new_r}), NEW.text, {new_s}, NEW.timestamp, 1, {new_ua}, {new_ub})
+                ON CONFLICT(peer_a, peer_b) DO UPDATE SET
+                    last_message = CASE WHEN excluded.last_timestamp >= COALESCE(last_timestamp, '')
+                                        THEN excluded.last_message ELSE last_message END,
+                    last_sender = CASE WHEN excluded.last_timestamp >= COALESCE(last_timestamp, '')
+                                       THEN excluded.last_sender ELSE last_sender END,
+                    last_timestamp = CASE WHEN excluded.last_timestamp >= COALESCE(last_timestamp, '')
+                                          THEN excluded.last_timestamp ELSE last_timestamp END,
+                    message_count = message_count + 1,
+                    unread_a = unread_a + excluded.unread_a,
+                    unread_b = unread_b + excluded.unread_b;
+            END;
+        """)
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_messages_conversation_read
+            AFTER UPDATE OF is_read ON messages
+            WHEN {new_s} IS NOT NULL AND {new_r} IS NOT NULL
+             AND (COALESCE(OLD.is_read, 0) = 0) != (COALESCE(NEW.is_read, 0) = 0)
+            BEGIN
+                UPDATE conversations SET
+                    unread_a = unread_a + {new_ua} - {old_ua},
+                    unread_b = unread_b + {new_ub} - {old_ub}
+                WHERE peer_a = min({new_s}, {new_r}) AND peer_b = max({new_s}, {new_r});
+            END;
+        """)
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_messages_conversation_delete
+            AFTER DELETE ON messages
+            WHEN {old_s} IS NOT NULL AND {old_r} IS NOT NULL
+            BEGIN
+                UPDATE conversations SET
+                    message_count = message_count - 1,
+                    unread_a = unread_a - {old_ua},
+                    unread_b = unread_b - {old_ub}
+                WHERE peer_a = min({old_s}, {old_r}) AND peer_b = max({old_s}, {old_r});
+                DELETE FROM conversations
+                WHERE peer_a = min({old_s}, {old_r}) AND peer_b = max({old_s}, {old_r}) AND message_count <= 0;
+            END;
+        """)
+        _backfill_conversations(c, False)
+
+        # Outbox other server processes tail for /api/stream events
+        # (utils/notify.py). Postgres uses LISTEN/NOTIFY instead.
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS stream_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_peer_id TEXT,
+                payload TEXT,
+                origin TEXT,
+                created_at REAL
+            );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_stream_events_created ON stream_events(created_at);")
     else:
         # Postgres/Supabase schema (kept close to SQLite types for compatibility)
         c.execute("""
@@ -365,6 +1305,8 @@ def _init_db_inner(conn: CompatConnection):
         c.execute("CREATE INDEX IF NOT EXISTS idx_posts_description ON posts(description);")
         c.execute("CREATE INDEX IF NOT EXISTS idx_posts_peer_id ON posts(peer_id);")
         c.execute("CREATE INDEX IF NOT EXISTS idx_posts_timestamp ON posts(timestamp);")
+        # Keyset pages sort NULL timestamps as '' (oldest) so every row has a place
+        c.execute("CREATE INDEX IF NOT EXISTS idx_posts_keyset ON posts((COALESCE(timestamp, '')), id);")
         c.execute("CREATE INDEX IF NOT EXISTS idx_posts_peer_ts ON posts(peer_id, timestamp);")
 
         c.execute("""
@@ -402,6 +1344,9 @@ def _init_db_inner(conn: CompatConnection):
         # Safe to create index now — transaction is clean regardless of migration outcome
         try:
             c.execute("CREATE INDEX IF NOT EXISTS idx_users_uuid7 ON users(uuid7);")
+            # Prefix lookups for user autocomplete; "C" collation makes range scans byte-ordered
+            for col in ("username", "handle", "uuid7"):
+                c.execute(f'CREATE INDEX IF NOT EXISTS idx_users_{col}_lower ON users ((lower({col}) COLLATE "C"));')
             conn.commit()
         except Exception:
             conn.rollback()  # index may already exist in some edge cases
@@ -460,6 +1405,10 @@ def _init_db_inner(conn: CompatConnection):
         c.execute("CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages(sender_peer_id);")
         c.execute("CREATE INDEX IF NOT EXISTS idx_messages_receiver ON messages(receiver_peer_id);")
         c.execute("CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(sender_peer_id, receiver_peer_id, timestamp);")
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_messages_conversation_keyset
+            ON messages(sender_peer_id, receiver_peer_id, (COALESCE(timestamp, '')), id);
+        """)
 
         c.execute("""
             CREATE TABLE IF NOT EXISTS guardians (
@@ -515,6 +1464,9 @@ def _init_db_inner(conn: CompatConnection):
                 is_read SMALLINT DEFAULT 0
             );
         """)
+        # Stream replay (Last-Event-ID) reads a user's notifications after an id
+        c.execute("CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user_peer_id, id);")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_notifications_user_time ON notifications(user_peer_id, timestamp);")
 
         c.execute("""
             CREATE TABLE IF NOT EXISTS discovered_peers (
@@ -527,6 +1479,141 @@ def _init_db_inner(conn: CompatConnection):
             );
         """)
 
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS timeline (
+                user_peer_id TEXT,
+                post_cid TEXT,
+                timestamp TEXT,
+                author_peer_id TEXT,
+                author_username TEXT,
+                payload TEXT,
+                PRIMARY KEY (user_peer_id, post_cid)
+            );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_timeline_user_ts ON timeline(user_peer_id, timestamp, post_cid);")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_timeline_author ON timeline(author_peer_id);")
+
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS library_shards (
+                shard TEXT PRIMARY KEY,
+                version BIGINT DEFAULT 0,
+                published_version BIGINT DEFAULT 0,
+                digest TEXT,
+                cid TEXT,
+                post_count INTEGER DEFAULT 0
+            );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_posts_shard ON posts ((lower(substr(id, length(id), 1))));")
+        c.execute("""
+            CREATE OR REPLACE FUNCTION bump_library_shard() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO library_shards (shard, version)
+                    VALUES (lower(substr(NEW.id, length(NEW.id), 1)), 1)
+                    ON CONFLICT (shard) DO UPDATE SET version = library_shards.version + 1;
+                END IF;
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    INSERT INTO library_shards (shard, version)
+                    VALUES (lower(substr(OLD.id, length(OLD.id), 1)), 1)
+                    ON CONFLICT (shard) DO UPDATE SET version = library_shards.version + 1;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        c.execute("DROP TRIGGER IF EXISTS trg_posts_library_shard ON posts;")
+        c.execute("""
+            CREATE TRIGGER trg_posts_library_shard
+            AFTER INSERT OR UPDATE OR DELETE ON posts
+            FOR EACH ROW EXECUTE FUNCTION bump_library_shard();
+        """)
+        c.execute("""
+            INSERT OR IGNORE INTO library_shards (shard, version)
+            SELECT DISTINCT lower(substr(id, length(id), 1)), 1 FROM posts WHERE id IS NOT NULL
+        """)
+
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS post_counters (
+                post_cid TEXT PRIMARY KEY,
+                likes BIGINT DEFAULT 0,
+                dislikes BIGINT DEFAULT 0,
+                views BIGINT DEFAULT 0
+            );
+        """)
+        c.execute("""
+            CREATE OR REPLACE FUNCTION count_interaction() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.post_cid IS NOT NULL THEN
+                    UPDATE post_counters SET
+                        likes = likes - (OLD.type = 'like')::int,
+                        dislikes = dislikes - (OLD.type = 'dislike')::int,
+                        views = views - (OLD.type = 'view')::int
+                    WHERE post_cid = OLD.post_cid;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.post_cid IS NOT NULL THEN
+                    INSERT INTO post_counters (post_cid, likes, dislikes, views)
+                    VALUES (NEW.post_cid, (NEW.type = 'like')::int, (NEW.type = 'dislike')::int, (NEW.type = 'view')::int)
+                    ON CONFLICT (post_cid) DO UPDATE SET
+                        likes = post_counters.likes + EXCLUDED.likes,
+                        dislikes = post_counters.dislikes + EXCLUDED.dislikes,
+                        views = post_counters.views + EXCLUDED.views;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        c.execute("DROP TRIGGER IF EXISTS trg_interactions_count ON interactions;")
+        c.execute("""
+            CREATE TRIGGER trg_interactions_count
+            AFTER INSERT OR UPDATE OF post_cid, type OR DELETE ON interactions
+            FOR EACH ROW EXECUTE FUNCTION count_interaction();
+        """)
+        _backfill_post_counters(c)
+
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id BIGSERIAL PRIMARY KEY,
+                idempotency_key TEXT UNIQUE,
+                kind TEXT,
+                payload TEXT,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                max_attempts INTEGER DEFAULT 5,
+                next_run_at DOUBLE PRECISION,
+                claimed_by TEXT,
+                last_error TEXT,
+                result TEXT,
+                created_at DOUBLE PRECISION,
+                updated_at DOUBLE PRECISION
+            );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(status, next_run_at);")
+
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS previews (
+                source_cid TEXT PRIMARY KEY,
+                preview_cid TEXT,
+                kind TEXT,
+                created_at DOUBLE PRECISION
+            );
+        """)
+
+        # Full-text search: GIN over the same weighted tsvectors utils/search.py queries
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_posts_search ON posts USING GIN ((
+                setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(author, '')), 'B') ||
+                setweight(to_tsvector('simple', coalesce(description, '')), 'C') ||
+                setweight(to_tsvector('simple', coalesce(filename, '')), 'D')
+            ));
+        """)
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_users_search ON users USING GIN ((
+                setweight(to_tsvector('simple', coalesce(username, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(handle, '')), 'B')
+            ));
+        """)
+
         # ── Postgres migrations (ALTER TABLE for existing tables) ──
         for col, coltype in [("sender_uuid7", "TEXT"), ("receiver_uuid7", "TEXT")]:
             try:
@@ -536,6 +1623,85 @@ def _init_db_inner(conn: CompatConnection):
                 conn.rollback()  # reset aborted transaction before next statement
                 pass  # column already exists — fine
 
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                peer_a TEXT NOT NULL,
+                peer_b TEXT NOT NULL,
+                last_message TEXT,
+                last_sender TEXT,
+                last_timestamp TEXT,
+                message_count BIGINT DEFAULT 0,
+                unread_a BIGINT DEFAULT 0,
+                unread_b BIGINT DEFAULT 0,
+                PRIMARY KEY (peer_a, peer_b)
+            );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_conversations_peer_b ON conversations(peer_b);")
+        # Mark-read updates only touch a reader's unread rows
+        c.execute("CREATE INDEX IF NOT EXISTS idx_messages_unread ON messages(receiver_peer_id, sender_peer_id) WHERE is_read = 0;")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_messages_unread_uuid7 ON messages(receiver_uuid7, sender_uuid7) WHERE is_read = 0;")
+        c.execute("""
+            CREATE OR REPLACE FUNCTION track_conversation() RETURNS trigger AS $$
+            DECLARE
+                s TEXT;
+                r TEXT;
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    s := COALESCE(NEW.sender_uuid7, NEW.sender_peer_id);
+                    r := COALESCE(NEW.receiver_uuid7, NEW.receiver_peer_id);
+                    IF s IS NULL OR r IS NULL THEN RETURN NULL; END IF;
+                    INSERT INTO conversations
+                        (peer_a, peer_b, last_message, last_sender, last_timestamp, message_count, unread_a, unread_b)
+                    VALUES (LEAST(s, r), GREATEST(s, r), NEW.text, s, NEW.timestamp, 1,
+                            (r <= s AND COALESCE(NEW.is_read, 0) = 0)::int,
+                            (r > s AND COALESCE(NEW.is_read, 0) = 0)::int)
+                    ON CONFLICT (peer_a, peer_b) DO UPDATE SET
+                        last_message = CASE WHEN EXCLUDED.last_timestamp >= COALESCE(conversations.last_timestamp, '')
+                                            THEN EXCLUDED.last_message ELSE conversations.last_message END,
+                        last_sender = CASE WHEN EXCLUDED.last_timestamp >= COALESCE(conversations.last_timestamp, '')
+                                           THEN EXCLUDED.last_sender ELSE conversations.last_sender END,
+                        last_timestamp = CASE WHEN EXCLUDED.last_timestamp >= COALESCE(conversations.last_timestamp, '')
+                                              THEN EXCLUDED.last_timestamp ELSE conversations.last_timestamp END,
+                        message_count = conversations.message_count + 1,
+                        unread_a = conversations.unread_a + EXCLUDED.unread_a,
+                        unread_b = conversations.unread_b + EXCLUDED.unread_b;
+                ELSIF TG_OP = 'UPDATE' THEN
+                    s := COALESCE(NEW.sender_uuid7, NEW.sender_peer_id);
+                    r := COALESCE(NEW.receiver_uuid7, NEW.receiver_peer_id);
+                    IF s IS NULL OR r IS NULL
+                       OR (COALESCE(OLD.is_read, 0) = 0) = (COALESCE(NEW.is_read, 0) = 0) THEN
+                        RETURN NULL;
+                    END IF;
+                    UPDATE conversations SET
+                        unread_a = unread_a + (r <= s AND COALESCE(NEW.is_read, 0) = 0)::int
+                                            - (r <= s AND COALESCE(OLD.is_read, 0) = 0)::int,
+                        unread_b = unread_b + (r > s AND COALESCE(NEW.is_read, 0) = 0)::int
+                                            - (r > s AND COALESCE(OLD.is_read, 0) = 0)::int
+                    WHERE peer_a = LEAST(s, r) AND peer_b = GREATEST(s, r);
+                ELSE
+                    s := COALESCE(OLD.sender_uuid7, OLD.sender_peer_id);
+                    r := COALESCE(OLD.receiver_uuid7, OLD.receiver_peer_id);
+                    IF s IS NULL OR r IS NULL THEN RETURN NULL; END IF;
+                    UPDATE conversations SET
+                        message_count = message_count - 1,
+                        unread_a = unread_a - (r <= s AND COALESCE(OLD.is_read, 0) = 0)::int,
+                        unread_b = unread_b - (r > s AND COALESCE(OLD.is_read, 0) = 0)::int
+                    WHERE peer_a = LEAST(s, r) AND peer_b = GREATEST(s, r);
+                    DELETE FROM conversations
+                    WHERE peer_a = LEAST(s, r) AND peer_b = GREATEST(s, r) AND message_count <= 0;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+        c.execute("DROP TRIGGER IF EXISTS trg_messages_conversation ON messages;")
+        c.execute("""
+            CREATE TRIGGER trg_messages_conversation
+            AFTER INSERT OR UPDATE OF is_read OR DELETE ON messages
+            FOR EACH ROW EXECUTE FUNCTION track_conversation();
+        """)
+        _backfill_conversations(c, True)
+
     conn.commit()
     location = _get_database_url() if conn._is_postgres else DB_PATH
     print(f"✅ Database initialized at {location}")
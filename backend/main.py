@@ -24,16 +24,38 @@ try:
 except Exception:
     pass
 
-from database import get_db_connection, init_db
+from database import (
+    get_db_connection, get_async_db_connection, init_db,
+    get_pool_stats, get_async_pool_stats, close_pool, close_async_pool, get_postgres_url, PoolExhausted,
+)
 import re
 import hmac
 import hashlib
-from utils.crypto import generate_keypair, sign_message, verify_message, did_to_peer_id
+import base64
+from utils.crypto import (
+    generate_keypair, sign_message, verify_message, verify_message_async, did_to_peer_id, crypto_cache_stats,
+)
 from utils.recovery import split_secret, combine_shards
 from utils.p2p import P2PClient
 from utils.ipfs_rpc import IPFSRPCClient
+from utils.dag_cache import DagCache
+from utils.ipns_cache import IpnsCache
 from utils.social_dag import SocialDAG
 from utils.discovery import DiscoveryHub
+from utils.feed_engine import FeedEngine
+from utils.publisher import DebouncedPublisher, content_digest
+from utils.library_shards import SHARD_SQL, shard_node, index_node, iter_library_index
+from utils.conversations import conversation_summaries
+from utils.counters import counts_from_row, interaction_summaries, reconcile_post_counters
+from utils.jobs import JobQueue
+from utils.notifications import NotificationWriter, id_ranges
+from utils.notify import NotificationBus
+from utils.previews import PreviewPipeline, preview_kind
+from utils.search import search_posts, search_users
+from utils.streams import StreamRegistry, notifications_since, sse_frame
+from utils.user_index import USER_COLUMNS, UserPrefixIndex
+from utils.unread import UnreadCounters
+from utils.timeline import TimelineStore, insert_timeline_posts, peer_id_variants
 
 
 # ==================== Logging Configuration ====================
@@ -52,19 +74,12 @@ p2p_client = None
 rpc_client: Optional[IPFSRPCClient] = None
 social_dag: Optional[SocialDAG] = None
 discovery_hub: Optional[DiscoveryHub] = None
+feed_engine: Optional[FeedEngine] = None
+timeline_store: Optional[TimelineStore] = None
 
 # IPFS/P2P availability flag — set to False if background init fails
 ipfs_available: bool = False
 
-# Global notification queues for SSE
-notification_queues: Dict[str, asyncio.Queue] = {}
-
-def get_notification_queue(did: str) -> asyncio.Queue:
-    """Get or create notification queue for a user"""
-    if did not in notification_queues:
-        notification_queues[did] = asyncio.Queue(maxsize=100)
-    return notification_queues[did]
-
 def classify_media_type(filename: str) -> str:
     """Classify file by extension into: image, video, audio, file, text"""
     if not filename:
@@ -97,6 +112,12 @@ def _env_int(key: str, default: int) -> int:
     except Exception:
         return default
 
+def _as_int(value: Any, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
 # Initialize FastAPI app
 app = FastAPI(
     title="IPFS Social Feed API",
@@ -127,10 +148,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(PoolExhausted)
+async def pool_exhausted_handler(request: Request, exc: PoolExhausted):
+    """Every pooled DB connection is busy: ask the client to retry rather than pile on."""
+    return JSONResponse(status_code=503, content={"detail": "Database busy, try again shortly"},
+                        headers={"Retry-After": "1"})
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup."""
-    global p2p_client, rpc_client, social_dag, discovery_hub
+    global p2p_client, rpc_client, social_dag, discovery_hub, feed_engine, timeline_store
 
     # ── 1. Database (fast path — 10 s connect timeout set in database.py) ────
     try:
@@ -139,16 +166,54 @@ async def startup_event():
         print(f"⚠️  Database init failed: {e}")
         # Non-fatal — some endpoints will fail but server stays up
 
+    # Don't republish a manifest identical to the one already out there
+    previous_manifest = load_json(MANIFEST_FILE, {})
+    if isinstance(previous_manifest, dict):
+        manifest_publisher.last_digest = previous_manifest.get("content_hash")
+        manifest_publisher.last_cid = previous_manifest.get("manifest_cid")
+
+    job_queue.start()
+    notification_bus.start()
+
+    reconcile_interval = _env_int("COUNTER_RECONCILE_INTERVAL", 3600)
+    if reconcile_interval > 0:
+        asyncio.create_task(periodic_counter_reconcile(reconcile_interval))
+
     # ── 2. IPFS / P2P (deferred to background so healthcheck passes fast) ────
     async def _start_ipfs():
-        global p2p_client, rpc_client, social_dag, discovery_hub, ipfs_available
+        global p2p_client, rpc_client, social_dag, discovery_hub, feed_engine, timeline_store, ipfs_available
         rpc_host = os.getenv("IPFS_RPC_HOST", "http://127.0.0.1")
         rpc_port = _env_int("IPFS_RPC_PORT", 5001)
         try:
-            rpc_client = IPFSRPCClient(host=rpc_host, port=rpc_port)
+            dag_cache = DagCache(
+                max_entries=_env_int("DAG_CACHE_MAX_ENTRIES", 5000),
+                max_bytes=_env_int("DAG_CACHE_MAX_MB", 32) * 1024 * 1024,
+                disk_path=os.getenv("DAG_CACHE_PATH") or None,
+                disk_max_bytes=_env_int("DAG_CACHE_DISK_MAX_MB", 512) * 1024 * 1024,
+            )
+            ipns_cache = IpnsCache(
+                ttl=_env_int("IPNS_CACHE_TTL", 60),
+                negative_ttl=_env_int("IPNS_NEGATIVE_TTL", 15),
+                stale_ttl=_env_int("IPNS_STALE_TTL", 600),
+            )
+            rpc_client = IPFSRPCClient(host=rpc_host, port=rpc_port, dag_cache=dag_cache, ipns_cache=ipns_cache)
             social_dag = SocialDAG(rpc_client)
-            discovery_hub = DiscoveryHub(rpc_client, social_dag, get_db_connection)
+            feed_engine = FeedEngine(
+                rpc_client,
+                social_dag,
+                max_concurrency=_env_int("FEED_FANOUT_CONCURRENCY", 16),
+                peer_timeout=_env_int("FEED_PEER_TIMEOUT", 5),
+            )
+            timeline_store = TimelineStore(
+                social_dag,
+                get_db_connection,
+                feed_engine,
+                backfill_depth=_env_int("TIMELINE_BACKFILL_DEPTH", 50),
+            )
+            discovery_hub = DiscoveryHub(rpc_client, social_dag, get_db_connection, timeline=timeline_store)
             logger.info(f"✅ IPFS RPC client ready at {rpc_host}:{rpc_port}")
+            # Materialize timelines for follows that predate the timeline table
+            asyncio.create_task(timeline_store.backfill())
         except Exception as e:
             logger.error(f"❌ IPFS RPC init failed (uploads/IPNS will be unavailable): {e}")
             ipfs_available = False
@@ -182,7 +247,15 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup services on shutdown."""
-    pass
+    await job_queue.stop()
+    await notification_writer.stop()
+    await notification_bus.stop()
+    preview_pipeline.close()
+    await manifest_publisher.stop()
+    close_pool()
+    await close_async_pool()
+    if rpc_client:
+        rpc_client.dag_cache.close()
 
 
 
@@ -234,7 +307,7 @@ def verify_signature(request: Request, secret: str = None) -> bool:
         return verify_message(payload, signature, did)
 
     except Exception as e:
-        print(f"Auth error: {e}")
+        logger.warning(f"Auth error: {e}")
         return False
 
 # ==================== Auth & IPFS Decorators ====================
@@ -317,6 +390,24 @@ async def periodic_heartbeat():
             print(f"Heartbeat failed: {e}")
         await asyncio.sleep(60)
 
+def _reconcile_counters() -> int:
+    conn = get_db_connection()
+    try:
+        return reconcile_post_counters(conn)
+    finally:
+        conn.close()
+
+async def periodic_counter_reconcile(interval: int):
+    """Recount post_counters from `interactions` every `interval` seconds to repair drift."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            fixed = await asyncio.to_thread(_reconcile_counters)
+            if fixed:
+                logger.warning(f"Reconciled {fixed} drifted post_counters rows")
+        except Exception as e:
+            print(f"Counter reconciliation failed: {e}")
+
 @app.middleware("http")
 async def auth_middleware(request: Request, call_next):
     """
@@ -342,22 +433,24 @@ def secure_filename(filename: str) -> str:
     name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("._")
     return name or "file"
 
-def generate_pdf_thumbnail(pdf_path: str) -> Optional[str]:
-    """Generate a thumbnail for a PDF file using qlmanage (macOS)"""
+def encode_cursor(*values) -> str:
+    """Opaque keyset-pagination cursor: url-safe base64 of the sort-key values."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Inverse of encode_cursor; 400 on anything that isn't a `size`-value cursor."""
     try:
-        temp_dir = tempfile.gettempdir()
-        # qlmanage -t -s 512 -o output_dir input_file
-        subprocess.run(
-            ["qlmanage", "-t", "-s", "512", "-o", temp_dir, pdf_path],
-            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-        )
-        base_name = os.path.basename(pdf_path)
-        thumb_name = f"{base_name}.png"
-        thumb_path = os.path.join(temp_dir, thumb_name)
-        return thumb_path if os.path.exists(thumb_path) else None
-    except Exception as e:
-        print(f"Error generating PDF thumbnail: {e}")
-        return None
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        # Only scalars the sort keys can hold; anything else would be bound as a SQL parameter
+        if (isinstance(values, list) and len(values) == size
+                and all(v is None or (isinstance(v, (str, int)) and not isinstance(v, bool)) for v in values)):
+            return values
+    except (ValueError, TypeError):
+        pass
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
 
 
 
@@ -399,6 +492,13 @@ class LibraryItem(BaseModel):
 class Comment(BaseModel):
     text: str
 
+class NotificationReadReq(BaseModel):
+    ids: List[int] = []
+    up_to: Optional[int] = None
+
+class InteractionBatchReq(BaseModel):
+    cids: List[str]
+
 class UserProfile(BaseModel):
     username: str
     handle: str
@@ -454,50 +554,106 @@ async def run_command_async(command: Union[str, List[str]]) -> Optional[str]:
     """Execute shell command asynchronously to avoid blocking the event loop"""
     return await asyncio.to_thread(run_command, command)
 
-def update_social_manifest():
-    """Create and publish manifest.json containing library and recommendations"""
+def _manifest_snapshot() -> Dict:
+    """
+    Everything the published manifest is built from (library shards, likes, follows).
+
+    Only shards whose version moved since the last publish are read from
+    `posts`; the rest are represented by their stored digest and cid.
+    """
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
-        
-        # Load library from DB
-        posts = conn.execute("SELECT * FROM posts").fetchall()
-        library = [dict(p) for p in posts]
-        
-        # Write library to file for IPFS add
-        with open(LIBRARY_FILE, 'w') as f:
-            json.dump(library, f, indent=2)
-            
-        # Generate vouched list from DB (likes)
+        shards, clean, pending = {}, {}, {}
+        for r in conn.execute(
+            "SELECT shard, version, published_version, digest, cid, post_count FROM library_shards"
+        ).fetchall():
+            if r["version"] == r["published_version"]:
+                if r["cid"]:
+                    shards[r["shard"]] = r["digest"]
+                    clean[r["shard"]] = (r["cid"], r["post_count"])
+                continue
+            posts = [dict(p) for p in conn.execute(
+                f"SELECT * FROM posts WHERE {SHARD_SQL} = ? ORDER BY id", (r["shard"],)
+            ).fetchall()]
+            digest = content_digest(posts) if posts else None
+            pending[r["shard"]] = {
+                "version": r["version"],
+                "posts": posts,
+                "digest": digest,
+                "published_digest": r["digest"],
+                "published_cid": r["cid"],
+            }
+            if posts:
+                shards[r["shard"]] = digest
+
         my_peer_id = get_my_peer_id()
-        vouched_rows = conn.execute("SELECT post_cid FROM interactions WHERE user_peer_id = ? AND type = 'like'", (my_peer_id,)).fetchall()
-        vouched = [r["post_cid"] for r in vouched_rows]
-        
+        vouched_rows = conn.execute(
+            "SELECT post_cid FROM interactions WHERE user_peer_id = ? AND type = 'like' ORDER BY post_cid",
+            (my_peer_id,)
+        ).fetchall()
+        following_rows = conn.execute(
+            "SELECT following_peer_id FROM following WHERE user_peer_id = ? ORDER BY following_peer_id",
+            (my_peer_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return {
+        "shards": shards,
+        "vouched": [r["post_cid"] for r in vouched_rows],
+        "following": [r["following_peer_id"] for r in following_rows],
+        "clean": clean,
+        "pending": pending,
+    }
+
+def _manifest_fingerprint(snapshot: Dict) -> str:
+    return content_digest({k: snapshot[k] for k in ("shards", "vouched", "following")})
+
+def _ipfs_dag_put(node: Dict) -> Optional[str]:
+    """Store a dag-json node via the ipfs CLI (blocking) and return its CID."""
+    fd, path = tempfile.mkstemp(suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(node, f, default=str)
+        return run_command([IPFS_BIN, "dag", "put", "--store-codec=dag-json", "--input-codec=dag-json", path])
+    finally:
+        os.unlink(path)
+
+def _publish_manifest(snapshot: Dict) -> Optional[str]:
+    """Re-put changed library shards, then the index, vouched list and manifest; pin and publish (blocking)."""
+    try:
+        shard_cids = dict(snapshot["clean"])
+        published = []  # (shard, version, digest, cid, count); cid None = shard now empty
+        for shard, change in snapshot["pending"].items():
+            posts = change["posts"]
+            if not posts:
+                published.append((shard, change["version"], None, None, 0))
+                continue
+            if change["digest"] == change["published_digest"] and change["published_cid"]:
+                shard_cid = change["published_cid"]  # touched but identical
+            else:
+                shard_cid = _ipfs_dag_put(shard_node(shard, posts))
+                if not shard_cid:
+                    return None
+            shard_cids[shard] = (shard_cid, len(posts))
+            published.append((shard, change["version"], change["digest"], shard_cid, len(posts)))
+
+        index_cid = _ipfs_dag_put(index_node(shard_cids))
+        if not index_cid:
+            return None
+
         with open(VOUCHED_FILE, 'w') as f:
-            json.dump(vouched, f, indent=2)
-            
-        # Add library and vouched files to IPFS
-        lib_res = run_command([IPFS_BIN, "add", "-Q", os.path.abspath(LIBRARY_FILE)])
-        lib_cid = lib_res.strip() if lib_res else None
-        
+            json.dump(snapshot["vouched"], f, indent=2)
         vouched_res = run_command([IPFS_BIN, "add", "-Q", os.path.abspath(VOUCHED_FILE)])
         vouched_cid = vouched_res.strip() if vouched_res else None
-        
-        if not lib_cid:
-            conn.close()
-            return None
-            
-        # Get following list from DB
-        following_rows = conn.execute("SELECT following_peer_id FROM following WHERE user_peer_id = ?", (my_peer_id,)).fetchall()
-        following_ids = [r["following_peer_id"] for r in following_rows]
-        
-        conn.close()
             
         manifest = {
-            "version": "1.1",
-            "library_cid": lib_cid,
+            "version": "1.2",
+            "library_index": index_cid,
+            "library_count": sum(count for _, count in shard_cids.values()),
             "vouched_cid": vouched_cid or "",
-            "following": following_ids,
-            "timestamp": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
+            "following": snapshot["following"],
+            "timestamp": datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "content_hash": _manifest_fingerprint(snapshot),
         }
         
         save_json(MANIFEST_FILE, manifest)
@@ -505,16 +661,80 @@ def update_social_manifest():
         manifest_cid = manifest_res.strip() if manifest_res else None
         
         if manifest_cid:
+            # Pinning the index pins every shard it links to
+            run_command([CLUSTER_CTL, "pin", "add", index_cid])
             run_command([CLUSTER_CTL, "pin", "add", manifest_cid])
             publish_to_ipns(manifest_cid)
             # Update local manifest.json with its own CID for reference
             manifest["manifest_cid"] = manifest_cid
             save_json(MANIFEST_FILE, manifest)
+            _mark_shards_published(published)
             return manifest_cid
     except Exception as e:
         print(f"Error updating manifest: {e}")
     return None
 
+def _mark_shards_published(published: List) -> None:
+    conn = get_db_connection()
+    try:
+        for shard, version, digest, shard_cid, count in published:
+            if shard_cid is None:
+                # Emptied shard: forget it unless a post landed in it meanwhile
+                conn.execute("DELETE FROM library_shards WHERE shard = ? AND version = ?", (shard, version))
+            else:
+                conn.execute("""
+                    UPDATE library_shards SET published_version = ?, digest = ?, cid = ?, post_count = ?
+                    WHERE shard = ?
+                """, (version, digest, shard_cid, count, shard))
+        conn.commit()
+    finally:
+        conn.close()
+
+# Handlers call manifest_publisher.request(); bursts of likes/deletes become
+# one publish, off the event loop, skipped when nothing actually changed.
+manifest_publisher = DebouncedPublisher(
+    "manifest",
+    _manifest_snapshot,
+    _publish_manifest,
+    debounce=_env_int("MANIFEST_DEBOUNCE_SECONDS", 2),
+    max_delay=_env_int("MANIFEST_MAX_DELAY_SECONDS", 30),
+    fingerprint=_manifest_fingerprint,
+)
+
+# Post-upload work (thumbnails, DAG + IPNS, pubsub, cluster pins) runs here,
+# after /api/upload has responded. Handlers are registered next to the upload endpoint.
+job_queue = JobQueue(
+    get_db_connection,
+    workers=_env_int("JOB_WORKERS", 2),
+    max_attempts=_env_int("JOB_MAX_ATTEMPTS", 5),
+)
+
+# Username / handle / uuid7 autocomplete for /api/users?q=
+user_index = UserPrefixIndex(get_db_connection, ttl=_env_int("USER_INDEX_TTL", 30))
+unread_counters = UnreadCounters(ttl=_env_int("UNREAD_CACHE_TTL", 60))
+
+# Connected /api/stream responses in this process, one bounded buffer each
+stream_registry = StreamRegistry(buffer_size=_env_int("STREAM_BUFFER_SIZE", 100))
+STREAM_REPLAY_MAX = _env_int("STREAM_REPLAY_MAX", 100)  # missed notifications replayed on reconnect
+
+# /api/stream events reach every server process (LISTEN/NOTIFY on Postgres, table tail on SQLite)
+notification_bus = NotificationBus(
+    get_db_connection,
+    stream_registry.deliver,
+    database_url=get_postgres_url(),
+    poll_interval=_env_int("STREAM_POLL_MS", 500) / 1000,
+)
+
+# Notification inserts are batched into one transaction per flush, then streamed
+notification_writer = NotificationWriter(
+    get_db_connection,
+    notification_bus.publish_many,
+    flush_interval=_env_int("NOTIFICATION_FLUSH_MS", 250) / 1000,
+)
+
+# Image / PDF / video previews, rendered in a process pool and cached by source CID
+preview_pipeline = PreviewPipeline(get_db_connection, workers=_env_int("PREVIEW_WORKERS", 2))
+
 def load_user_data(filepath: str, did: str, default_item=None):
     """Load user-specific data from a shared file"""
     full_data = load_json(filepath, {})
@@ -566,6 +786,26 @@ async def health():
     }
 
 
+@app.get("/api/metrics")
+async def metrics():
+    """Per-worker runtime metrics (connection pool, caches, background work)."""
+    return {
+        "db_pool": get_pool_stats(),
+        "db_async_pool": get_async_pool_stats(),
+        "dag_cache": rpc_client.dag_cache.stats() if rpc_client else None,
+        "ipns_cache": rpc_client.ipns_cache.stats() if rpc_client else None,
+        "manifest_publisher": manifest_publisher.stats(),
+        "jobs": await asyncio.to_thread(job_queue.stats),
+        "previews": preview_pipeline.stats(),
+        "user_index": user_index.stats(),
+        "unread": unread_counters.stats(),
+        "streams": stream_registry.stats(),
+        "stream_bus": notification_bus.stats(),
+        "notification_writes": notification_writer.stats(),
+        "signatures": crypto_cache_stats(),
+    }
+
+
 # ==================== User Identity / Profile / Sync ====================
 
 class CreateUserReq(BaseModel):
@@ -628,41 +868,54 @@ async def create_user(body: CreateUserReq, request: Request):
         conn.close()
         raise HTTPException(status_code=500, detail=str(e))
     conn.close()
+    if existing_by_uuid7 and existing_by_uuid7["peer_id"] != body.did:
+        user_index.remove(existing_by_uuid7["peer_id"])
+    user_index.upsert(body.did, body.username, f"@{body.username.lower()}", body.uuid7)
     return {"success": True, "uuid7": body.uuid7}
 
 
 @app.get("/api/users")
-async def list_users(limit: int = 50, offset: int = 0, q: str = ""):
-    """List users, with optional ?q= search by username or uuid7."""
+async def list_users(limit: int = 50, offset: int = 0, q: str = "", cursor: Optional[str] = None,
+                     include_total: bool = False):
+    """
+    List users, with optional ?q= prefix search on username, handle or uuid7.
+
+    Matches come from the in-memory prefix index. Listing everyone pages
+    by peer_id: pass `next_cursor` back as `cursor`. `total` is a lower
+    bound (or the index's user count when listing everyone) unless
+    `include_total` asks for an exact count; use `has_more` to page.
+    """
     limit = min(max(limit, 1), 200)
     offset = max(offset, 0)
-    conn = get_db_connection()
-
-    if q.strip():
-        wildcard = f"%{q.strip().lower()}%"
-        rows = conn.execute(
-            """
-            SELECT peer_id, did, uuid7, username, handle, avatar, bio
-            FROM users
-            WHERE lower(username) LIKE ? OR lower(uuid7) LIKE ?
-            ORDER BY username
-            LIMIT ? OFFSET ?
-            """,
-            (wildcard, wildcard, limit, offset),
-        ).fetchall()
-        total_row = conn.execute(
-            "SELECT COUNT(*) FROM users WHERE lower(username) LIKE ? OR lower(uuid7) LIKE ?",
-            (wildcard, wildcard),
-        ).fetchone()
-    else:
-        rows = conn.execute(
-            "SELECT peer_id, did, uuid7, username, handle, avatar, bio FROM users LIMIT ? OFFSET ?",
-            (limit, offset),
-        ).fetchall()
-        total_row = conn.execute("SELECT COUNT(*) FROM users").fetchone()
+    next_cursor = None
+    conn = await get_async_db_connection()
+    try:
+        if q.strip():
+            users, has_more = await user_index.search(conn, q, limit, offset)
+        else:
+            keyset, params = "", []
+            if cursor:
+                keyset, params = "WHERE peer_id > ?", decode_cursor(cursor, 1)
+                offset = 0
+            rows = await conn.fetchall(
+                f"SELECT {USER_COLUMNS} FROM users {keyset} ORDER BY peer_id LIMIT ? OFFSET ?",
+                (*params, limit + 1, offset),
+            )
+            users, has_more = [dict(r) for r in rows[:limit]], len(rows) > limit
+            if has_more:
+                next_cursor = encode_cursor(users[-1]["peer_id"])
+        exact = None
+        if include_total and not q.strip():
+            exact = (await conn.fetchone("SELECT COUNT(*) AS total FROM users"))["total"]
+    finally:
+        await conn.close()
 
-    conn.close()
-    return {"users": [dict(r) for r in rows], "total": total_row[0] if total_row else 0}
+    total = offset + len(users) + (1 if has_more else 0)
+    if not q.strip() and user_index.size() is not None:
+        total = max(total, user_index.size())
+    if exact is not None:
+        total = exact
+    return {"users": users, "total": total, "has_more": has_more, "next_cursor": next_cursor}
 
 
 @app.get("/api/users/{uuid7}")
@@ -787,23 +1040,39 @@ async def generate_identity():
         raise HTTPException(status_code=500, detail="Failed to generate identity")
 
 @app.get("/api/library")
-async def get_library(request: Request, limit: int = 50, offset: int = 0):
-    """Get posts from library with pagination (limit/offset)."""
+async def get_library(request: Request, limit: int = 50, offset: int = 0, cursor: Optional[str] = None,
+                      include_total: bool = False):
+    """
+    Get posts from library, newest first.
+
+    Pages are keyset queries over (timestamp, id) on idx_posts_keyset, a
+    NULL timestamp sorting as the oldest: pass `next_cursor` back as
+    `cursor` for the following page; `offset` still works for old clients. `total` is a lower bound unless
+    `include_total` asks for the exact (full-table) count.
+    """
     limit = min(max(limit, 1), 200)  # clamp: 1–200
     offset = max(offset, 0)
 
     did = get_current_did(request)
     my_peer_id = did
-    conn = get_db_connection()
-
-    posts = conn.execute(
-        "SELECT * FROM posts ORDER BY timestamp DESC LIMIT ? OFFSET ?",
-        (limit, offset),
-    ).fetchall()
-    total = conn.execute("SELECT COUNT(*) FROM posts").fetchone()
-    conn.close()
+    keyset, params = "", []
+    if cursor:
+        before_ts, before_id = decode_cursor(cursor, 2)
+        keyset = "WHERE COALESCE(timestamp, '') < ? OR (COALESCE(timestamp, '') = ? AND id < ?)"
+        params += [before_ts, before_ts, before_id]
+        offset = 0
+    conn = await get_async_db_connection()
+    try:
+        posts = await conn.fetchall(
+            f"SELECT * FROM posts {keyset} ORDER BY COALESCE(timestamp, '') DESC, id DESC LIMIT ? OFFSET ?",
+            (*params, limit + 1, offset),
+        )
+        total = await conn.fetchone("SELECT COUNT(*) AS total FROM posts") if include_total else None
+    finally:
+        await conn.close()
 
-    total_count = total[0] if total else 0
+    has_more = len(posts) > limit
+    posts = posts[:limit]
     library = []
     for r in posts:
         p = dict(r)
@@ -812,7 +1081,10 @@ async def get_library(request: Request, limit: int = 50, offset: int = 0):
             p["peer_id"] = my_peer_id
         library.append(p)
 
-    return {"library": library, "count": len(library), "total": total_count, "offset": offset}
+    next_cursor = encode_cursor(posts[-1]["timestamp"] or "", posts[-1]["id"]) if has_more else None
+    total_count = total["total"] if total else offset + len(library) + (1 if has_more else 0)
+    return {"library": library, "count": len(library), "total": total_count, "offset": offset,
+            "has_more": has_more, "next_cursor": next_cursor}
 
 @app.get("/api/profile/{peer_id}")
 async def get_user_profile(peer_id: str, request: Request):
@@ -852,9 +1124,17 @@ async def get_user_profile(peer_id: str, request: Request):
     }
 
 @app.get("/api/feed/user/{peer_id}")
-async def get_user_feed(peer_id: str, request: Request):
-    """Get aggregated feed for a specific user via Social DAG"""
+async def get_user_feed(peer_id: str, request: Request, limit: int = 20, offset: int = 0,
+                        before: Optional[str] = None):
+    """
+    Get aggregated feed for a specific user via Social DAG.
+
+    `offset` / `before` (a timestamp) page deeper into the profile; the DAG
+    seeks there via skip pointers instead of walking every post.
+    """
     my_id = get_current_did(request)
+    limit = max(1, min(limit, 100))
+    offset = max(0, offset)
     
     # 1. Resolve Peer's latest state via IPNS
     # For Phase 1, we still fall back to local DB if available (for speed)
@@ -864,70 +1144,72 @@ async def get_user_feed(peer_id: str, request: Request):
         resolved_cid = await rpc_client.name_resolve(raw_peer_id)
         if resolved_cid:
             # High-performance DAG Traversal
-            peer_library = await social_dag.traverse_feed(resolved_cid)
+            peer_library = await social_dag.traverse_feed(resolved_cid, limit=limit, offset=offset, before=before)
             # Enrich
             for item in peer_library:
                 item["_peer_id"] = peer_id
                 item["peer_id"] = peer_id
-            return {"library": peer_library, "count": len(peer_library), "source": "dag"}
+            return {"library": peer_library, "count": len(peer_library), "offset": offset, "limit": limit, "source": "dag"}
     except Exception as e:
         print(f"DAG Feed fetch error: {e}")
 
     # 2. Fallback to Local SQL (Legacy/Performance)
     if peer_id == my_id:
-        conn = get_db_connection()
-        posts = conn.execute("SELECT * FROM posts ORDER BY timestamp DESC").fetchall()
+        conn = await get_async_db_connection()
+        try:
+            if before:
+                posts = await conn.fetchall(
+                    "SELECT * FROM posts WHERE timestamp < ? ORDER BY timestamp DESC LIMIT ? OFFSET ?",
+                    (before.replace("T", " "), limit, offset),
+                )
+            else:
+                posts = await conn.fetchall("SELECT * FROM posts ORDER BY timestamp DESC LIMIT ? OFFSET ?", (limit, offset))
+        finally:
+            await conn.close()
         library = [dict(post) for post in posts]
-        conn.close()
         for item in library:
             item["_peer_id"] = my_id
             item["peer_id"] = my_id
-        return {"library": library, "count": len(library), "source": "sql"}
+        return {"library": library, "count": len(library), "offset": offset, "limit": limit, "source": "sql"}
 
     return {"library": [], "count": 0}
 
 @app.post("/api/search")
 @require_auth
 async def search_library(request: Request):
-    """Search library by metadata (title, description, author, filename) and Users"""
+    """
+    Search posts (title, description, author, filename) and users (username, handle).
+
+    Body: {"query", "limit" (default 20, max 50), "offset"}. Every word must
+    match as a prefix; results are ranked by the full-text index, posts then
+    users, each list paginated by limit/offset. A pasted CID or peer id is
+    also matched exactly.
+    """
     body = await request.json()
-    query = body.get("query", "").lower().strip()
+    query = str(body.get("query", "")).strip()
+    limit = max(1, min(_as_int(body.get("limit"), 20), 50))
+    offset = max(0, _as_int(body.get("offset"), 0))
     
     if not query:
         return {"results": [], "count": 0}
     
-    conn = get_db_connection()
-    wildcard_query = f"%{query}%"
-    
-    # 1. Search Posts
-    search_posts_sql = """
-        SELECT * FROM posts 
-        WHERE lower(name) LIKE ? 
-        OR lower(description) LIKE ? 
-        OR lower(author) LIKE ? 
-        OR lower(filename) LIKE ?
-        OR id LIKE ?
-    """
-    posts = conn.execute(search_posts_sql, (wildcard_query, wildcard_query, wildcard_query, wildcard_query, wildcard_query)).fetchall()
+    conn = await get_async_db_connection()
+    try:
+        posts, more_posts = await search_posts(conn, query, limit, offset)
+        users, more_users = await search_users(conn, query, limit, offset)
+    finally:
+        await conn.close()
+    
+    # 1. Posts
     post_results = []
-    for post in posts:
-        p = dict(post)
+    for p in posts:
         if not p.get("type"):
             p["type"] = "post" # Default fall back
         post_results.append(p)
     
-    # 2. Search Users
-    search_users_sql = """
-        SELECT * FROM users 
-        WHERE lower(username) LIKE ? 
-        OR lower(handle) LIKE ?
-        OR peer_id LIKE ?
-    """
-    users = conn.execute(search_users_sql, (wildcard_query, wildcard_query, wildcard_query)).fetchall()
+    # 2. Users
     user_results = []
-    
-    for u in users:
-        user_dict = dict(u)
+    for user_dict in users:
         # Format as a "card" similar to posts or distinct type
         user_card = {
             "type": "user",
@@ -942,12 +1224,15 @@ async def search_library(request: Request):
             "timestamp": ""
         }
         user_results.append(user_card)
-        
-    conn.close()
     
-    return {"results": post_results + user_results, "count": len(post_results) + len(user_results)}
-    
-    return {"results": combined, "count": len(combined), "query": query}
+    return {
+        "results": post_results + user_results,
+        "count": len(post_results) + len(user_results),
+        "query": query,
+        "has_more": more_posts or more_users,
+        "offset": offset,
+        "limit": limit
+    }
 
 @app.get("/api/library/{cid}")
 async def get_post(cid: str):
@@ -977,11 +1262,13 @@ async def delete_post(cid: str, request: Request):
         
     c.execute("DELETE FROM posts WHERE id = ?", (cid,))
     c.execute("DELETE FROM interactions WHERE post_cid = ?", (cid,))
+    c.execute("DELETE FROM post_counters WHERE post_cid = ?", (cid,))
+    c.execute("DELETE FROM timeline WHERE post_cid = ?", (cid,))
     conn.commit()
     conn.close()
 
     # Re-publish IPNS so synced peers see the deletion
-    update_social_manifest()
+    manifest_publisher.request()
 
     return {"success": True, "message": "Post deleted"}
 
@@ -1007,6 +1294,177 @@ async def update_post(cid: str, title: str = Form(...), description: str = Form(
     
     return {"success": True, "post": dict(post)}
 
+# Uploads are streamed from the request's spooled file to the IPFS daemon
+# in UPLOAD_CHUNK_BYTES pieces; nothing holds a whole file in memory.
+UPLOAD_MAX_BYTES = _env_int("UPLOAD_MAX_MB", 512) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# upload_id -> {"received": bytes streamed so far, "total": expected size or None}
+upload_progress: Dict[str, Dict[str, Optional[int]]] = {}
+
+class UploadTooLarge(Exception):
+    pass
+
+async def _upload_chunks(file: UploadFile, spill_path: Optional[str] = None):
+    """Yield an UploadFile in chunks, enforcing UPLOAD_MAX_BYTES; optionally tee to `spill_path`."""
+    spill = open(spill_path, "wb") if spill_path else None
+    try:
+        size = 0
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > UPLOAD_MAX_BYTES:
+                raise UploadTooLarge()
+            if spill:
+                await asyncio.to_thread(spill.write, chunk)
+            yield chunk
+    finally:
+        if spill:
+            spill.close()
+
+@app.get("/api/upload/progress/{upload_id}")
+async def get_upload_progress(upload_id: str):
+    """Bytes streamed to IPFS so far for an in-flight upload sent with X-Upload-ID."""
+    progress = upload_progress.get(upload_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No upload in progress with that id")
+    return {"upload_id": upload_id, **progress}
+
+# ── Post-upload jobs ─────────────────────────────────────────────────────────
+# /api/upload stores the content and the post row, then hands the rest to
+# job_queue: thumbnail (images, PDFs, videos) → post_dag → feed_pubsub, plus cluster pins.
+# Each job is keyed by the post cid, so a retried upload doesn't duplicate work.
+
+# One DAG writer per user at a time, so concurrent uploads chain instead of forking the feed
+_dag_locks: Dict[str, asyncio.Lock] = {}
+
+def _require_rpc():
+    if not rpc_client or not social_dag:
+        raise RuntimeError("IPFS RPC client not ready")
+
+def enqueue_post_jobs(did: str, entry: Dict, spill_path: Optional[str] = None, conn=None) -> Dict[str, int]:
+    """Queue the background work for a freshly stored post; returns {job kind: job id}."""
+    cid = entry["cid"]
+    jobs = {"cluster_pin": job_queue.enqueue("cluster_pin", {"cid": cid}, key=f"cluster_pin:{cid}", conn=conn)}
+    if spill_path:
+        # post_dag is queued once the thumbnail exists, so the DAG post can link it
+        jobs["thumbnail"] = job_queue.enqueue(
+            "thumbnail", {"did": did, "entry": entry, "path": spill_path}, key=f"thumbnail:{cid}", conn=conn
+        )
+    else:
+        jobs["post_dag"] = job_queue.enqueue("post_dag", {"did": did, "entry": entry}, key=f"post_dag:{cid}", conn=conn)
+    return jobs
+
+async def _job_thumbnail(payload: Dict) -> Dict:
+    """Render the post's preview, add it to IPFS, then queue the DAG update."""
+    _require_rpc()
+    entry, path = payload["entry"], payload["path"]
+    thumbnail_cid = None
+    try:
+        kind = preview_kind(entry["filename"], entry.get("media_type") or classify_media_type(entry["filename"]))
+        thumbnail_cid = await preview_pipeline.preview_for(entry["cid"], path, kind, rpc_client.add)
+    except Exception as te:
+        # A missing thumbnail shouldn't hold the post back from the DAG
+        logger.warning(f"Preview failed for {entry['cid']}: {te}")
+    if thumbnail_cid:
+        entry = {**entry, "thumbnail_cid": thumbnail_cid}
+        job_queue.enqueue("cluster_pin", {"cid": thumbnail_cid}, key=f"cluster_pin:{thumbnail_cid}")
+    job_queue.enqueue("post_dag", {"did": payload["did"], "entry": entry}, key=f"post_dag:{entry['cid']}")
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return {"thumbnail_cid": thumbnail_cid}
+
+def _dag_author(did: str) -> Optional[Dict]:
+    conn = get_db_connection()
+    try:
+        row = conn.execute(
+            "SELECT dag_root, username, handle, avatar, bio FROM users WHERE peer_id = ?", (did,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+def _record_dag_root(did: str, new_dag_root: str, post_cid: str) -> None:
+    """Store the new profile root and queue its announcement, in one transaction."""
+    conn = get_db_connection()
+    try:
+        conn.execute("UPDATE users SET dag_root = ? WHERE peer_id = ?", (new_dag_root, did))
+        job_queue.enqueue("feed_pubsub", {
+            "peer_id": did,
+            "new_root": new_dag_root,
+            "post_cid": post_cid,
+        }, key=f"feed_pubsub:{post_cid}", conn=conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+async def _job_post_dag(payload: Dict) -> Dict:
+    """Append the post to the author's Social DAG, republish the profile root (IPNS), record it."""
+    _require_rpc()
+    did, entry = payload["did"], payload["entry"]
+    async with _dag_locks.setdefault(did, asyncio.Lock()):
+        user_data = await asyncio.to_thread(_dag_author, did)
+        if not user_data:
+            return {"dag_root": None}  # no profile to hang a feed on (same as before)
+
+        old_dag_root = user_data.get("dag_root")
+        prev_post_cid = None
+        if old_dag_root:
+            try:
+                root_node = await rpc_client.dag_get(old_dag_root)
+                prev_post_cid = root_node.get("feed_head")
+            except Exception as e:
+                logger.warning(f"Could not retrieve previous DAG root: {e}")
+
+        new_post_cid = await social_dag.create_post(entry, prev_post_cid)
+        if not new_post_cid:
+            raise ValueError("Failed to create post in DAG")
+        profile_data = {
+            "username": user_data["username"],
+            "handle": user_data["handle"],
+            "avatar": user_data["avatar"],
+            "bio": user_data.get("bio", ""),
+            "peer_id": did
+        }
+        new_dag_root = await social_dag.update_profile(profile_data, new_post_cid)
+        if not new_dag_root:
+            raise ValueError("Failed to update profile in DAG")
+
+        await asyncio.to_thread(_record_dag_root, did, new_dag_root, entry["cid"])
+    return {"dag_root": new_dag_root, "post_node": new_post_cid}
+
+async def _job_feed_pubsub(payload: Dict) -> None:
+    """Announce the new feed root to peers."""
+    _require_rpc()
+    await rpc_client.pubsub_pub("/app/feed/updates", json.dumps({
+        **payload,
+        # Followers know us by node id; receivers check it against the pubsub sender
+        "node_peer_id": await asyncio.to_thread(get_my_peer_id),
+        "timestamp": datetime.now().isoformat()
+    }))
+
+async def _job_cluster_pin(payload: Dict) -> None:
+    if await run_command_async([CLUSTER_CTL, "pin", "add", payload["cid"]]) is None:
+        raise RuntimeError(f"cluster pin add {payload['cid']} failed")
+
+job_queue.register("thumbnail", _job_thumbnail)
+job_queue.register("post_dag", _job_post_dag)
+job_queue.register("feed_pubsub", _job_feed_pubsub)
+job_queue.register("cluster_pin", _job_cluster_pin)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: int):
+    """Status of a background job (queued / running / done / failed) with attempts, last error and result."""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job.pop("claimed_by", None)
+    return job
+
 @app.post("/api/upload")
 @require_auth
 @require_ipfs
@@ -1018,43 +1476,54 @@ async def upload_file(
     upload_type: str = Form("post"),
     visibility: str = Form("public"),
 ):
-    """Upload file to IPFS with proper error handling and transaction support"""
+    """
+    Upload file to IPFS and store the post.
+
+    Responds once the content is in IPFS and the post row is committed;
+    the DAG/IPNS update, pubsub announcement, PDF thumbnail and cluster
+    pins are queued as background jobs (ids under `jobs`, see /api/jobs/{id}).
+    """
     did = get_current_did(request)
     
     if len(title) > 200:
         raise HTTPException(status_code=400, detail="Title too long (max 200 chars)")
     if len(description) > 5000:
         raise HTTPException(status_code=400, detail="Description too long (max 5000 chars)")
+    content_length = request.headers.get("content-length", "")
+    declared_size = int(content_length) if content_length.isdigit() else None
+    if declared_size and declared_size > UPLOAD_MAX_BYTES + 64 * 1024:  # slack for the other form fields
+        raise HTTPException(status_code=413, detail=f"File too large (max {UPLOAD_MAX_BYTES // (1024 * 1024)} MB)")
+    upload_id = request.headers.get("X-Upload-ID") or uuid.uuid4().hex
         
     temp_path = None
     conn = None
     try:
-        # ── Step 1: Upload to IPFS ────────────────────────────────────
-        temp_dir = tempfile.gettempdir()
+        # ── Step 1: Stream to IPFS ────────────────────────────────────
         safe_filename = secure_filename(file.filename)
-        temp_path = os.path.join(temp_dir, f"temp_{uuid.uuid4().hex}_{safe_filename}")
+        media_type = classify_media_type(safe_filename)
+        # Only the thumbnail job needs the file on disk; it deletes it when done
+        wants_thumbnail = upload_type == "post" and preview_pipeline.supports(preview_kind(safe_filename, media_type))
+        if wants_thumbnail:
+            temp_path = os.path.join(tempfile.gettempdir(), f"temp_{uuid.uuid4().hex}_{safe_filename}")
         
-        with open(temp_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        cid = await rpc_client.add(content)
+        upload_progress[upload_id] = {"received": 0, "total": declared_size}
+        try:
+            cid = await rpc_client.add_stream(
+                _upload_chunks(file, temp_path),
+                safe_filename,
+                on_progress=lambda sent: upload_progress[upload_id].update(received=sent),
+            )
+        except UploadTooLarge:
+            raise HTTPException(status_code=413, detail=f"File too large (max {UPLOAD_MAX_BYTES // (1024 * 1024)} MB)")
+        finally:
+            upload_progress.pop(upload_id, None)
         if not cid:
             raise HTTPException(status_code=500, detail="Failed to add file to IPFS")
         
-        # ── Step 2: Generate thumbnail if PDF ────────────────────────
-        thumbnail_cid = None
-        if upload_type == "post" and file.filename.lower().endswith(".pdf"):
-            try:
-                thumb_path = generate_pdf_thumbnail(temp_path)
-                if thumb_path and os.path.exists(thumb_path):
-                    with open(thumb_path, "rb") as tf:
-                        thumbnail_cid = await rpc_client.add(tf.read())
-                    os.remove(thumb_path)
-            except Exception as te:
-                logger.warning(f"PDF thumbnail failed: {te}")
-        
-        # ── Step 3: Transactional DB Update ────────────────────────────
+        # Same content uploaded before: its preview already exists
+        thumbnail_cid = preview_pipeline.cached(cid) if wants_thumbnail else None
+        
+        # ── Step 2: Transactional DB Update ────────────────────────────
         if upload_type == "post":
             conn = get_db_connection()
             c = conn.cursor()
@@ -1075,13 +1544,12 @@ async def upload_file(
                     user_profile = dict(user_profile)
                 
                 # Create entry with media type classification
-                media_type = classify_media_type(safe_filename)
                 entry_dict = {
                     "name": title or safe_filename,
                     "description": description,
                     "filename": safe_filename,
                     "cid": cid,
-                    "thumbnail_cid": thumbnail_cid,
+                    "thumbnail_cid": thumbnail_cid,  # else filled in by the thumbnail job
                     "type": "file",
                     "media_type": media_type,
                     "author": user_profile.get("username", "Anonymous"),
@@ -1109,78 +1577,19 @@ async def upload_file(
                     entry_dict["visibility"]
                 ))
                 
-                # ── Phase 2: Update DAG (with validation) ────────────────
-                new_dag_root = None
-                if social_dag and rpc_client:
-                    user_row = c.execute(
-                        "SELECT dag_root, username, handle, avatar, bio FROM users WHERE peer_id = ?",
-                        (did,)
-                    ).fetchone()
-                    
-                    if user_row:
-                        user_data = dict(user_row)
-                        old_dag_root = user_data.get("dag_root")
-                        
-                        prev_post_cid = None
-                        if old_dag_root:
-                            try:
-                                root_node = await rpc_client.dag_get(old_dag_root)
-                                prev_post_cid = root_node.get("feed_head")
-                            except Exception as e:
-                                logger.warning(f"Could not retrieve previous DAG root: {e}")
-                        
-                        try:
-                            new_post_cid = await social_dag.create_post(entry_dict, prev_post_cid)
-                            if not new_post_cid:
-                                raise ValueError("Failed to create post in DAG")
-                            
-                            profile_data = {
-                                "username": user_data["username"],
-                                "handle": user_data["handle"],
-                                "avatar": user_data["avatar"],
-                                "bio": user_data.get("bio", ""),
-                                "peer_id": did
-                            }
-                            new_dag_root = await social_dag.update_profile(profile_data, new_post_cid)
-                            
-                            if not new_dag_root:
-                                raise ValueError("Failed to update profile in DAG")
-                            
-                            c.execute(
-                                "UPDATE users SET dag_root = ? WHERE peer_id = ?",
-                                (new_dag_root, did)
-                            )
-                            
-                        except Exception as dag_err:
-                            logger.error(f"DAG update failed for {did}: {dag_err}", exc_info=True)
-                            conn.rollback()
-                            raise HTTPException(
-                                status_code=500,
-                                detail=f"Failed to sync to decentralized network: {str(dag_err)}"
-                            )
+                # ── Phase 2: Queue DAG / pubsub / thumbnail / pins ────────
+                # Same transaction as the post row: both land or neither does
+                spill_path = None if thumbnail_cid else temp_path
+                jobs = enqueue_post_jobs(did, entry_dict, spill_path, conn=conn)
+                if thumbnail_cid:
+                    jobs["thumbnail_pin"] = job_queue.enqueue(
+                        "cluster_pin", {"cid": thumbnail_cid}, key=f"cluster_pin:{thumbnail_cid}", conn=conn
+                    )
                 
                 # ── Phase 3: Commit ──────────────────────────────────────
                 conn.commit()
-                
-                # ── Phase 4: Publish Updates ──────────────────────────────
-                try:
-                    if rpc_client:
-                        await rpc_client.pubsub_pub("/app/feed/updates", json.dumps({
-                            "peer_id": did,
-                            "new_root": new_dag_root,
-                            "post_cid": cid,
-                            "timestamp": datetime.now().isoformat()
-                        }))
-                except Exception as pub_err:
-                    logger.warning(f"PubSub publish failed: {pub_err}")
-                
-                # ── Phase 5: Pin to Cluster ──────────────────────────────
-                try:
-                    await run_command_async([CLUSTER_CTL, "pin", "add", cid])
-                    if thumbnail_cid:
-                        await run_command_async([CLUSTER_CTL, "pin", "add", thumbnail_cid])
-                except Exception as pin_err:
-                    logger.warning(f"Cluster pin failed: {pin_err}")
+                if spill_path:
+                    temp_path = None  # owned by the thumbnail job now
                 
                 return {
                     "success": True,
@@ -1188,7 +1597,8 @@ async def upload_file(
                     "thumbnail_cid": thumbnail_cid,
                     "filename": safe_filename,
                     "upload_type": upload_type,
-                    "dag_synced": new_dag_root is not None
+                    "dag_synced": False,
+                    "jobs": jobs
                 }
                 
             except HTTPException:
@@ -1282,51 +1692,17 @@ async def register_content(request: Request, body: RegisterContentReq):
             ""
         ))
 
-        # --- Global Scale DAG Integration ---
-        new_dag_root = None
-        try:
-            user_row = c.execute("SELECT dag_root, username, handle, avatar, bio FROM users WHERE peer_id = ?", (did,)).fetchone()
-            if user_row:
-                user_data = dict(user_row)
-                old_dag_root = user_data.get("dag_root")
-                
-                prev_post_cid = None
-                if old_dag_root:
-                    try:
-                        root_node = await rpc_client.dag_get(old_dag_root)
-                        prev_post_cid = root_node.get("feed_head")
-                    except: pass
-                
-                new_post_cid = await social_dag.create_post(entry_dict, prev_post_cid)
-                
-                profile_data = {
-                    "username": user_data["username"],
-                    "handle": user_data["handle"],
-                    "avatar": user_data["avatar"],
-                    "bio": user_data.get("bio", ""),
-                    "peer_id": did
-                }
-                new_dag_root = await social_dag.update_profile(profile_data, new_post_cid)
-                
-                c.execute("UPDATE users SET dag_root = ? WHERE peer_id = ?", (new_dag_root, did))
-        except Exception as dag_err:
-            print(f"DAG Update failed: {dag_err}")
-
+        # DAG/IPNS update and the pubsub announcement run as background jobs
+        job_id = job_queue.enqueue("post_dag", {"did": did, "entry": entry_dict}, key=f"post_dag:{body.cid}", conn=conn)
         conn.commit()
         conn.close()
         
-        # Publish update via PubSub
-        await rpc_client.pubsub_pub("/app/feed/updates", json.dumps({
-            "peer_id": did,
-            "new_root": new_dag_root,
-            "timestamp": datetime.now().isoformat()
-        }))
-        
         return {
             "success": True,
             "cid": body.cid,
             "thumbnail_cid": body.thumbnail_cid,
-            "upload_type": body.upload_type
+            "upload_type": body.upload_type,
+            "jobs": {"post_dag": job_id}
         }
     
     except Exception as e:
@@ -1336,39 +1712,53 @@ async def register_content(request: Request, body: RegisterContentReq):
 @app.get("/api/interactions")
 async def get_interactions():
     """Get all user interactions (Aggregated)"""
-    conn = get_db_connection()
-    rows = conn.execute("SELECT post_cid, type, COUNT(*) as count FROM interactions GROUP BY post_cid, type").fetchall()
-    conn.close()
+    conn = await get_async_db_connection()
+    try:
+        rows = await conn.fetchall("SELECT post_cid, likes, dislikes, views FROM post_counters WHERE post_cid IS NOT NULL")
+    finally:
+        await conn.close()
     
-    result = {}
-    for r in rows:
-        cid = r["post_cid"]
-        if cid not in result: 
-            result[cid] = {"likes_count": 0, "dislikes_count": 0, "views": 0, "comments": []}
-            
-        if r["type"] == "like": result[cid]["likes_count"] = r["count"]
-        elif r["type"] == "dislike": result[cid]["dislikes_count"] = r["count"]
-        elif r["type"] == "view": result[cid]["views"] = r["count"]
-        
-    return result
+    return {r["post_cid"]: {**counts_from_row(r), "comments": []} for r in rows}
+
+# Most posts a single batch summary request may ask for
+INTERACTION_BATCH_MAX = 100
+
+@app.post("/api/interactions/batch")
+async def get_interactions_batch(body: InteractionBatchReq, request: Request):
+    """
+    Interaction summaries for many posts at once (feed rendering).
+
+    Returns {cid: {likes_count, dislikes_count, views, recommended,
+    not_recommended, comments_count}} for the viewer in X-DID, using a fixed
+    number of queries instead of one /api/interactions/{cid} call per post.
+    """
+    if len(body.cids) > INTERACTION_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {INTERACTION_BATCH_MAX} cids per request")
+    conn = await get_async_db_connection()
+    try:
+        return await interaction_summaries(conn, body.cids, get_current_did(request))
+    finally:
+        await conn.close()
 
 @app.get("/api/interactions/{cid}")
 async def get_post_interactions(cid: str, request: Request):
     """Get interactions for specific post from SQLite"""
     peer_id = get_current_did(request)
-    conn = get_db_connection()
-    
-    # Counts
-    likes = conn.execute("SELECT COUNT(*) as count FROM interactions WHERE post_cid = ? AND type = 'like'", (cid,)).fetchone()["count"]
-    dislikes = conn.execute("SELECT COUNT(*) as count FROM interactions WHERE post_cid = ? AND type = 'dislike'", (cid,)).fetchone()["count"]
-    views = conn.execute("SELECT COUNT(*) as count FROM interactions WHERE post_cid = ? AND type = 'view'", (cid,)).fetchone()["count"]
-    
-    # My status
-    my_like = conn.execute("SELECT 1 FROM interactions WHERE post_cid = ? AND user_peer_id = ? AND type = 'like'", (cid, peer_id)).fetchone()
-    my_dislike = conn.execute("SELECT 1 FROM interactions WHERE post_cid = ? AND user_peer_id = ? AND type = 'dislike'", (cid, peer_id)).fetchone()
-    
-    # Comments - return full metadata (user info + timestamp)
-    comments_rows = conn.execute("SELECT * FROM comments WHERE post_cid = ?", (cid,)).fetchall()
+    conn = await get_async_db_connection()
+    try:
+        # Counts
+        counts = counts_from_row(await conn.fetchone("SELECT likes, dislikes, views FROM post_counters WHERE post_cid = ?", (cid,)))
+        
+        # My status
+        mine = {r["type"] for r in await conn.fetchall(
+            "SELECT type FROM interactions WHERE post_cid = ? AND user_peer_id = ? AND type IN ('like', 'dislike')",
+            (cid, peer_id),
+        )}
+        
+        # Comments - return full metadata (user info + timestamp)
+        comments_rows = await conn.fetchall("SELECT * FROM comments WHERE post_cid = ?", (cid,))
+    finally:
+        await conn.close()
     comments = [
         {
             "text": c["text"],
@@ -1379,15 +1769,11 @@ async def get_post_interactions(cid: str, request: Request):
         for c in comments_rows
     ]
     
-    conn.close()
-    
     return {
-        "recommended": bool(my_like),
-        "not_recommended": bool(my_dislike),
+        "recommended": "like" in mine,
+        "not_recommended": "dislike" in mine,
         "comments": comments,
-        "views": views,
-        "likes_count": likes,
-        "dislikes_count": dislikes
+        **counts,
     }
 
 @app.post("/api/interactions/{cid}/like")
@@ -1395,42 +1781,41 @@ async def get_post_interactions(cid: str, request: Request):
 async def toggle_like(cid: str, request: Request):
     """Toggle like for a post"""
     peer_id = get_current_did(request)
-    conn = get_db_connection()
-    c = conn.cursor()
-    
-    # Check current status
-    existing = c.execute("SELECT id FROM interactions WHERE post_cid = ? AND user_peer_id = ? AND type = 'like'", (cid, peer_id)).fetchone()
-    
-    if existing:
-        # Unlike
-        c.execute("DELETE FROM interactions WHERE id = ?", (existing["id"],))
-        recommended = False
-    else:
-        # Like
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        c.execute("INSERT INTO interactions (post_cid, user_peer_id, type, timestamp) VALUES (?, ?, 'like', ?)", (cid, peer_id, timestamp))
-        recommended = True
-        
-        # Remove dislike if exists
-        c.execute("DELETE FROM interactions WHERE post_cid = ? AND user_peer_id = ? AND type = 'dislike'", (cid, peer_id))
+    conn = await get_async_db_connection()
+    try:
+        # Check current status
+        existing = await conn.fetchone("SELECT id FROM interactions WHERE post_cid = ? AND user_peer_id = ? AND type = 'like'", (cid, peer_id))
         
-        # Pin content to cluster
-        run_command([CLUSTER_CTL, "pin", "add", cid])
+        if existing:
+            # Unlike
+            await conn.execute("DELETE FROM interactions WHERE id = ?", (existing["id"],))
+            recommended = False
+        else:
+            # Like
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            await conn.execute("INSERT INTO interactions (post_cid, user_peer_id, type, timestamp) VALUES (?, ?, 'like', ?)", (cid, peer_id, timestamp))
+            recommended = True
             
-    conn.commit()
-    
-    # Get Updated Counts
-    likes = c.execute("SELECT COUNT(*) as count FROM interactions WHERE post_cid = ? AND type = 'like'", (cid,)).fetchone()["count"]
-    dislikes = c.execute("SELECT COUNT(*) as count FROM interactions WHERE post_cid = ? AND type = 'dislike'", (cid,)).fetchone()["count"]
-    conn.close()
+            # Remove dislike if exists
+            await conn.execute("DELETE FROM interactions WHERE post_cid = ? AND user_peer_id = ? AND type = 'dislike'", (cid, peer_id))
+        
+        # Updated counts (kept current by the interactions triggers)
+        counts = counts_from_row(await conn.fetchone("SELECT likes, dislikes, views FROM post_counters WHERE post_cid = ?", (cid,)))
+        await conn.commit()
+    finally:
+        await conn.close()
+
+    if recommended:
+        # Pin content to cluster in the background (ipfs-cluster-ctl can take seconds)
+        await asyncio.to_thread(job_queue.enqueue, "cluster_pin", {"cid": cid}, key=f"cluster_pin:{cid}")
     
     # Update manifest
-    update_social_manifest()
+    manifest_publisher.request()
     
     return {
         "recommended": recommended,
-        "likes_count": likes,
-        "dislikes_count": dislikes
+        "likes_count": counts["likes_count"],
+        "dislikes_count": counts["dislikes_count"]
     }
 
 @app.post("/api/interactions/{cid}/dislike")
@@ -1438,39 +1823,37 @@ async def toggle_like(cid: str, request: Request):
 async def toggle_dislike(cid: str, request: Request):
     """Toggle dislike for a post"""
     peer_id = get_current_did(request)
-    conn = get_db_connection()
-    c = conn.cursor()
-    
-    # Check current status
-    existing = c.execute("SELECT id FROM interactions WHERE post_cid = ? AND user_peer_id = ? AND type = 'dislike'", (cid, peer_id)).fetchone()
-    
-    if existing:
-        # Un-dislike
-        c.execute("DELETE FROM interactions WHERE id = ?", (existing["id"],))
-        not_recommended = False
-    else:
-        # Dislike
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        c.execute("INSERT INTO interactions (post_cid, user_peer_id, type, timestamp) VALUES (?, ?, 'dislike', ?)", (cid, peer_id, timestamp))
-        not_recommended = True
+    conn = await get_async_db_connection()
+    try:
+        # Check current status
+        existing = await conn.fetchone("SELECT id FROM interactions WHERE post_cid = ? AND user_peer_id = ? AND type = 'dislike'", (cid, peer_id))
         
-        # Remove like if exists
-        c.execute("DELETE FROM interactions WHERE post_cid = ? AND user_peer_id = ? AND type = 'like'", (cid, peer_id))
+        if existing:
+            # Un-dislike
+            await conn.execute("DELETE FROM interactions WHERE id = ?", (existing["id"],))
+            not_recommended = False
+        else:
+            # Dislike
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            await conn.execute("INSERT INTO interactions (post_cid, user_peer_id, type, timestamp) VALUES (?, ?, 'dislike', ?)", (cid, peer_id, timestamp))
+            not_recommended = True
             
-    conn.commit()
-    
-    # Get Updated Counts
-    likes = c.execute("SELECT COUNT(*) as count FROM interactions WHERE post_cid = ? AND type = 'like'", (cid,)).fetchone()["count"]
-    dislikes = c.execute("SELECT COUNT(*) as count FROM interactions WHERE post_cid = ? AND type = 'dislike'", (cid,)).fetchone()["count"]
-    conn.close()
+            # Remove like if exists
+            await conn.execute("DELETE FROM interactions WHERE post_cid = ? AND user_peer_id = ? AND type = 'like'", (cid, peer_id))
+        
+        # Updated counts (kept current by the interactions triggers)
+        counts = counts_from_row(await conn.fetchone("SELECT likes, dislikes, views FROM post_counters WHERE post_cid = ?", (cid,)))
+        await conn.commit()
+    finally:
+        await conn.close()
     
     # Update manifest
-    update_social_manifest()
+    manifest_publisher.request()
     
     return {
         "not_recommended": not_recommended,
-        "likes_count": likes,
-        "dislikes_count": dislikes
+        "likes_count": counts["likes_count"],
+        "dislikes_count": counts["dislikes_count"]
     }
 
 @app.post("/api/interactions/{cid}/comment")
@@ -1478,20 +1861,21 @@ async def toggle_dislike(cid: str, request: Request):
 async def add_comment(cid: str, comment: Comment, request: Request):
     """Add comment to a post"""
     peer_id = get_current_did(request)
-    conn = get_db_connection()
+    conn = await get_async_db_connection()
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Need username
-    user = conn.execute("SELECT username FROM users WHERE peer_id = ?", (peer_id,)).fetchone()
-    username = user["username"] if user else "Anonymous"
-    
-    conn.execute("""
-        INSERT INTO comments (post_cid, user_peer_id, username, text, timestamp)
-        VALUES (?, ?, ?, ?, ?)
-    """, (cid, peer_id, username, comment.text, timestamp))
-    
-    conn.commit()
-    conn.close()
+    try:
+        # Need username
+        user = await conn.fetchone("SELECT username FROM users WHERE peer_id = ?", (peer_id,))
+        username = user["username"] if user else "Anonymous"
+        
+        await conn.execute("""
+            INSERT INTO comments (post_cid, user_peer_id, username, text, timestamp)
+            VALUES (?, ?, ?, ?, ?)
+        """, (cid, peer_id, username, comment.text, timestamp))
+        
+        await conn.commit()
+    finally:
+        await conn.close()
     
     return {"success": True, "comment": comment.text}
 
@@ -1499,18 +1883,19 @@ async def add_comment(cid: str, comment: Comment, request: Request):
 @require_auth
 async def delete_comment(cid: str, index: int, request: Request = None):
     """Delete comment from a post by index (legacy support)"""
-    conn = get_db_connection()
-    # Fetch all comments for this post ordered by timestamp
-    comments = conn.execute("SELECT id FROM comments WHERE post_cid = ? ORDER BY timestamp ASC", (cid,)).fetchall()
-    
-    if index < 0 or index >= len(comments):
-        conn.close()
-        raise HTTPException(status_code=404, detail="Comment index out of range")
+    conn = await get_async_db_connection()
+    try:
+        # Fetch all comments for this post ordered by timestamp
+        comments = await conn.fetchall("SELECT id FROM comments WHERE post_cid = ? ORDER BY timestamp ASC", (cid,))
         
-    comment_id = comments[index]["id"]
-    conn.execute("DELETE FROM comments WHERE id = ?", (comment_id,))
-    conn.commit()
-    conn.close()
+        if index < 0 or index >= len(comments):
+            raise HTTPException(status_code=404, detail="Comment index out of range")
+            
+        comment_id = comments[index]["id"]
+        await conn.execute("DELETE FROM comments WHERE id = ?", (comment_id,))
+        await conn.commit()
+    finally:
+        await conn.close()
     
     return {"success": True}
 
@@ -1582,6 +1967,8 @@ def publish_to_ipns(library_cid: str) -> bool:
 
 async def resolve_ipns(peer_id: str) -> Optional[str]:
     """Resolve peer's IPNS name to get their library CID asynchronously"""
+    if rpc_client:
+        return await rpc_client.name_resolve(peer_id)
     try:
         cid = await run_command_async([IPFS_BIN, "name", "resolve", f"/ipns/{peer_id}"])
         return cid.strip() if cid else None
@@ -1603,10 +1990,29 @@ async def fetch_ipfs_json(cid: str) -> Union[List, Dict]:
         print(f"Fetch IPFS JSON error for {cid}: {e}")
         return []
 
-async def fetch_peer_library(library_cid: str) -> List[Dict]:
-    """Fetch library content from IPFS asynchronously"""
+async def fetch_peer_library(library_cid: str, limit: Optional[int] = None) -> List[Dict]:
+    """
+    Fetch library content from IPFS asynchronously.
+
+    v1.2 manifests point at a sharded `library_index`; shards are fetched
+    one at a time and only until `limit` posts are in hand. Older manifests
+    point at a flat JSON list.
+    """
+    if rpc_client:
+        try:
+            index = await rpc_client.dag_get(library_cid)
+        except Exception:
+            index = None
+        if isinstance(index, dict) and index.get("type") == "library_index":
+            library = []
+            async for post in iter_library_index(rpc_client, index):
+                library.append(post)
+                if limit is not None and len(library) >= limit:
+                    break
+            return library
     res = await fetch_ipfs_json(library_cid)
-    return res if isinstance(res, list) else []
+    library = res if isinstance(res, list) else []
+    return library[:limit] if limit is not None else library
 
 @app.post("/api/follow/{peer_id}")
 @require_auth
@@ -1650,11 +2056,14 @@ async def follow_peer(peer_id: str, request: Request, relationship_type: str = "
         # Traverse and Pin top items
         peer_library = []
         if library_cid:
-            peer_library = await social_dag.traverse_feed(library_cid, limit=10)
-            for item in peer_library:
+            # Start pinning each post as soon as the walk reaches it
+            pins = []
+            async for item in social_dag.iter_feed(library_cid, limit=10):
+                peer_library.append(item)
                 item_cid = item.get('cid', '')
                 if item_cid:
-                     await rpc_client.client.post(f"{rpc_client.base_url}/pin/add?arg={item_cid}")
+                    pins.append(rpc_client.client.post(f"{rpc_client.base_url}/pin/add?arg={item_cid}"))
+            await asyncio.gather(*pins)
         
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
@@ -1662,6 +2071,7 @@ async def follow_peer(peer_id: str, request: Request, relationship_type: str = "
             INSERT INTO following (user_peer_id, following_peer_id, relationship_type, timestamp, library_cid, username)
             VALUES (?, ?, ?, ?, ?, ?)
         """, (my_peer_id, peer_id, relationship_type, timestamp, library_cid, username))
+        insert_timeline_posts(conn, [(my_peer_id, peer_id, username)], peer_library)
         conn.commit()
         conn.close()
         
@@ -1696,6 +2106,7 @@ async def unfollow_peer(peer_id: str, request: Request):
              raise HTTPException(status_code=404, detail="Not following this peer")
          
     c.execute("DELETE FROM following WHERE user_peer_id = ? AND following_peer_id = ?", (my_peer_id, peer_id))
+    c.execute("DELETE FROM timeline WHERE user_peer_id = ? AND author_peer_id = ?", (my_peer_id, peer_id))
     conn.commit()
     conn.close()
     
@@ -1832,7 +2243,7 @@ async def sync_peers(request: Request):
                 library_cid = resolved_cid
                 nested_following = []
             else:
-                library_cid = manifest.get("library_cid")
+                library_cid = manifest.get("library_index") or manifest.get("library_cid")
                 nested_following = manifest.get("following", [])
             
             if not library_cid:
@@ -1844,8 +2255,8 @@ async def sync_peers(request: Request):
             sample_rate = 1.0 if depth == 0 else 0.2
 
             # Fetch and pin library content
-            peer_library = await fetch_peer_library(library_cid)
-            for item in peer_library[:15]: # Increased limit for direct peers
+            peer_library = await fetch_peer_library(library_cid, limit=15)
+            for item in peer_library: # Increased limit for direct peers
                 if item['cid'] not in pinned_cids:
                     # Stochastic Pinning: only pin if sample check passes
                     if random.random() < sample_rate:
@@ -1874,121 +2285,114 @@ async def sync_peers(request: Request):
         conn.commit()
     
     conn.close()
-    return {"success": True, "synced_peers": synced_count}
+
+    # Pick up anything the pubsub stream missed while we were offline
+    timeline_rows = 0
+    if timeline_store:
+        timeline_rows = (await timeline_store.backfill(my_peer_id, only_missing=False))["rows"]
+    return {"success": True, "synced_peers": synced_count, "timeline_rows": timeline_rows}
 
 @app.get("/api/feed/aggregated")
-async def get_aggregated_feed(request: Request, limit: int = 20, offset: int = 0):
-    """Get feed aggregated from own library + followed peers with pagination"""
+async def get_aggregated_feed(request: Request, limit: int = 20, offset: int = 0, cursor: Optional[str] = None,
+                              include_interactions: bool = False):
+    """
+    Get feed aggregated from own library + followed peers with pagination.
+
+    Followed peers' posts come from the materialized `timeline` table, so
+    the page is one keyset query over (timestamp, cid). Pass `next_cursor`
+    back as `cursor` for the following page; `offset` still works.
+    With `include_interactions`, each post carries its interaction summary
+    (as from /api/interactions/batch) under `interactions`.
+    """
     # Validate pagination parameters
     limit = max(1, min(limit, 100))  # Clamp between 1-100
     offset = max(0, offset)  # Non-negative offset
     
-    logger.info(f"Fetching feed with limit={limit}, offset={offset}")
+    logger.info(f"Fetching feed with limit={limit}, offset={offset}, cursor={bool(cursor)}")
     
     my_peer_id = get_current_did(request)
-    conn = get_db_connection()
-    c = conn.cursor()
-    
+    keyset = ""
+    params: list = [my_peer_id, my_peer_id, my_peer_id]
+    if cursor:
+        before_ts, before_cid = decode_cursor(cursor, 2)
+        keyset = "WHERE COALESCE(timestamp, '') < ? OR (COALESCE(timestamp, '') = ? AND cid < ?)"
+        params += [before_ts, before_ts, before_cid]
+        offset = 0
+    params += [limit + 1, offset]
+
+    conn = await get_async_db_connection()
     try:
-        # 1. Fetch my posts — include ALL fields for PostCard rendering
-        my_posts_rows = c.execute("""
-            SELECT id as cid, name, description, filename, type, author, avatar,
-                   timestamp, peer_id, size, is_pinned, content, visibility, 
-                   original_cid, tag
-            FROM posts
-        """).fetchall()
-        my_posts = [dict(r) for r in my_posts_rows]
-        
-        # 2. Fetch following
-        following_rows = c.execute("SELECT * FROM following WHERE user_peer_id = ?", (my_peer_id,)).fetchall()
-        following = [dict(r) for r in following_rows]
-        following_ids = [f["following_peer_id"] for f in following]
-        
-        # 3. Fetch interaction counts in batch
-        all_post_cids = [p["cid"] for p in my_posts]
-        interactions_map = {}
-        if all_post_cids:
-            # Batch query instead of fetching all interactions
-            counts_rows = c.execute("""
-                SELECT post_cid, type, COUNT(*) as count 
-                FROM interactions 
-                GROUP BY post_cid, type
-            """).fetchall()
-            for r in counts_rows:
-                cid = r["post_cid"]
-                if cid not in interactions_map:
-                    interactions_map[cid] = {"likes_count": 0, "dislikes_count": 0}
-                if r["type"] == "like":
-                    interactions_map[cid]["likes_count"] = r["count"]
-                elif r["type"] == "dislike":
-                    interactions_map[cid]["dislikes_count"] = r["count"]
-        
-        conn.close()
-        
-        all_posts = list(my_posts)
-        
-        # 4. Fetch followed content via Social DAG
-        for peer in following:
-            try:
-                peer_id = peer.get("following_peer_id")
-                raw_peer_id = peer_id.replace("did:ipfs:", "") if peer_id.startswith("did:ipfs:") else peer_id
-                resolved_cid = await rpc_client.name_resolve(raw_peer_id)
-                if resolved_cid:
-                    peer_library = await social_dag.traverse_feed(resolved_cid)
-                    for item in peer_library:
-                        item["_from_peer"] = peer.get("username", "Unknown")
-                        item["peer_id"] = peer_id
-                    all_posts.extend(peer_library)
-                elif peer.get("library_cid"):
-                    peer_library = await social_dag.traverse_feed(peer["library_cid"])
-                    for item in peer_library:
-                        item["_from_peer"] = peer.get("username", "Unknown")
-                        item["peer_id"] = peer_id
-                    all_posts.extend(peer_library)
-            except Exception as e:
-                logger.warning(f"Failed to fetch feed from {peer.get('username')}: {e}")
-
-        # 5. Privacy & Sentiment Filtering
-        filtered_posts = []
-        for item in all_posts:
-            cid = item.get("cid")
-            item_peer_id = item.get("peer_id")
-            
-            # Privacy Check
-            item_visibility = item.get("visibility", "public")
-            is_mine = item_peer_id == my_peer_id
-            is_from_connection = item_peer_id in following_ids
-            
-            if item_visibility == "connections" and not (is_mine or is_from_connection):
-                continue
-            
-            # Sentiment Filtering
-            item_stats = interactions_map.get(cid, {})
-            likes = item_stats.get("likes_count", 0)
-            dislikes = item_stats.get("dislikes_count", 0)
-            
-            if dislikes > likes and not (is_mine or is_from_connection):
-                continue
-            
-            filtered_posts.append(item)
-
-        # 6. Sort by timestamp and apply pagination
-        filtered_posts.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-        total_count = len(filtered_posts)
-        paginated_posts = filtered_posts[offset:offset+limit]
-        
-        logger.info(f"Returning {len(paginated_posts)} posts out of {total_count} total")
-        return {
-            "library": paginated_posts,
-            "count": len(paginated_posts),
-            "total": total_count,
-            "offset": offset,
-            "limit": limit
-        }
-        
+        # Local posts pass when they're mine or from someone I follow; anyone
+        # else's must be public and not net-disliked. Timeline rows are from
+        # followed peers by construction, and are skipped when the post is
+        # also in the local library so it isn't listed twice.
+        rows = await conn.fetchall(f"""
+            SELECT * FROM (
+                SELECT id AS cid, name, description, filename, type, author, avatar,
+                       timestamp, peer_id, size, is_pinned, content, visibility,
+                       original_cid, tag, NULL AS payload, NULL AS from_peer
+                FROM posts
+                WHERE peer_id = ?
+                   OR peer_id IN (SELECT following_peer_id FROM following WHERE user_peer_id = ?)
+                   OR (COALESCE(visibility, 'public') != 'connections'
+                       AND NOT EXISTS (SELECT 1 FROM post_counters pc
+                                       WHERE pc.post_cid = posts.id AND pc.dislikes > pc.likes))
+                UNION ALL
+                SELECT t.post_cid, NULL, NULL, NULL, NULL, NULL, NULL,
+                       t.timestamp, t.author_peer_id, NULL, NULL, NULL, NULL,
+                       NULL, NULL, t.payload, t.author_username
+                FROM timeline t
+                WHERE t.user_peer_id = ?
+                  AND NOT EXISTS (SELECT 1 FROM posts p WHERE p.id = t.post_cid)
+            ) feed
+            {keyset}
+            ORDER BY COALESCE(timestamp, '') DESC, cid DESC
+            LIMIT ? OFFSET ?
+        """, tuple(params))
+        summaries = {}
+        if include_interactions:
+            summaries = await interaction_summaries(conn, [r["cid"] for r in rows[:limit]], my_peer_id)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching aggregated feed: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch feed")
+    finally:
+        await conn.close()
+
+    has_more = len(rows) > limit
+    posts = []
+    for r in rows[:limit]:
+        row = dict(r)
+        payload = row.pop("payload")
+        from_peer = row.pop("from_peer")
+        if payload:
+            item = json.loads(payload)
+            item["cid"] = row["cid"]
+            item["peer_id"] = row["peer_id"]
+            item["_from_peer"] = from_peer or "Unknown"
+        else:
+            item = row
+        if include_interactions:
+            item["interactions"] = summaries.get(row["cid"])
+        posts.append(item)
+
+    next_cursor = None
+    if has_more and posts:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last["timestamp"] or "", last["cid"])
+
+    logger.info(f"Returning {len(posts)} posts (has_more={has_more})")
+    return {
+        "library": posts,
+        "count": len(posts),
+        # Exact totals would need a second full count; this is a lower bound.
+        "total": offset + len(posts) + (1 if has_more else 0),
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+        "offset": offset,
+        "limit": limit
+    }
 
 @app.get("/api/feed/recommended")
 async def get_recommended_feed(request: Request):
@@ -2070,62 +2474,100 @@ async def get_user_likes(peer_id: str):
 # ==================== Notifications ====================
 
 def create_notification(user_did: str, notif_type: str, title: str, message: str, link: str = ""):
-    """Create and push notification to real-time stream"""
+    """
+    Queue a notification; the write-behind batcher stores it within
+    NOTIFICATION_FLUSH_MS and then pushes it (with its id) to the stream.
+    """
     try:
-        conn = get_db_connection()
-        timestamp = datetime.now().isoformat()
-        conn.execute("""
-            INSERT INTO notifications (user_peer_id, type, title, message, link, timestamp, is_read)
-            VALUES (?, ?, ?, ?, ?, ?, 0)
-        """, (user_did, notif_type, title, message, link, timestamp))
-        conn.commit()
-        conn.close()
-        
-        # Push to real-time stream
-        queue = get_notification_queue(user_did)
-        try:
-            queue.put_nowait({
-                "type": notif_type,
-                "title": title,
-                "message": message,
-                "link": link,
-                "timestamp": timestamp
-            })
-        except asyncio.QueueFull:
-            logger.warning(f"Notification queue full for {user_did}")
-            
+        notification_writer.add(user_did, notif_type, title, message, link, datetime.now().isoformat())
     except Exception as e:
         logger.error(f"create_notification error: {e}")
 
+async def publish_unread(party: str, delta: int):
+    """
+    Apply a change to `party`'s unread message total (a chat uuid7 or a
+    peer id) and push the new total to their SSE stream as an "unread" event.
+    """
+    if not party or not delta:
+        return
+    unread_counters.adjust(party, delta)
+    try:
+        conn = await get_async_db_connection()
+        try:
+            did = party
+            if not party.startswith("did:"):
+                row = await conn.fetchone(
+                    "SELECT did, peer_id FROM users WHERE uuid7 = ? OR peer_id = ? LIMIT 1", (party, party)
+                )
+                if not row:
+                    return
+                did = row["did"] or row["peer_id"]
+            unread = await unread_counters.get(conn, party)
+        finally:
+            await conn.close()
+        await notification_bus.publish_async(did, {
+            "type": "unread",
+            "unread": unread,
+            "timestamp": datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"publish_unread error: {e}")
+
 @app.get("/api/stream")
 async def stream_notifications(request: Request):
-    """Server-Sent Events stream for real-time notifications"""
+    """
+    Server-Sent Events stream for real-time notifications.
+
+    Every open stream (each tab) gets its own buffer for as long as it is
+    connected; events that pile up while the client is busy go out
+    together in one write. Notification events carry their notification
+    id as the SSE event id: a reconnect with Last-Event-ID (sent by
+    EventSource automatically, or ?last_event_id=) first replays just
+    the notifications it missed. Past STREAM_REPLAY_MAX of them it gets a
+    {"type": "resync"} event instead of the rest, meaning reload the list.
+    """
     did = get_current_did(request)
     
     if did == "anonymous":
         raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    queue = get_notification_queue(did)
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.query_params.get("last_event_id")
+    resume_after = _as_int(last_event_id, -1) if last_event_id else -1
     
     async def event_generator():
+        # Subscribe before replaying so nothing published in between is lost
+        subscription = stream_registry.subscribe(did)
         try:
+            # Reconnect delay with jitter, so a proxy recycling every
+            # connection at once doesn't bring them all back together
+            yield f"retry: {random.randint(2000, 6000)}\n"
             # Send initial "connected" message
             yield f"data: {json.dumps({'type': 'connected'})}\n\n"
+
+            replayed_up_to = 0
+            if resume_after >= 0:
+                conn = await get_async_db_connection()
+                try:
+                    missed, complete = await notifications_since(conn, did, resume_after, STREAM_REPLAY_MAX)
+                finally:
+                    await conn.close()
+                if missed:
+                    replayed_up_to = missed[-1]["id"]
+                    yield "".join(sse_frame(event) for event in missed)
+                if not complete:
+                    yield sse_frame({"type": "resync"})
             
             while True:
-                try:
-                    # Wait for notification with 30-second heartbeat
-                    notification = await asyncio.wait_for(queue.get(), timeout=30)
-                    yield f"data: {json.dumps(notification)}\n\n"
-                except asyncio.TimeoutError:
-                    # Heartbeat
+                # Wait for notifications with 30-second heartbeat
+                batch = await subscription.next_batch(timeout=30)
+                batch = [e for e in batch if e.get("id") is None or e["id"] > replayed_up_to]
+                if batch:
+                    yield "".join(sse_frame(event) for event in batch)
+                else:
                     yield f": heartbeat\n\n"
-        except GeneratorExit:
-            # Client disconnected
-            try:
-                queue.task_done()
-            except:
-                pass
+        finally:
+            # Client disconnected (or server shutting down)
+            stream_registry.unsubscribe(subscription)
     
     return StreamingResponse(
         event_generator(),
@@ -2140,22 +2582,26 @@ async def stream_notifications(request: Request):
 async def get_notifications(request: Request):
     """Get notifications for the current user"""
     did = get_current_did(request)
-    conn = get_db_connection()
-    rows = conn.execute(
-        "SELECT * FROM notifications WHERE user_peer_id = ? ORDER BY timestamp DESC LIMIT 50",
-        (did,)
-    ).fetchall()
-    conn.close()
+    conn = await get_async_db_connection()
+    try:
+        rows = await conn.fetchall(
+            "SELECT * FROM notifications WHERE user_peer_id = ? ORDER BY timestamp DESC LIMIT 50",
+            (did,)
+        )
+    finally:
+        await conn.close()
     return {"notifications": [dict(r) for r in rows]}
 
 @app.post("/api/notifications/{notif_id}/read")
 @require_auth
 async def mark_notification_read(notif_id: int, request: Request = None):
     """Mark a notification as read"""
-    conn = get_db_connection()
-    conn.execute("UPDATE notifications SET is_read = 1 WHERE id = ?", (notif_id,))
-    conn.commit()
-    conn.close()
+    conn = await get_async_db_connection()
+    try:
+        await conn.execute("UPDATE notifications SET is_read = 1 WHERE id = ?", (notif_id,))
+        await conn.commit()
+    finally:
+        await conn.close()
     return {"success": True}
 
 @app.post("/api/notifications/read-all")
@@ -2163,12 +2609,49 @@ async def mark_notification_read(notif_id: int, request: Request = None):
 async def mark_all_notifications_read(request: Request):
     """Mark all notifications as read"""
     did = get_current_did(request)
-    conn = get_db_connection()
-    conn.execute("UPDATE notifications SET is_read = 1 WHERE user_peer_id = ?", (did,))
-    conn.commit()
-    conn.close()
+    conn = await get_async_db_connection()
+    try:
+        await conn.execute("UPDATE notifications SET is_read = 1 WHERE user_peer_id = ?", (did,))
+        await conn.commit()
+    finally:
+        await conn.close()
     return {"success": True}
 
+NOTIFICATION_READ_MAX_IDS = 1000
+
+@app.post("/api/notifications/read")
+@require_auth
+async def mark_notifications_read(body: NotificationReadReq, request: Request):
+    """
+    Mark several notifications as read: every id in `ids`, and/or every
+    notification up to and including id `up_to`. Ids are collapsed into
+    runs, so each run is one range on the (user_peer_id, id) index.
+    """
+    did = get_current_did(request)
+    if len(body.ids) > NOTIFICATION_READ_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {NOTIFICATION_READ_MAX_IDS} ids per request")
+    ranges = id_ranges(body.ids)
+    if body.up_to is not None:
+        ranges.append((0, body.up_to))
+    if not ranges:
+        return {"success": True, "updated": 0}
+
+    updated = 0
+    conn = await get_async_db_connection()
+    try:
+        for i in range(0, len(ranges), 100):
+            chunk = ranges[i:i + 100]
+            where = " OR ".join("id BETWEEN ? AND ?" for _ in chunk)
+            cur = await conn.execute(
+                f"UPDATE notifications SET is_read = 1 WHERE user_peer_id = ? AND is_read = 0 AND ({where})",
+                (did, *[bound for r in chunk for bound in r]),
+            )
+            updated += max(cur.rowcount, 0)
+        await conn.commit()
+    finally:
+        await conn.close()
+    return {"success": True, "updated": updated}
+
 # ==================== Direct Messages (DM) System ====================
 
 def get_my_peer_id() -> str:
@@ -2195,19 +2678,21 @@ async def get_discovered_peers():
     """).fetchall()
     conn.close()
     
-    results = []
-    for p in peers:
-        peer_data = dict(p)
+    async def latest_post_preview(dag_root: Optional[str]) -> Optional[str]:
         # Traverse the DAG to get the latest post preview if we have a dag_root
-        preview = None
-        if peer_data.get("dag_root"):
-            try:
-                # Stochastic traversal for preview
-                posts = await social_dag.traverse_feed(peer_data["dag_root"], limit=1)
-                if posts:
-                    preview = posts[0].get("name")
-            except: pass
-            
+        if not dag_root or not social_dag:
+            return None
+        try:
+            posts = await social_dag.traverse_feed(dag_root, limit=1)
+            return posts[0].get("name") if posts else None
+        except Exception:
+            return None
+
+    peer_rows = [dict(p) for p in peers]
+    previews = await asyncio.gather(*(latest_post_preview(p.get("dag_root")) for p in peer_rows))
+
+    results = []
+    for peer_data, preview in zip(peer_rows, previews):
         results.append({
             "peer_id": peer_data["peer_id"],
             "username": peer_data["username"] or f"User_{peer_data['peer_id'][:6]}",
@@ -2221,40 +2706,26 @@ async def get_discovered_peers():
 
 @app.get("/api/messages")
 async def list_conversations(request: Request):
-    """List all active conversations"""
+    """List all active conversations, newest first."""
     my_peer_id = get_current_did(request)
-    conn = get_db_connection()
-    c = conn.cursor()
-    
-    # Get distinct peers with latest message
-    # SQL to get latest message per peer is complex, simpler: get all messages, group in python? 
-    # Or simplified query:
-    query = """
-        SELECT 
-            CASE WHEN sender_peer_id = ? THEN receiver_peer_id ELSE sender_peer_id END as peer_id,
-            text, timestamp, is_read
-        FROM messages 
-        WHERE sender_peer_id = ? OR receiver_peer_id = ?
-        ORDER BY timestamp DESC
-    """
-    rows = c.execute(query, (my_peer_id, my_peer_id, my_peer_id)).fetchall()
-    
-    conversations = {}
-    for r in rows:
-        pid = r["peer_id"]
-        if pid not in conversations:
-            conversations[pid] = {
-                "peer_id": pid,
-                "last_message": r["text"],
-                "timestamp": r["timestamp"],
-                "unread_count": 0 if r["is_read"] or r["peer_id"] == my_peer_id else 1 # logic approx
-            }
-        else:
-             # Just counting unreads if it's incoming and unread
-             pass # logic for unread count omitted for brevity/simplicity unless column exists
-             
-    conn.close()
-    return {"conversations": list(conversations.values())}
+    conn = await get_async_db_connection()
+    try:
+        rows = await conversation_summaries(conn, my_peer_id, users_key="peer_id")
+    finally:
+        await conn.close()
+
+    conversations = [
+        {
+            "peer_id": c["peer"],
+            "last_message": c["last_message"],
+            "timestamp": c["last_timestamp"],
+            "unread_count": c["unread"],
+            "username": c["username"],
+            "avatar": c["avatar"],
+        }
+        for c in rows
+    ]
+    return {"conversations": conversations}
 
 @app.get("/api/network-info")
 def get_network_info():
@@ -2270,8 +2741,18 @@ def get_network_info():
         return {"ip": "127.0.0.1"}
 
 @app.get("/api/messages/{peer_id}")
-async def get_chat_history(peer_id: str, request: Request, limit: int = 50, offset: int = 0):
-    """Get chat history with a specific peer with pagination"""
+async def get_chat_history(peer_id: str, request: Request, limit: int = 50, offset: int = 0,
+                           cursor: Optional[str] = None, include_total: bool = False):
+    """
+    Get chat history with a specific peer, one page of the newest messages
+    in chronological order.
+
+    Each direction of the conversation is a range scan on
+    idx_messages_conversation_keyset; the two are merged on (timestamp, id),
+    a NULL timestamp sorting as the oldest. Pass `next_cursor` back as
+    `cursor` for older messages. `total` is a lower
+    bound unless `include_total` asks for the exact count.
+    """
     my_peer_id = get_current_did(request)
     
     # Validate parameters
@@ -2279,46 +2760,81 @@ async def get_chat_history(peer_id: str, request: Request, limit: int = 50, offs
     offset = max(0, offset)
     
     logger.info(f"Fetching chat history between {my_peer_id} and {peer_id}")
+
+    keyset, keyset_params = "", ()
+    if cursor:
+        before_ts, before_id = decode_cursor(cursor, 2)
+        keyset = "AND (COALESCE(timestamp, '') < ? OR (COALESCE(timestamp, '') = ? AND id < ?))"
+        keyset_params = (before_ts, before_ts, before_id)
+        offset = 0
+    # Each side needs enough rows to fill the page on its own
+    side = f"""
+        SELECT * FROM (
+            SELECT id, sender_peer_id AS sender, text, timestamp, cid, filename, mime_type, is_read
+            FROM messages
+            WHERE sender_peer_id = ? AND receiver_peer_id = ? {{self_chat}} {keyset}
+            ORDER BY COALESCE(timestamp, '') DESC, id DESC
+            LIMIT ?
+        ) {{alias}}
+    """
+    query = f"""
+        SELECT * FROM (
+            {side.format(self_chat="", alias="sent")}
+            UNION ALL
+            {side.format(self_chat="AND sender_peer_id <> receiver_peer_id", alias="received")}
+        ) conversation
+        ORDER BY COALESCE(timestamp, '') DESC, id DESC
+        LIMIT ? OFFSET ?
+    """
+    side_limit = offset + limit + 1
+    params = (my_peer_id, peer_id, *keyset_params, side_limit,
+              peer_id, my_peer_id, *keyset_params, side_limit,
+              limit + 1, offset)
     
     try:
-        conn = get_db_connection()
-        
-        # Get total count
-        count_query = """
-            SELECT COUNT(*) as total FROM messages 
-            WHERE (sender_peer_id = ? AND receiver_peer_id = ?) 
-               OR (sender_peer_id = ? AND receiver_peer_id = ?)
-        """
-        total = conn.execute(count_query, (my_peer_id, peer_id, peer_id, my_peer_id)).fetchone()["total"]
-        
-        # Mark messages as read for current user
-        conn.execute("""
-            UPDATE messages SET is_read = 1 
-            WHERE receiver_peer_id = ? AND sender_peer_id = ?
-        """, (my_peer_id, peer_id))
-        conn.commit()
-        
-        # Fetch messages with pagination and ordering
-        query = """
-            SELECT sender_peer_id as sender, text, timestamp, cid, filename, mime_type, is_read
-            FROM messages 
-            WHERE (sender_peer_id = ? AND receiver_peer_id = ?) 
-               OR (sender_peer_id = ? AND receiver_peer_id = ?)
-            ORDER BY timestamp DESC
-            LIMIT ? OFFSET ?
-        """
-        rows = conn.execute(query, (my_peer_id, peer_id, peer_id, my_peer_id, limit, offset)).fetchall()
+        conn = await get_async_db_connection()
+        try:
+            total = None
+            if include_total:
+                total = (await conn.fetchone("""
+                    SELECT COUNT(*) as total FROM messages 
+                    WHERE (sender_peer_id = ? AND receiver_peer_id = ?) 
+                       OR (sender_peer_id = ? AND receiver_peer_id = ?)
+                """, (my_peer_id, peer_id, peer_id, my_peer_id)))["total"]
+            
+            # Mark messages as read for current user
+            marked = await conn.execute("""
+                UPDATE messages SET is_read = 1 
+                WHERE receiver_peer_id = ? AND sender_peer_id = ? AND is_read = 0
+            """, (my_peer_id, peer_id))
+            await conn.commit()
+            
+            rows = await conn.fetchall(query, params)
+        finally:
+            await conn.close()
+        if marked.rowcount > 0:
+            await publish_unread(my_peer_id, -marked.rowcount)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["timestamp"] or "", rows[-1]["id"]) if has_more else None
         history = [dict(r) for r in reversed(rows)]  # Reverse to get chronological order
-        conn.close()
+        for message in history:
+            message.pop("id")
+        if total is None:
+            total = offset + len(history) + (1 if has_more else 0)
         
-        logger.info(f"Returning {len(history)} messages out of {total} total")
+        logger.info(f"Returning {len(history)} messages (has_more={has_more})")
         return {
             "history": history,
             "count": len(history),
             "total": total,
+            "has_more": has_more,
+            "next_cursor": next_cursor,
             "offset": offset,
             "limit": limit
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching chat history: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch chat history")
@@ -2360,6 +2876,7 @@ async def send_message(peer_id: str, body: dict, request: Request):
         conn.commit()
         conn.close()
         logger.info(f"Stored message in database")
+        await publish_unread(peer_id, 1)
         
         # 3. Notify peer via P2P pubsub
         inbox_topic = f"inbox:{peer_id}"
@@ -2415,8 +2932,8 @@ async def handle_inbox_message(data: dict):
             return
             
         # Verify Signature
-        if not verify_message(payload_str, signature, sender_did):
-            print(f"Invalid signature from {sender_did}")
+        if not await verify_message_async(payload_str, signature, sender_did):
+            logger.debug(f"Invalid signature from {sender_did}")
             return
             
         # Parse content
@@ -2451,6 +2968,7 @@ async def handle_inbox_message(data: dict):
         """, (sender_peer_id, my_peer_id, text, timestamp or datetime.now().isoformat(), cid, filename, mime_type))
         conn.commit()
         conn.close()
+        await publish_unread(my_peer_id, 1)
         
         print(f"Received P2P message from {sender_peer_id}: {text[:20]}...")
         
@@ -2769,6 +3287,7 @@ async def update_profile_endpoint(
 
     conn.commit()
     conn.close()
+    user_index.upsert(profile["peer_id"], profile.get("username"), profile.get("handle"), profile.get("uuid7"))
     return {"success": True, "profile": profile}
 
 # ==================== Social Recovery System ====================
@@ -2917,6 +3436,7 @@ async def restore_identity(shards: List[str] = Form(...)):
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (did, username, f"@{username.lower()}", avatar, did, secret))
             conn.commit()
+            user_index.upsert(did, username, f"@{username.lower()}", None)
             msg = "Identity recovered and registered."
         else:
             # Update secret just in case (though it should match)
@@ -2947,7 +3467,7 @@ async def start_recovery(old_peer_id: str = Form(...), new_peer_id: str = Form(.
     
     conn = get_db_connection()
     c = conn.cursor()
-    if conn._is_postgres:
+    if conn.is_postgres:
         req_id = c.execute(
             """
             INSERT INTO recovery_requests (old_peer_id, new_peer_id, timestamp, status)
@@ -3012,32 +3532,36 @@ def get_chat_uuid7(request: Request) -> str:
     """Extract the caller's UUID7 from the X-UUID7 header."""
     return request.headers.get("X-UUID7", "").strip()
 
-def check_mutual_sync(conn, my_uuid7: str, peer_uuid7: str) -> bool:
+async def check_mutual_sync(conn, my_uuid7: str, peer_uuid7: str) -> bool:
     """Return True only when BOTH users have synced each other."""
-    a = conn.execute(
+    a = await conn.fetchone(
         "SELECT 1 FROM connections WHERE from_uuid7 = ? AND to_uuid7 = ?",
         (my_uuid7, peer_uuid7),
-    ).fetchone()
-    b = conn.execute(
+    )
+    b = await conn.fetchone(
         "SELECT 1 FROM connections WHERE from_uuid7 = ? AND to_uuid7 = ?",
         (peer_uuid7, my_uuid7),
-    ).fetchone()
+    )
     return bool(a and b)
 
 
 @app.get("/api/chat/unread")
 async def chat_unread_count(request: Request):
-    """Return total unread message count for the sidebar badge."""
+    """
+    Return total unread message count for the sidebar badge.
+
+    Served from the in-memory counters; the /api/stream SSE stream also
+    pushes {"type": "unread"} events whenever the total changes.
+    """
     my_uuid7 = get_chat_uuid7(request)
     if not my_uuid7:
         return {"unread": 0}
-    conn = get_db_connection()
-    row = conn.execute(
-        "SELECT COUNT(*) as count FROM messages WHERE receiver_peer_id = ? AND is_read = 0",
-        (my_uuid7,),
-    ).fetchone()
-    conn.close()
-    return {"unread": int(row["count"]) if row else 0}
+    conn = await get_async_db_connection()
+    try:
+        unread = await unread_counters.get(conn, my_uuid7)
+    finally:
+        await conn.close()
+    return {"unread": unread}
 
 
 @app.get("/api/chat/contacts")
@@ -3046,20 +3570,22 @@ async def chat_contacts(request: Request):
     my_uuid7 = get_chat_uuid7(request)
     if not my_uuid7:
         return {"contacts": []}
-    conn = get_db_connection()
-    rows = conn.execute(
-        """
-        SELECT u.uuid7, u.username, u.avatar, u.bio
-        FROM connections c1
-        JOIN connections c2
-          ON c1.to_uuid7   = c2.from_uuid7
-         AND c2.to_uuid7   = c1.from_uuid7
-        JOIN users u ON u.uuid7 = c1.to_uuid7
-        WHERE c1.from_uuid7 = ?
-        """,
-        (my_uuid7,),
-    ).fetchall()
-    conn.close()
+    conn = await get_async_db_connection()
+    try:
+        rows = await conn.fetchall(
+            """
+            SELECT u.uuid7, u.username, u.avatar, u.bio
+            FROM connections c1
+            JOIN connections c2
+              ON c1.to_uuid7   = c2.from_uuid7
+             AND c2.to_uuid7   = c1.from_uuid7
+            JOIN users u ON u.uuid7 = c1.to_uuid7
+            WHERE c1.from_uuid7 = ?
+            """,
+            (my_uuid7,),
+        )
+    finally:
+        await conn.close()
     return {"contacts": [dict(r) for r in rows]}
 
 
@@ -3069,51 +3595,25 @@ async def chat_conversations(request: Request):
     my_uuid7 = get_chat_uuid7(request)
     if not my_uuid7:
         return {"conversations": []}
-    conn = get_db_connection()
-
-    # Fetch all messages involving me, newest first
-    rows = conn.execute(
-        """
-        SELECT sender_peer_id, receiver_peer_id, text, timestamp, is_read
-        FROM messages
-        WHERE sender_peer_id = ? OR receiver_peer_id = ?
-        ORDER BY timestamp DESC
-        """,
-        (my_uuid7, my_uuid7),
-    ).fetchall()
+    conn = await get_async_db_connection()
+    try:
+        return {"conversations": await _chat_conversations(conn, my_uuid7)}
+    finally:
+        await conn.close()
 
-    # Group by conversation partner in Python
-    seen: dict = {}
-    for r in rows:
-        r = dict(r)
-        peer = (
-            r["receiver_peer_id"]
-            if r["sender_peer_id"] == my_uuid7
-            else r["sender_peer_id"]
-        )
-        if peer not in seen:
-            seen[peer] = {
-                "peer_uuid7": peer,
-                "last_message": r["text"] or "",
-                "timestamp": r["timestamp"],
-                "unread_count": 0,
-            }
-        # Count unread incoming messages
-        if r["receiver_peer_id"] == my_uuid7 and not r["is_read"]:
-            seen[peer]["unread_count"] += 1
-
-    # Enrich with user info
-    conversations = []
-    for peer_uuid7, conv in seen.items():
-        user = conn.execute(
-            "SELECT username, avatar FROM users WHERE uuid7 = ?", (peer_uuid7,)
-        ).fetchone()
-        conv["username"] = user["username"] if user else f"User {peer_uuid7[:8]}"
-        conv["avatar"] = user["avatar"] if user else ""
-        conversations.append(conv)
 
-    conn.close()
-    return {"conversations": conversations}
+async def _chat_conversations(conn, my_uuid7: str) -> list:
+    return [
+        {
+            "peer_uuid7": c["peer"],
+            "last_message": c["last_message"] or "",
+            "timestamp": c["last_timestamp"],
+            "unread_count": c["unread"],
+            "username": c["username"] or f"User {c['peer'][:8]}",
+            "avatar": c["avatar"] or "",
+        }
+        for c in await conversation_summaries(conn, my_uuid7, users_key="uuid7")
+    ]
 
 
 @app.get("/api/chat/{peer_uuid7}")
@@ -3123,33 +3623,35 @@ async def chat_history(peer_uuid7: str, request: Request):
     if not my_uuid7:
         raise HTTPException(status_code=401, detail="X-UUID7 header required")
 
-    conn = get_db_connection()
-
-    if not check_mutual_sync(conn, my_uuid7, peer_uuid7):
-        conn.close()
-        raise HTTPException(status_code=403, detail="Not mutually synced with this user")
+    conn = await get_async_db_connection()
+    try:
+        if not await check_mutual_sync(conn, my_uuid7, peer_uuid7):
+            raise HTTPException(status_code=403, detail="Not mutually synced with this user")
 
-    rows = conn.execute(
-        """
-        SELECT sender_uuid7, receiver_uuid7, sender_peer_id, receiver_peer_id,
-               text, timestamp, is_read
-        FROM messages
-        WHERE (sender_uuid7 = ? AND receiver_uuid7 = ?)
-           OR (sender_uuid7 = ? AND receiver_uuid7 = ?)
-        ORDER BY timestamp ASC
-        """,
-        (my_uuid7, peer_uuid7, peer_uuid7, my_uuid7),
-    ).fetchall()
+        rows = await conn.fetchall(
+            """
+            SELECT sender_uuid7, receiver_uuid7, sender_peer_id, receiver_peer_id,
+                   text, timestamp, is_read
+            FROM messages
+            WHERE (sender_uuid7 = ? AND receiver_uuid7 = ?)
+               OR (sender_uuid7 = ? AND receiver_uuid7 = ?)
+            ORDER BY timestamp ASC
+            """,
+            (my_uuid7, peer_uuid7, peer_uuid7, my_uuid7),
+        )
 
-    # Mark incoming messages as read
-    conn.execute(
-        "UPDATE messages SET is_read = 1 WHERE receiver_uuid7 = ? AND sender_uuid7 = ?",
-        (my_uuid7, peer_uuid7),
-    )
-    conn.commit()
+        # Mark incoming messages as read
+        marked = await conn.execute(
+            "UPDATE messages SET is_read = 1 WHERE receiver_uuid7 = ? AND sender_uuid7 = ? AND is_read = 0",
+            (my_uuid7, peer_uuid7),
+        )
+        await conn.commit()
+    finally:
+        await conn.close()
 
+    if marked.rowcount > 0:
+        await publish_unread(my_uuid7, -marked.rowcount)
     history = [dict(r) for r in rows]
-    conn.close()
     return {"history": history}
 
 
@@ -3169,23 +3671,24 @@ async def chat_send(peer_uuid7: str, body: ChatMessageBody, request: Request):
     if not text:
         raise HTTPException(status_code=400, detail="Message cannot be empty")
 
-    conn = get_db_connection()
-
-    if not check_mutual_sync(conn, my_uuid7, peer_uuid7):
-        conn.close()
-        raise HTTPException(status_code=403, detail="Not mutually synced with this user")
+    conn = await get_async_db_connection()
+    try:
+        if not await check_mutual_sync(conn, my_uuid7, peer_uuid7):
+            raise HTTPException(status_code=403, detail="Not mutually synced with this user")
 
-    timestamp = datetime.now().isoformat()
-    conn.execute(
-        """
-        INSERT INTO messages (sender_uuid7, receiver_uuid7, text, timestamp, is_read)
-        VALUES (?, ?, ?, ?, 0)
-        """,
-        (my_uuid7, peer_uuid7, text, timestamp),
-    )
-    conn.commit()
-    conn.close()
+        timestamp = datetime.now().isoformat()
+        await conn.execute(
+            """
+            INSERT INTO messages (sender_uuid7, receiver_uuid7, text, timestamp, is_read)
+            VALUES (?, ?, ?, ?, 0)
+            """,
+            (my_uuid7, peer_uuid7, text, timestamp),
+        )
+        await conn.commit()
+    finally:
+        await conn.close()
 
+    await publish_unread(peer_uuid7, 1)
     return {"success": True, "timestamp": timestamp}
 
 
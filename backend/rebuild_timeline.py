@@ -0,0 +1,51 @@
+"""
+Rebuild the materialized `timeline` table from `following` rows.
+
+Usage:
+    python rebuild_timeline.py                 # drop and rebuild every user's timeline
+    python rebuild_timeline.py --user <did>    # only one user's
+    python rebuild_timeline.py --missing-only  # just backfill follows with no rows yet
+
+Needs the IPFS RPC API (IPFS_RPC_HOST / IPFS_RPC_PORT) to walk peers' feeds.
+"""
+import argparse
+import asyncio
+import os
+
+from database import init_db, get_db_connection, close_pool
+from utils.ipfs_rpc import IPFSRPCClient
+from utils.dag_cache import DagCache
+from utils.social_dag import SocialDAG
+from utils.feed_engine import FeedEngine
+from utils.timeline import TimelineStore
+
+
+async def rebuild(user: str = None, missing_only: bool = False, depth: int = 50):
+    rpc_client = IPFSRPCClient(
+        host=os.getenv("IPFS_RPC_HOST", "http://127.0.0.1"),
+        port=int(os.getenv("IPFS_RPC_PORT", "5001")),
+        dag_cache=DagCache(disk_path=os.getenv("DAG_CACHE_PATH") or None),
+    )
+    social_dag = SocialDAG(rpc_client)
+    feed_engine = FeedEngine(rpc_client, social_dag)
+    store = TimelineStore(social_dag, get_db_connection, feed_engine, backfill_depth=depth)
+
+    if missing_only:
+        result = await store.backfill(user, only_missing=True)
+    else:
+        result = await store.rebuild(user)
+    print(f"✅ Timeline rebuilt: {result['peers']} peers, {result['rows']} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the materialized feed timeline")
+    parser.add_argument("--user", help="Only rebuild this user's timeline (peer_id / DID)")
+    parser.add_argument("--missing-only", action="store_true", help="Backfill follows that have no timeline rows yet")
+    parser.add_argument("--depth", type=int, default=50, help="Posts to materialize per followed peer")
+    args = parser.parse_args()
+
+    init_db()
+    try:
+        asyncio.run(rebuild(args.user, args.missing_only, args.depth))
+    finally:
+        close_pool()
@@ -0,0 +1,28 @@
+"""
+Recompute the `post_counters` table from `interactions`.
+
+Usage:
+    python reconcile_counters.py               # check and fix every post
+    python reconcile_counters.py --post <cid>  # only these posts (repeatable)
+
+The server also runs this every COUNTER_RECONCILE_INTERVAL seconds.
+"""
+import argparse
+
+from database import init_db, get_db_connection, close_pool
+from utils.counters import reconcile_post_counters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile per-post interaction counters")
+    parser.add_argument("--post", action="append", help="Only reconcile this post cid")
+    args = parser.parse_args()
+
+    init_db()
+    conn = get_db_connection()
+    try:
+        fixed = reconcile_post_counters(conn, args.post)
+        print(f"✅ Counters reconciled: {fixed} rows corrected")
+    finally:
+        conn.close()
+        close_pool()
@@ -0,0 +1,32 @@
+from typing import Dict, List
+
+# Conversations `party` is in, newest first, from the trigger-maintained
+# `conversations` table (database.py). A pair is stored once as
+# (peer_a, peer_b), so each side is one primary-key/index range.
+_CONVERSATIONS_SQL = """
+    SELECT c.peer, c.last_message, c.last_sender, c.last_timestamp, c.unread,
+           u.username, u.avatar
+    FROM (
+        SELECT peer_b AS peer, last_message, last_sender, last_timestamp, unread_a AS unread
+        FROM conversations WHERE peer_a = ?
+        UNION ALL
+        SELECT peer_a, last_message, last_sender, last_timestamp, unread_b
+        FROM conversations WHERE peer_b = ? AND peer_a <> peer_b
+    ) c
+    LEFT JOIN users u ON u.{users_key} = c.peer
+    ORDER BY c.last_timestamp DESC, c.peer
+    LIMIT ?
+"""
+
+
+async def conversation_summaries(conn, party: str, users_key: str = "uuid7", limit: int = 500) -> List[Dict]:
+    """
+    One row per conversation partner of `party`: last message, its sender
+    and timestamp, how many messages `party` hasn't read, and the partner's
+    username/avatar looked up by `users_key` ("uuid7" for /api/chat,
+    "peer_id" for /api/messages). `conn` is an async connection.
+    """
+    if users_key not in ("uuid7", "peer_id"):
+        raise ValueError(f"unsupported users_key {users_key!r}")
+    rows = await conn.fetchall(_CONVERSATIONS_SQL.format(users_key=users_key), (party, party, limit))
+    return [dict(r) for r in rows]
@@ -0,0 +1,128 @@
+from typing import Dict, Iterable, Optional
+
+_RECOUNT_SQL = """
+    SELECT post_cid,
+           SUM(CASE WHEN type = 'like' THEN 1 ELSE 0 END) AS likes,
+           SUM(CASE WHEN type = 'dislike' THEN 1 ELSE 0 END) AS dislikes,
+           SUM(CASE WHEN type = 'view' THEN 1 ELSE 0 END) AS views
+    FROM interactions
+    WHERE post_cid IS NOT NULL {where}
+    GROUP BY post_cid
+"""
+
+
+def counts_from_row(row) -> Dict[str, int]:
+    """API shape for a post_counters row (or zeros when the post has none)."""
+    if not row:
+        return {"likes_count": 0, "dislikes_count": 0, "views": 0}
+    return {"likes_count": row["likes"], "dislikes_count": row["dislikes"], "views": row["views"]}
+
+
+def reconcile_post_counters(conn, post_cids: Optional[Iterable[str]] = None) -> int:
+    """
+    Recompute post_counters from `interactions` and fix any row that drifted.
+
+    Covers every post, or just `post_cids`. Rows for posts that no longer have
+    any interactions are dropped. Returns the number of rows corrected.
+
+    Runs as one transaction that holds off interaction writes (SQLite's
+    write lock; a SHARE lock on `interactions` on Postgres), so a like
+    counted by the trigger can't land between the recount and the fix and
+    be overwritten. Commits.
+    """
+    where, params = "", ()
+    if post_cids is not None:
+        post_cids = list(post_cids)
+        if not post_cids:
+            return 0
+        placeholders = ",".join("?" * len(post_cids))
+        where, params = f"AND post_cid IN ({placeholders})", tuple(post_cids)
+
+    try:
+        if conn.is_postgres:
+            conn.execute("LOCK TABLE interactions IN SHARE MODE")
+        else:
+            conn.execute("BEGIN IMMEDIATE")
+        fixed = _reconcile(conn, where, params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return fixed
+
+
+def _reconcile(conn, where: str, params: tuple) -> int:
+    actual = {
+        r["post_cid"]: (r["likes"], r["dislikes"], r["views"])
+        for r in conn.execute(_RECOUNT_SQL.format(where=where), params).fetchall()
+    }
+    stored = {
+        r["post_cid"]: (r["likes"], r["dislikes"], r["views"])
+        for r in conn.execute(
+            f"SELECT post_cid, likes, dislikes, views FROM post_counters WHERE post_cid IS NOT NULL {where}", params
+        ).fetchall()
+    }
+
+    fixed = 0
+    for cid, counts in actual.items():
+        if stored.get(cid) == counts:
+            continue
+        if cid in stored:
+            conn.execute(
+                "UPDATE post_counters SET likes = ?, dislikes = ?, views = ? WHERE post_cid = ?",
+                (*counts, cid),
+            )
+        else:
+            conn.execute(
+                "INSERT INTO post_counters (post_cid, likes, dislikes, views) VALUES (?, ?, ?, ?)",
+                (cid, *counts),
+            )
+        fixed += 1
+    for cid in stored.keys() - actual.keys():
+        conn.execute("DELETE FROM post_counters WHERE post_cid = ?", (cid,))
+        fixed += 1
+    return fixed
+
+
+async def interaction_summaries(conn, post_cids: Iterable[str], viewer: Optional[str]) -> Dict[str, Dict]:
+    """
+    Counts, the viewer's like/dislike state and comment count for each post.
+
+    Three queries regardless of how many posts are asked for; `conn` is an
+    async connection. Every requested cid gets an entry, zeroed if unknown.
+    """
+    post_cids = list(dict.fromkeys(c for c in post_cids if c))
+    if not post_cids:
+        return {}
+    placeholders = ",".join("?" * len(post_cids))
+    params = tuple(post_cids)
+
+    counters = {
+        r["post_cid"]: r for r in await conn.fetchall(
+            f"SELECT post_cid, likes, dislikes, views FROM post_counters WHERE post_cid IN ({placeholders})", params
+        )
+    }
+    mine: Dict[str, set] = {}
+    if viewer:
+        for r in await conn.fetchall(
+            f"""SELECT post_cid, type FROM interactions
+                WHERE user_peer_id = ? AND type IN ('like', 'dislike') AND post_cid IN ({placeholders})""",
+            (viewer, *params),
+        ):
+            mine.setdefault(r["post_cid"], set()).add(r["type"])
+    comments = {
+        r["post_cid"]: r["count"] for r in await conn.fetchall(
+            f"SELECT post_cid, COUNT(*) AS count FROM comments WHERE post_cid IN ({placeholders}) GROUP BY post_cid",
+            params,
+        )
+    }
+
+    return {
+        cid: {
+            **counts_from_row(counters.get(cid)),
+            "recommended": "like" in mine.get(cid, ()),
+            "not_recommended": "dislike" in mine.get(cid, ()),
+            "comments_count": comments.get(cid, 0),
+        }
+        for cid in post_cids
+    }
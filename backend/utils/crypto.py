@@ -1,11 +1,24 @@
+import asyncio
 import base64
 import json
-from typing import Tuple, Optional
+import logging
+from functools import lru_cache
+from typing import Dict, Tuple, Optional
 import nacl.signing
 import nacl.encoding
+import nacl.exceptions
 from nacl.public import PrivateKey, PublicKey
 import multibase
 
+logger = logging.getLogger("Crypto")
+
+# Parsed keys / peer ids per DID; a few thousand active users fit easily
+DID_CACHE_SIZE = 4096
+# Messages at least this long are verified in a worker thread by verify_message_async
+VERIFY_OFFLOAD_BYTES = 64 * 1024
+
+_verify_counters = {"verified": 0, "rejected": 0, "offloaded": 0}
+
 def generate_keypair() -> Tuple[str, str, str]:
     """
     Generate a new Ed25519 keypair and return formatted DID and keys.
@@ -47,39 +60,67 @@ def sign_message(message: str, private_key_hex: str) -> str:
     signed = signing_key.sign(message.encode('utf-8'))
     return base64.b64encode(signed.signature).decode('utf-8')
 
+@lru_cache(maxsize=DID_CACHE_SIZE)
+def resolve_verify_key(did: str) -> Optional[nacl.signing.VerifyKey]:
+    """
+    Ed25519 public key embedded in a did:key, or None if the DID isn't one.
+    Cached: the multibase decode and key construction happen once per DID.
+    """
+    # Extract multibase key from did:key:z...
+    if not did.startswith("did:key:"):
+        return None
+    try:
+        decoded = multibase.decode(did.split(":")[-1])
+    except Exception as e:
+        logger.debug(f"Undecodable DID {did[:32]}: {e}")
+        return None
+    # Check header (0xed01 for Ed25519)
+    if len(decoded) != 34 or decoded[0] != 0xed or decoded[1] != 0x01:
+        # Could be other key types, but we only support ed25519 for now
+        return None
+    # Raw 32-byte public key follows the header
+    return nacl.signing.VerifyKey(bytes(decoded[2:]))
+
 def verify_message(message: str, signature_b64: str, did: str) -> bool:
     """
     Verify a signature against a DID.
     Resolves the public key from the did:key string.
     """
     try:
-        # Extract multibase key from did:key:z...
-        if not did.startswith("did:key:"):
-            return False
-            
-        mb_key = did.split(":")[-1]
-        
-        # Decode multibase
-        decoded = multibase.decode(mb_key)
-        
-        # Check header (0xed01 for Ed25519)
-        if len(decoded) != 34 or decoded[0] != 0xed or decoded[1] != 0x01:
-            # Could be other key types, but we only support ed25519 for now
+        verify_key = resolve_verify_key(did)
+        if verify_key is None:
+            _verify_counters["rejected"] += 1
             return False
-            
-        # Extract raw 32-byte public key
-        public_bytes = decoded[2:]
-        
-        verify_key = nacl.signing.VerifyKey(public_bytes)
-        
-        # Verify
         signature_bytes = base64.b64decode(signature_b64)
         verify_key.verify(message.encode('utf-8'), signature_bytes)
+        _verify_counters["verified"] += 1
         return True
+    except (nacl.exceptions.BadSignatureError, ValueError) as e:
+        _verify_counters["rejected"] += 1
+        logger.debug(f"Verification failed for {did[:32]}: {e}")
+        return False
     except Exception as e:
-        print(f"Verification failed: {e}")
+        _verify_counters["rejected"] += 1
+        logger.warning(f"Verification error for {did[:32]}: {e}")
         return False
 
+async def verify_message_async(message: str, signature_b64: str, did: str) -> bool:
+    """verify_message for async code: large messages are hashed off the event loop."""
+    if len(message) >= VERIFY_OFFLOAD_BYTES:
+        _verify_counters["offloaded"] += 1
+        return await asyncio.to_thread(verify_message, message, signature_b64, did)
+    return verify_message(message, signature_b64, did)
+
+def crypto_cache_stats() -> Dict:
+    """Hit/miss counts of the per-DID caches plus verification outcomes (for /api/metrics)."""
+    keys, peers = resolve_verify_key.cache_info(), did_to_peer_id.cache_info()
+    return {
+        **_verify_counters,
+        "verify_key_hits": keys.hits, "verify_key_misses": keys.misses, "verify_keys_cached": keys.currsize,
+        "peer_id_hits": peers.hits, "peer_id_misses": peers.misses, "peer_ids_cached": peers.currsize,
+    }
+
+@lru_cache(maxsize=DID_CACHE_SIZE)
 def did_to_peer_id(did: str) -> str:
     """
     Convert a did:key (Ed25519) to a legacy IPFS Peer ID (12D3K...).
@@ -130,5 +171,5 @@ def did_to_peer_id(did: str) -> str:
         return encoded_mb
         
     except Exception as e:
-        print(f"DID conversion error: {e}")
+        logger.warning(f"DID conversion error: {e}")
         return ""
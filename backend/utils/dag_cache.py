@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger("DagCache")
+
+
+class DagCache:
+    """
+    LRU cache for DAG nodes, bounded by entry count and by bytes.
+
+    DAG nodes are content-addressed, so an entry never goes stale; the only
+    question is what to keep. Nodes are stored as their serialized JSON and
+    decoded on every hit, so a caller that annotates the dict it got back
+    (the feed code tags posts with `peer_id` / `_from_peer`) can't corrupt
+    the cached copy.
+
+    With `disk_path` set, nodes are also written through to an SQLite blob
+    store that survives restarts; it is checked on a memory miss before
+    going to the daemon.
+    """
+
+    def __init__(self, max_entries: int = 5000, max_bytes: int = 32 * 1024 * 1024,
+                 disk_path: Optional[str] = None, disk_max_bytes: int = 512 * 1024 * 1024):
+        self.max_entries = max(max_entries, 1)
+        self.max_bytes = max(max_bytes, 1)
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "disk_hits": 0, "disk_writes": 0}
+
+        self._disk: Optional["_DiskTier"] = None
+        if disk_path:
+            try:
+                self._disk = _DiskTier(disk_path, disk_max_bytes)
+            except sqlite3.Error as e:
+                logger.warning(f"DAG cache disk tier disabled ({disk_path}): {e}")
+
+    async def get(self, cid: str) -> Optional[Dict]:
+        raw = self._entries.get(cid)
+        if raw is not None:
+            self._entries.move_to_end(cid)
+            self._counters["hits"] += 1
+            return json.loads(raw)
+
+        if self._disk is not None:
+            raw = await asyncio.to_thread(self._disk.get, cid)
+            if raw is not None:
+                self._counters["disk_hits"] += 1
+                self._remember(cid, raw)
+                return json.loads(raw)
+
+        self._counters["misses"] += 1
+        return None
+
+    async def put(self, cid: str, node: Dict) -> None:
+        raw = json.dumps(node, separators=(",", ":")).encode()
+        if cid in self._entries:
+            return
+        self._remember(cid, raw)
+        if self._disk is not None:
+            if await asyncio.to_thread(self._disk.put, cid, raw):
+                self._counters["disk_writes"] += 1
+
+    def _remember(self, cid: str, raw: bytes) -> None:
+        if len(raw) > self.max_bytes:
+            return  # larger than the whole budget; leave it to the disk tier
+        old = self._entries.pop(cid, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[cid] = raw
+        self._bytes += len(raw)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._counters["evictions"] += 1
+
+    def stats(self) -> Dict:
+        lookups = self._counters["hits"] + self._counters["disk_hits"] + self._counters["misses"]
+        stats = {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            **self._counters,
+            "hit_rate": round((lookups - self._counters["misses"]) / lookups, 4) if lookups else None,
+        }
+        if self._disk is not None:
+            stats["disk"] = self._disk.stats()
+        return stats
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+
+class _DiskTier:
+    """SQLite blob store keyed by CID, trimmed least recently used first past `max_bytes`."""
+
+    # Trim a little below the limit so we don't prune on every insert
+    _TRIM_TO = 0.9
+    # Rows examined per trim step
+    _TRIM_BATCH = 256
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS blocks (
+                cid TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL  -- last written or read
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_blocks_stored_at ON blocks(stored_at)")
+        self._conn.commit()
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blocks").fetchone()[0]
+
+    def get(self, cid: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM blocks WHERE cid = ?", (cid,)).fetchone()
+            if row:
+                self._conn.execute("UPDATE blocks SET stored_at = ? WHERE cid = ?", (time.time(), cid))
+                self._conn.commit()
+        return bytes(row[0]) if row else None
+
+    def put(self, cid: str, raw: bytes) -> bool:
+        """Store a block. Returns False if it was already stored."""
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO blocks (cid, data, size, stored_at) VALUES (?, ?, ?, ?)",
+                (cid, raw, len(raw), time.time()),
+            )
+            if cur.rowcount:
+                self._bytes += len(raw)
+            if self._bytes > self.max_bytes:
+                self._trim()
+            self._conn.commit()
+            return bool(cur.rowcount)
+
+    def _trim(self) -> None:
+        target = int(self.max_bytes * self._TRIM_TO)
+        while self._bytes > target:
+            sizes = self._conn.execute(
+                "SELECT size FROM blocks ORDER BY stored_at, cid LIMIT ?", (self._TRIM_BATCH,)
+            ).fetchall()
+            if not sizes:
+                self._bytes = 0
+                break
+            count = 0
+            for (size,) in sizes:
+                if self._bytes <= target:
+                    break
+                self._bytes -= size
+                count += 1
+            self._conn.execute(
+                "DELETE FROM blocks WHERE cid IN (SELECT cid FROM blocks ORDER BY stored_at, cid LIMIT ?)", (count,)
+            )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM blocks").fetchone()[0]
+        return {"path": self.path, "entries": count, "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
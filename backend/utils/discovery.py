@@ -5,12 +5,15 @@ import random
 from typing import Dict, Optional, List
 from .ipfs_rpc import IPFSRPCClient
 from .social_dag import SocialDAG
+from .timeline import TimelineStore, peer_id_variants
 
 class DiscoveryHub:
-    def __init__(self, rpc_client: IPFSRPCClient, social_dag: SocialDAG, db_connection_factory):
+    def __init__(self, rpc_client: IPFSRPCClient, social_dag: SocialDAG, db_connection_factory,
+                 timeline: Optional[TimelineStore] = None):
         self.rpc = rpc_client
         self.dag = social_dag
         self.get_db = db_connection_factory
+        self.timeline = timeline
 
     async def handle_discovery_message(self, data: Dict):
         """Handle heartbeats from the global discovery topic."""
@@ -44,6 +47,20 @@ class DiscoveryHub:
         new_root = data.get("new_root")
         if not peer_id or not new_root:
             return
+        # `peer_id` is the author's DID; `node_peer_id` the IPFS node that
+        # publishes their root (older announcements only have `peer_id`).
+        # The payload isn't signed, so only the node the pubsub envelope
+        # says sent it may announce for that node.
+        node_peer_id = data.get("node_peer_id") or peer_id
+        if node_peer_id.startswith("did:ipfs:"):
+            node_peer_id = node_peer_id[len("did:ipfs:"):]
+        if node_peer_id != data.get("_from_peer_id"):
+            return
+
+        # The node published a new root: resolve it afresh next time
+        ipns_cache = getattr(self.rpc, "ipns_cache", None)
+        if ipns_cache:
+            ipns_cache.invalidate(node_peer_id)
 
         conn = self.get_db()
         # 1. Update Profile Root in DB
@@ -57,10 +74,20 @@ class DiscoveryHub:
         
         # 2. Stochastic Pinning (Social Sharding)
         # Check if we follow them or if it's a random discovery
-        follow_row = conn.execute("SELECT 1 FROM following WHERE following_peer_id = ?", (peer_id,)).fetchone()
+        follow_row = conn.execute(
+            "SELECT 1 FROM following WHERE following_peer_id IN (?, ?)", tuple(peer_id_variants(node_peer_id))
+        ).fetchone()
         is_followed = bool(follow_row)
+        conn.commit()
         conn.close()
 
+        # 2a. Materialize the new posts into local followers' timelines
+        if is_followed and self.timeline:
+            try:
+                await self.timeline.ingest_root(node_peer_id, new_root)
+            except Exception as e:
+                print(f"Timeline ingest error for {peer_id[:8]}: {e}")
+
         # Sharding Probability:
         # 100% if followed, 10% if just discovered (Global Scale Availability)
         pin_chance = 1.0 if is_followed else 0.1
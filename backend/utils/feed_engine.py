@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from typing import Dict, List
+
+from .ipfs_rpc import IPFSRPCClient
+from .social_dag import SocialDAG
+
+logger = logging.getLogger("FeedEngine")
+
+
+class FeedEngine:
+    """
+    Fan-in of followed peers' Social DAG feeds.
+
+    Peers are resolved and traversed concurrently (bounded by a semaphore,
+    each with its own timeout so one unreachable peer can't hold up the
+    rest). The per-peer lists come back newest-first; TimelineStore writes
+    them into `timeline`, which the feed query pages in SQL.
+    """
+
+    def __init__(self, rpc_client: IPFSRPCClient, social_dag: SocialDAG,
+                 max_concurrency: int = 16, peer_timeout: float = 5.0):
+        self.rpc = rpc_client
+        self.dag = social_dag
+        self.max_concurrency = max(max_concurrency, 1)
+        self.peer_timeout = peer_timeout
+
+    async def fetch_peers(self, peers: List[Dict], per_peer_limit: int) -> List[List[Dict]]:
+        """Fetch up to `per_peer_limit` posts from every followed peer, concurrently."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.gather(
+            *(self._fetch_peer_bounded(peer, per_peer_limit, semaphore) for peer in peers)
+        )
+
+    async def _fetch_peer_bounded(self, peer: Dict, limit: int, semaphore: asyncio.Semaphore) -> List[Dict]:
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(self.fetch_peer(peer, limit), timeout=self.peer_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Feed fetch from {peer.get('username')} timed out after {self.peer_timeout}s")
+            except Exception as e:
+                logger.warning(f"Failed to fetch feed from {peer.get('username')}: {e}")
+        return []
+
+    async def fetch_peer(self, peer: Dict, limit: int) -> List[Dict]:
+        """Resolve one followed peer (IPNS, falling back to the last synced root) and walk its feed."""
+        peer_id = peer.get("following_peer_id") or ""
+        raw_peer_id = peer_id.replace("did:ipfs:", "") if peer_id.startswith("did:ipfs:") else peer_id
+
+        head_cid = await self.rpc.name_resolve(raw_peer_id) or peer.get("library_cid")
+        if not head_cid:
+            return []
+
+        items = await self.dag.traverse_feed(head_cid, limit=limit)
+        for item in items:
+            item["_from_peer"] = peer.get("username", "Unknown")
+            item["peer_id"] = peer_id
+        return items
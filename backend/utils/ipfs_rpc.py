@@ -1,16 +1,25 @@
 import httpx
 import json
 import io
-from typing import Optional, List, Dict, Union, Any
+import uuid
+from typing import Optional, List, Dict, Union, Any, AsyncIterable, AsyncIterator, Callable
+
+from .dag_cache import DagCache
+from .ipns_cache import IpnsCache
 
 class IPFSRPCClient:
-    def __init__(self, host: str = "http://127.0.0.1", port: int = 5001):
+    def __init__(self, host: str = "http://127.0.0.1", port: int = 5001,
+                 dag_cache: Optional[DagCache] = None, ipns_cache: Optional[IpnsCache] = None):
         self.base_url = f"{host}:{port}/api/v0"
         self.client = httpx.AsyncClient(timeout=30.0)
-        self._dag_cache: Dict[str, Dict] = {} # Simple CID cache
+        # Shared by everything holding this client (SocialDAG, DiscoveryHub, FeedEngine)
+        self.dag_cache = dag_cache if dag_cache is not None else DagCache()
+        self.ipns_cache = ipns_cache if ipns_cache is not None else IpnsCache()
 
-    async def add(self, data: Union[str, bytes, Dict]) -> str:
-        """Add data to IPFS and return CID."""
+    async def add(self, data: Union[str, bytes, Dict, AsyncIterable[bytes]], filename: str = "file") -> str:
+        """Add data to IPFS and return CID. Async iterables of bytes are streamed (see add_stream)."""
+        if hasattr(data, "__aiter__"):
+            return await self.add_stream(data, filename)
         if isinstance(data, dict):
             data = json.dumps(data)
         
@@ -19,6 +28,46 @@ class IPFSRPCClient:
         response.raise_for_status()
         return response.json()["Hash"]
 
+    async def add_stream(self, chunks: AsyncIterable[bytes], filename: str = "file",
+                         on_progress: Optional[Callable[[int], None]] = None) -> str:
+        """
+        Add a file to IPFS from an async stream of chunks and return its CID.
+
+        The multipart body is generated on the fly and sent with chunked
+        transfer encoding, so only one chunk is held in memory at a time.
+        `on_progress` is called with the running byte count after each chunk.
+        Exceptions raised by `chunks` abort the request and propagate.
+        """
+        boundary = uuid.uuid4().hex
+        response = await self.client.post(
+            f"{self.base_url}/add?cid-version=1",
+            content=self._multipart_stream(chunks, filename, boundary, on_progress),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            # The daemon answers once the last chunk is in; big files take a while
+            timeout=httpx.Timeout(30.0, read=300.0, write=300.0),
+        )
+        response.raise_for_status()
+        return response.json()["Hash"]
+
+    @staticmethod
+    async def _multipart_stream(chunks: AsyncIterable[bytes], filename: str, boundary: str,
+                                on_progress: Optional[Callable[[int], None]]) -> AsyncIterator[bytes]:
+        safe_name = filename.replace('"', "_").replace("\r", "_").replace("\n", "_")
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{safe_name}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        sent = 0
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            sent += len(chunk)
+            yield chunk
+            if on_progress:
+                on_progress(sent)
+        yield f"\r\n--{boundary}--\r\n".encode()
+
     async def cat(self, cid: str) -> str:
         """Fetch content for a CID."""
         response = await self.client.post(f"{self.base_url}/cat?arg={cid}")
@@ -30,30 +79,36 @@ class IPFSRPCClient:
         files = {'file': json.dumps(data)}
         response = await self.client.post(f"{self.base_url}/dag/put?store-codec=dag-json&input-codec=dag-json", files=files)
         response.raise_for_status()
-        return response.json()["Cid"]["/"]
+        cid = response.json()["Cid"]["/"]
+        # We just wrote it, so the next dag_get (e.g. our own feed walk) is free
+        await self.dag_cache.put(cid, data)
+        return cid
 
     async def dag_get(self, cid: str) -> Dict:
         """Get object from IPFS-DAG with local caching."""
-        if cid in self._dag_cache:
-            return self._dag_cache[cid]
+        cached = await self.dag_cache.get(cid)
+        if cached is not None:
+            return cached
             
         response = await self.client.post(f"{self.base_url}/dag/get?arg={cid}")
         response.raise_for_status()
         data = response.json()
-        
-        # Cache the result (bounded to prevent memory leaks in real apps)
-        if len(self._dag_cache) > 1000:
-            self._dag_cache.clear()
-        self._dag_cache[cid] = data
+        await self.dag_cache.put(cid, data)
         return data
 
     async def name_publish(self, cid: str) -> str:
         """Publish CID to IPNS."""
         response = await self.client.post(f"{self.base_url}/name/publish?arg={cid}")
         response.raise_for_status()
-        return response.json()["Name"]
+        name = response.json()["Name"]
+        self.ipns_cache.update(name, cid)
+        return name
 
     async def name_resolve(self, peer_id: str) -> Optional[str]:
+        """Resolve IPNS name, served from the resolution cache when possible."""
+        return await self.ipns_cache.resolve(peer_id, self._name_resolve_remote)
+
+    async def _name_resolve_remote(self, peer_id: str) -> Optional[str]:
         """Resolve IPNS name using faster resolve flags if possible."""
         try:
             # Using dht-timeout and stream flags for faster resolution in global networks
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger("IpnsCache")
+
+Resolver = Callable[[str], Awaitable[Optional[str]]]
+
+
+def normalize_name(name: str) -> str:
+    """`did:ipfs:<id>`, `/ipns/<id>` and `<id>` all name the same record."""
+    for prefix in ("did:ipfs:", "/ipns/"):
+        if name.startswith(prefix):
+            return name[len(prefix):]
+    return name
+
+
+@dataclass
+class _Entry:
+    value: Optional[str]          # None = negative entry (resolution failed)
+    fetched_at: float             # monotonic time the value was learned
+
+
+class IpnsCache:
+    """
+    Cache of IPNS name -> CID resolutions.
+
+    A name resolve can take the full DHT timeout, so:
+    - fresh entries (younger than `ttl`) are served directly;
+    - stale ones (up to `stale_ttl`) are served immediately while a single
+      background task re-resolves them;
+    - failures are remembered for `negative_ttl` so an offline peer isn't
+      re-queried on every request;
+    - concurrent misses for one name share one in-flight resolve;
+    - a pubsub feed announcement drops the peer's entry (`invalidate`), so
+      the next request resolves the new record; roots we publish ourselves
+      are written straight in (`update`).
+    """
+
+    def __init__(self, ttl: float = 60, negative_ttl: float = 15,
+                 stale_ttl: float = 600, max_entries: int = 10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_entries = max(max_entries, 1)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[asyncio.Task] = set()
+        self._counters = {
+            "hits": 0, "stale_hits": 0, "negative_hits": 0, "misses": 0,
+            "coalesced": 0, "refreshes": 0, "updates": 0, "evictions": 0,
+        }
+
+    async def resolve(self, name: str, resolver: Resolver) -> Optional[str]:
+        key = normalize_name(name)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            age = time.monotonic() - entry.fetched_at
+            if entry.value is None:
+                if age < self.negative_ttl:
+                    self._counters["negative_hits"] += 1
+                    return None
+            elif age < self.ttl:
+                self._counters["hits"] += 1
+                return entry.value
+            elif age < self.stale_ttl:
+                self._counters["stale_hits"] += 1
+                self._refresh_in_background(key, resolver)
+                return entry.value
+
+        self._counters["misses"] += 1
+        return await self._fetch(key, resolver)
+
+    def update(self, name: str, cid: str) -> None:
+        """Record a root we just published ourselves for `name`."""
+        self._store(normalize_name(name), _Entry(cid, time.monotonic()))
+        self._counters["updates"] += 1
+
+    def invalidate(self, name: str) -> None:
+        self._entries.pop(normalize_name(name), None)
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "inflight": len(self._inflight),
+            **self._counters,
+        }
+
+    # ── Internals ──
+
+    async def _fetch(self, key: str, resolver: Resolver) -> Optional[str]:
+        future = self._inflight.get(key)
+        if future is not None:
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        started = time.monotonic()
+        try:
+            try:
+                value = await resolver(key)
+            except Exception as e:
+                logger.debug(f"IPNS resolve failed for {key[:12]}: {e}")
+                value = None
+            value = self._settle(key, value, started)
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        future.set_result(value)
+        return value
+
+    def _settle(self, key: str, value: Optional[str], started: float) -> Optional[str]:
+        now = time.monotonic()
+        current = self._entries.get(key)
+        if current is not None and current.fetched_at >= started:
+            # We published a root while resolving; it's newer
+            return current.value
+        if value is None and current is not None and current.value is not None:
+            # Refresh failed: keep serving the last good root, retry after negative_ttl
+            current.fetched_at = now - self.ttl + self.negative_ttl
+            return current.value
+        self._store(key, _Entry(value, now))
+        return value
+
+    def _refresh_in_background(self, key: str, resolver: Resolver) -> None:
+        if key in self._inflight:
+            return
+        self._counters["refreshes"] += 1
+        task = asyncio.create_task(self._fetch(key, resolver))
+        self._refreshing.add(task)
+        task.add_done_callback(self._refreshing.discard)
+
+    def _store(self, key: str, entry: _Entry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import random
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger("Jobs")
+
+# Job handler: receives the payload, returns a JSON-able result (or None).
+# Raising schedules a retry with backoff until max_attempts is reached.
+Handler = Callable[[Dict], Awaitable[Any]]
+
+
+class JobQueue:
+    """
+    Durable background job queue backed by the `jobs` table.
+
+    `enqueue()` is a plain INSERT keyed by an idempotency key, so enqueueing
+    the same work twice (a retried request, a handler that re-runs) yields
+    the existing job. Worker tasks claim ready jobs with a single guarded
+    UPDATE, which keeps several workers — or several server processes on
+    one database — from running the same job. Failed jobs are retried with
+    exponential backoff and jitter; jobs left `running` by a crashed
+    process are requeued once their lease expires.
+    """
+
+    def __init__(self, db_connection_factory, workers: int = 2, poll_interval: float = 1.0,
+                 max_attempts: int = 5, base_backoff: float = 2.0, max_backoff: float = 300.0,
+                 lease: float = 600.0):
+        self.get_db = db_connection_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+
+        self._handlers: Dict[str, Handler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_reap = 0.0
+        self._counters = {"enqueued": 0, "done": 0, "retried": 0, "failed": 0}
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self._handlers[kind] = handler
+
+    # ── Producing ──
+
+    def enqueue(self, kind: str, payload: Dict, key: Optional[str] = None,
+                max_attempts: Optional[int] = None, delay: float = 0.0, conn=None) -> int:
+        """
+        Queue a job and return its id; a job already queued under `key` is reused.
+
+        Pass `conn` to enqueue inside the caller's transaction (the caller
+        commits); otherwise a connection is opened and committed here.
+        """
+        key = key or f"{kind}:{uuid.uuid4().hex}"
+        now = time.time()
+        own = conn is None
+        conn = conn or self.get_db()
+        try:
+            conn.execute("""
+                INSERT OR IGNORE INTO jobs
+                (idempotency_key, kind, payload, status, attempts, max_attempts, next_run_at, created_at, updated_at)
+                VALUES (?, ?, ?, 'queued', 0, ?, ?, ?, ?)
+            """, (key, kind, json.dumps(payload, default=str), max_attempts or self.max_attempts,
+                  now + delay, now, now))
+            job_id = conn.execute("SELECT id FROM jobs WHERE idempotency_key = ?", (key,)).fetchone()["id"]
+            if own:
+                conn.commit()
+        finally:
+            if own:
+                conn.close()
+        self._counters["enqueued"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        conn = self.get_db()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return _job_dict(row) if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self.get_db()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status").fetchall()
+        finally:
+            conn.close()
+        return {
+            **self._counters,
+            "workers": len([t for t in self._tasks if not t.done()]),
+            "by_status": {r["status"]: r["count"] for r in rows},
+        }
+
+    # ── Consuming ──
+
+    def start(self) -> None:
+        """Start worker tasks on the running loop."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def run_once(self) -> bool:
+        """Claim and run one ready job. Returns False when nothing was ready."""
+        job = await asyncio.to_thread(self._claim)
+        if job is None:
+            return False
+        handler = self._handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise LookupError(f"no handler registered for job kind {job['kind']!r}")
+            result = await handler(job["payload"])
+        except asyncio.CancelledError:
+            # Shutting down mid-job: hand it back without spending an attempt
+            await asyncio.to_thread(self._release, job)
+            raise
+        except Exception as e:
+            await asyncio.to_thread(self._fail, job, e)
+        else:
+            await asyncio.to_thread(self._complete, job, result)
+        return True
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            try:
+                if time.time() - self._last_reap > self.lease / 2:
+                    self._last_reap = time.time()
+                    await asyncio.to_thread(self._requeue_expired)
+                if await self.run_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {index} error: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # ── Blocking DB steps (run in a worker thread) ──
+
+    def _claim(self) -> Optional[Dict]:
+        token = uuid.uuid4().hex
+        now = time.time()
+        conn = self.get_db()
+        try:
+            conn.execute("""
+                UPDATE jobs SET status = 'running', claimed_by = ?, attempts = attempts + 1, updated_at = ?
+                WHERE status = 'queued' AND id = (
+                    SELECT id FROM jobs WHERE status = 'queued' AND next_run_at <= ?
+                    ORDER BY next_run_at, id LIMIT 1
+                )
+            """, (token, now, now))
+            conn.commit()
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE claimed_by = ? AND status = 'running'", (token,)
+            ).fetchone()
+        finally:
+            conn.close()
+        return _job_dict(row) if row else None
+
+    def _complete(self, job: Dict, result: Any) -> None:
+        self._finish(job, "done", None, result=json.dumps(result, default=str) if result is not None else None)
+        self._counters["done"] += 1
+
+    def _fail(self, job: Dict, error: Exception) -> None:
+        message = f"{type(error).__name__}: {error}"
+        if job["attempts"] >= job["max_attempts"]:
+            logger.error(f"Job {job['id']} ({job['kind']}) failed for good: {message}")
+            self._finish(job, "failed", message)
+            self._counters["failed"] += 1
+            return
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (job["attempts"] - 1))
+        delay = backoff * random.uniform(0.5, 1.0)
+        logger.warning(f"Job {job['id']} ({job['kind']}) attempt {job['attempts']} failed, retrying in {delay:.1f}s: {message}")
+        self._finish(job, "queued", message, next_run_at=time.time() + delay)
+        self._counters["retried"] += 1
+
+    def _release(self, job: Dict) -> None:
+        self._finish(job, "queued", job["last_error"], next_run_at=time.time(), attempts=job["attempts"] - 1)
+
+    def _finish(self, job: Dict, status: str, error: Optional[str], result: Optional[str] = None,
+                next_run_at: Optional[float] = None, attempts: Optional[int] = None) -> None:
+        conn = self.get_db()
+        try:
+            conn.execute("""
+                UPDATE jobs SET status = ?, last_error = ?, result = COALESCE(?, result),
+                       next_run_at = COALESCE(?, next_run_at), attempts = COALESCE(?, attempts),
+                       claimed_by = NULL, updated_at = ?
+                WHERE id = ? AND claimed_by = ?
+            """, (status, error, result, next_run_at, attempts, time.time(), job["id"], job["claimed_by"]))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _requeue_expired(self) -> None:
+        conn = self.get_db()
+        try:
+            conn.execute("""
+                UPDATE jobs SET status = 'queued', claimed_by = NULL, last_error = 'lease expired'
+                WHERE status = 'running' AND updated_at < ?
+            """, (time.time() - self.lease,))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def _job_dict(row) -> Dict:
+    job = dict(row)
+    for field in ("payload", "result"):
+        if job.get(field):
+            try:
+                job[field] = json.loads(job[field])
+            except (TypeError, ValueError):
+                pass
+    return job
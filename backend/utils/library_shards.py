@@ -0,0 +1,50 @@
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .ipfs_rpc import IPFSRPCClient
+
+# Shard key for a post: last character of its cid, lowercased. Must match the
+# expression used by the library_shards triggers and idx_posts_shard.
+SHARD_SQL = "lower(substr(id, length(id), 1))"
+
+
+def shard_of(cid: str) -> str:
+    return cid[-1:].lower()
+
+
+def shard_node(shard: str, posts: List[Dict]) -> Dict:
+    return {
+        "version": "1.0",
+        "type": "library_shard",
+        "shard": shard,
+        "posts": posts,
+    }
+
+
+def index_node(shards: Dict[str, Tuple[str, int]]) -> Dict:
+    """Root of a sharded library: shard key -> {cid link, post count}."""
+    return {
+        "version": "1.0",
+        "type": "library_index",
+        "shards": {
+            key: {"cid": {"/": cid}, "count": count}
+            for key, (cid, count) in sorted(shards.items())
+        },
+        "count": sum(count for _, count in shards.values()),
+    }
+
+
+def _link(value) -> Optional[str]:
+    if isinstance(value, dict):
+        return value.get("/")
+    return value
+
+
+async def iter_library_index(rpc: IPFSRPCClient, index: Dict) -> AsyncIterator[Dict]:
+    """Yield posts from a `library_index` node, fetching each shard only when reached."""
+    for key in sorted(index.get("shards", {})):
+        shard_cid = _link(index["shards"][key].get("cid"))
+        if not shard_cid:
+            continue
+        shard = await rpc.dag_get(shard_cid)
+        for post in shard.get("posts", []):
+            yield post
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("Notifications")
+
+# Called on the event loop with every flushed batch: [(user_did, event), ...]; may be async
+Written = Callable[[List[Tuple[str, Dict]]], Any]
+
+
+class NotificationWriter:
+    """
+    Write-behind batcher for `notifications` inserts.
+
+    add() only queues the row; a flusher task writes whatever queued up in
+    one transaction every `flush_interval` seconds (sooner once
+    `max_batch` rows are waiting), then hands the rows, now with their
+    ids, to `on_written` for the live stream. A notification that is
+    queued but not yet flushed is lost if the process dies; stop() flushes.
+    """
+
+    def __init__(self, db_connection_factory, on_written: Written, flush_interval: float = 0.25,
+                 max_batch: int = 200):
+        self.get_db = db_connection_factory
+        self.on_written = on_written
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._pending: List[Tuple[str, Dict]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._full: Optional[asyncio.Event] = None
+        self._counters = {"queued": 0, "written": 0, "batches": 0, "errors": 0}
+
+    def add(self, user_did: str, notif_type: str, title: str, message: str, link: str, timestamp: str) -> None:
+        """Queue a notification. Call on the event loop; starts the flusher on first use."""
+        self._pending.append((user_did, {
+            "type": notif_type,
+            "title": title,
+            "message": message,
+            "link": link,
+            "timestamp": timestamp,
+        }))
+        self._counters["queued"] += 1
+        self.start()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._full = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> int:
+        """Write everything queued now. Returns the number of rows written."""
+        batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        try:
+            written = await asyncio.to_thread(self._write, batch)
+        except Exception as e:
+            # Put them back in front of anything queued meanwhile; the next flush
+            # retries. While the database stays down, keep only the newest rows.
+            self._pending = (batch + self._pending)[-self.max_batch * 50:]
+            self._counters["errors"] += 1
+            logger.error(f"Notification flush of {len(batch)} rows failed: {e}")
+            return 0
+        self._counters["written"] += len(written)
+        self._counters["batches"] += 1
+        try:
+            result = self.on_written(written)
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            logger.error(f"Notification delivery after flush failed: {e}")
+        return len(written)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> Dict:
+        return {**self._counters, "pending": len(self._pending)}
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    def _write(self, batch: List[Tuple[str, Dict]]) -> List[Tuple[str, Dict]]:
+        conn = self.get_db()
+        try:
+            written = []
+            for user_did, event in batch:
+                row = conn.execute("""
+                    INSERT INTO notifications (user_peer_id, type, title, message, link, timestamp, is_read)
+                    VALUES (?, ?, ?, ?, ?, ?, 0)
+                    RETURNING id
+                """, (user_did, event["type"], event["title"], event["message"], event["link"],
+                      event["timestamp"])).fetchone()
+                written.append((user_did, {"id": row["id"], **event}))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return written
+
+
+def id_ranges(ids: Iterable[int]) -> List[Tuple[int, int]]:
+    """Collapse ids into sorted inclusive (first, last) runs: [1, 2, 3, 7] -> [(1, 3), (7, 7)]."""
+    ranges: List[Tuple[int, int]] = []
+    for i in sorted(set(ids)):
+        if ranges and i == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], i)
+        else:
+            ranges.append((i, i))
+    return ranges
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("Notify")
+
+CHANNEL = "stream_events"
+# pg_notify payloads must stay under 8000 bytes
+_MAX_NOTIFY_BYTES = 7500
+
+# Local delivery: (did, event), called on the event loop; any return value is ignored
+Deliver = Callable[[str, Dict], Any]
+
+
+class NotificationBus:
+    """
+    Delivers /api/stream events to whichever server process holds the
+    user's stream.
+
+    publish_async() hands the event to this process's streams straight
+    away and shares it with the other processes: on Postgres with NOTIFY on
+    `stream_events` (every process LISTENs on its own connection); on
+    SQLite by appending to the `stream_events` table, which every process
+    tails by id. Events carry the publishing process's token so it
+    doesn't deliver them twice. Tailed rows older than `retention`
+    seconds are pruned.
+    """
+
+    def __init__(self, db_connection_factory, deliver: Deliver, database_url: Optional[str] = None,
+                 poll_interval: float = 0.5, retention: float = 300.0):
+        self.get_db = db_connection_factory
+        self.deliver = deliver
+        self.database_url = database_url
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = uuid.uuid4().hex
+        self.backend = "postgres" if database_url else "sqlite"
+
+        self._task: Optional[asyncio.Task] = None
+        self._last_id = 0
+        self._last_prune = 0.0
+        self._counters = {"published": 0, "received": 0, "share_errors": 0}
+
+    # ── Publishing ──
+
+    async def publish_async(self, did: str, event: Dict) -> None:
+        """Deliver locally, then share with other processes (the DB write runs in a worker thread)."""
+        self._deliver(did, event)
+        await asyncio.to_thread(self._share, [(did, event)])
+
+    async def publish_many(self, items: List[Tuple[str, Dict]]) -> None:
+        """publish_async for a batch of (did, event), shared in one transaction."""
+        for did, event in items:
+            self._deliver(did, event)
+        if items:
+            await asyncio.to_thread(self._share, items)
+
+    def _share(self, items: List[Tuple[str, Dict]]) -> None:
+        self._counters["published"] += len(items)
+        try:
+            conn = self.get_db()
+            try:
+                for did, event in items:
+                    if self.backend == "postgres":
+                        conn.execute("SELECT pg_notify(?, ?)", (CHANNEL, _notify_payload(self.origin, did, event)))
+                    else:
+                        conn.execute(
+                            "INSERT INTO stream_events (user_peer_id, payload, origin, created_at) VALUES (?, ?, ?, ?)",
+                            (did, json.dumps(event, default=str), self.origin, time.time()),
+                        )
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            self._counters["share_errors"] += 1
+            logger.warning(f"Could not share {len(items)} stream event(s): {e}")
+
+    def _deliver(self, did: str, event: Dict) -> None:
+        try:
+            self.deliver(did, event)
+        except Exception as e:
+            logger.error(f"Stream delivery failed for {did}: {e}")
+
+    # ── Receiving ──
+
+    def start(self) -> None:
+        """Start receiving other processes' events on the running loop."""
+        if self._task is None:
+            runner = self._listen if self.backend == "postgres" else self._tail
+            self._task = asyncio.get_running_loop().create_task(runner())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {**self._counters, "backend": self.backend}
+
+    def _receive(self, origin: str, did: str, event: Dict) -> None:
+        if origin == self.origin:
+            return
+        self._counters["received"] += 1
+        self._deliver(did, event)
+
+    async def _listen(self) -> None:
+        import psycopg
+
+        backoff = 1.0
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(self.database_url, autocommit=True, connect_timeout=10)
+                try:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    backoff = 1.0
+                    async for notify in conn.notifies():
+                        try:
+                            message = json.loads(notify.payload)
+                            self._receive(message["origin"], message["did"], message["event"])
+                        except (ValueError, KeyError, TypeError):
+                            logger.warning("Ignoring malformed stream notification")
+                finally:
+                    await conn.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Stream LISTEN connection lost, retrying in {backoff:.0f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    async def _tail(self) -> None:
+        self._last_id = await asyncio.to_thread(self._latest_id)
+        while True:
+            try:
+                rows = await asyncio.to_thread(self._read_since, self._last_id)
+                for row in rows:
+                    self._last_id = row["id"]
+                    try:
+                        self._receive(row["origin"], row["user_peer_id"], json.loads(row["payload"]))
+                    except (ValueError, TypeError):
+                        logger.warning(f"Ignoring malformed stream event {row['id']}")
+                if time.time() - self._last_prune > self.retention:
+                    self._last_prune = time.time()
+                    await asyncio.to_thread(self._prune)
+                if rows:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Stream event tail error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    # ── Blocking DB steps (SQLite tail; run in a worker thread) ──
+
+    def _latest_id(self) -> int:
+        conn = self.get_db()
+        try:
+            row = conn.execute("SELECT MAX(id) AS id FROM stream_events").fetchone()
+        finally:
+            conn.close()
+        return (row["id"] or 0) if row else 0
+
+    def _read_since(self, last_id: int) -> List:
+        conn = self.get_db()
+        try:
+            return conn.execute(
+                "SELECT id, user_peer_id, payload, origin FROM stream_events WHERE id > ? ORDER BY id LIMIT 500",
+                (last_id,),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def _prune(self) -> None:
+        conn = self.get_db()
+        try:
+            conn.execute("DELETE FROM stream_events WHERE created_at < ?", (time.time() - self.retention,))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def _notify_payload(origin: str, did: str, event: Dict) -> str:
+    payload = json.dumps({"origin": origin, "did": did, "event": event}, default=str)
+    if len(payload.encode()) > _MAX_NOTIFY_BYTES:
+        # Keep what a client needs to react; the full row is in /api/notifications
+        slim = {k: event[k] for k in ("id", "type", "title", "link", "timestamp") if k in event}
+        payload = json.dumps({"origin": origin, "did": did, "event": slim}, default=str)
+    return payload
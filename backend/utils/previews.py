@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; image previews are skipped without it
+    Image = None
+
+logger = logging.getLogger("Previews")
+
+PREVIEW_MAX_SIZE = 512     # longest edge, pixels
+PREVIEW_QUALITY = 80       # JPEG quality
+RENDER_TIMEOUT = 30        # seconds per external tool run
+
+# Raster formats Pillow reads; SVG/ICO are left to the browser
+_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+
+
+def preview_kind(filename: str, media_type: str) -> Optional[str]:
+    """Which renderer applies to a file (keyed by classify_media_type), or None."""
+    name = (filename or "").lower()
+    if media_type == "image" and name.endswith(_IMAGE_EXTENSIONS):
+        return "image"
+    if media_type == "video":
+        return "video"
+    if name.endswith(".pdf"):
+        return "pdf"
+    return None
+
+
+def available_kinds() -> set:
+    """Renderers whose tools are installed here, so we never spawn one that can't run."""
+    kinds = set()
+    if Image is not None:
+        kinds.add("image")
+    if shutil.which("pdftoppm"):
+        kinds.add("pdf")
+    if shutil.which("ffmpeg"):
+        kinds.add("video")
+    return kinds
+
+
+# ── Renderers (run in worker processes; keep them importable and stdlib + Pillow only) ──
+
+def render_preview(kind: str, src_path: str, out_path: str, max_size: int = PREVIEW_MAX_SIZE) -> bool:
+    """Write a JPEG preview of `src_path` to `out_path`. Returns False if nothing could be rendered."""
+    if kind == "image":
+        return _render_image(src_path, out_path, max_size)
+    if kind == "pdf":
+        return _render_pdf(src_path, out_path, max_size)
+    if kind == "video":
+        return _render_video(src_path, out_path, max_size)
+    return False
+
+
+def _render_image(src_path: str, out_path: str, max_size: int) -> bool:
+    if Image is None:
+        return False
+    with Image.open(src_path) as img:
+        img.seek(0)  # first frame of animations
+        img.draft("RGB", (max_size, max_size))  # lets JPEG decode at reduced scale
+        img = img.convert("RGB")
+        img.thumbnail((max_size, max_size))
+        img.save(out_path, "JPEG", quality=PREVIEW_QUALITY, optimize=True)
+    return True
+
+
+def _render_pdf(src_path: str, out_path: str, max_size: int) -> bool:
+    prefix = out_path[:-4] if out_path.endswith(".jpg") else out_path
+    subprocess.run(
+        ["pdftoppm", "-jpeg", "-jpegopt", f"quality={PREVIEW_QUALITY}", "-f", "1", "-l", "1",
+         "-scale-to", str(max_size), "-singlefile", src_path, prefix],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=RENDER_TIMEOUT,
+    )
+    if prefix + ".jpg" != out_path:
+        os.replace(prefix + ".jpg", out_path)
+    return os.path.exists(out_path)
+
+
+def _render_video(src_path: str, out_path: str, max_size: int) -> bool:
+    scale = f"scale='min({max_size},iw)':'min({max_size},ih)':force_original_aspect_ratio=decrease"
+    # Poster frame one second in (skips black lead-in); very short clips fall back to the first frame
+    for seek in ("1", "0"):
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-ss", seek, "-i", src_path, "-frames:v", "1",
+             "-vf", scale, "-q:v", "4", out_path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=RENDER_TIMEOUT,
+        )
+        if os.path.exists(out_path) and os.path.getsize(out_path) > 0:
+            return True
+    return False
+
+
+class PreviewPipeline:
+    """
+    Generates previews (image downscale, PDF first page, video poster frame)
+    in a process pool and remembers them by source CID.
+
+    The `previews` table maps a source CID to its preview CID, so the same
+    content uploaded again reuses the stored preview without rendering.
+    At most `concurrency` previews render at once; kinds whose tool is
+    not installed are skipped without spawning anything.
+    """
+
+    def __init__(self, db_connection_factory, workers: int = 2, concurrency: Optional[int] = None,
+                 max_size: int = PREVIEW_MAX_SIZE):
+        self.get_db = db_connection_factory
+        self.workers = max(1, workers)
+        self.max_size = max_size
+        self.kinds = available_kinds()
+        self._semaphore = asyncio.Semaphore(concurrency or self.workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._counters = {"cache_hits": 0, "rendered": 0, "skipped": 0, "errors": 0}
+
+    def supports(self, kind: Optional[str]) -> bool:
+        return kind in self.kinds
+
+    def cached(self, source_cid: str) -> Optional[str]:
+        conn = self.get_db()
+        try:
+            row = conn.execute("SELECT preview_cid FROM previews WHERE source_cid = ?", (source_cid,)).fetchone()
+        finally:
+            conn.close()
+        return row["preview_cid"] if row else None
+
+    async def preview_for(self, source_cid: str, src_path: Optional[str], kind: Optional[str],
+                          add: Callable[[bytes], Awaitable[str]]) -> Optional[str]:
+        """
+        CID of the preview for `source_cid`, rendering `src_path` and storing
+        the result with `add` (e.g. IPFSRPCClient.add) when not cached yet.
+        """
+        hit = await asyncio.to_thread(self.cached, source_cid)
+        if hit:
+            self._counters["cache_hits"] += 1
+            return hit
+        if not self.supports(kind) or not src_path or not os.path.exists(src_path):
+            self._counters["skipped"] += 1
+            return None
+
+        fd, out_path = tempfile.mkstemp(suffix=".jpg")
+        os.close(fd)
+        os.remove(out_path)  # renderers create it; an empty file would look like output
+        try:
+            async with self._semaphore:
+                loop = asyncio.get_running_loop()
+                try:
+                    ok = await loop.run_in_executor(
+                        self._executor(), render_preview, kind, src_path, out_path, self.max_size
+                    )
+                except Exception as e:
+                    logger.warning(f"{kind} preview failed for {source_cid}: {e}")
+                    self._counters["errors"] += 1
+                    return None
+            if not ok or not os.path.exists(out_path):
+                self._counters["skipped"] += 1
+                return None
+            with open(out_path, "rb") as f:
+                preview_cid = await add(f.read())
+        finally:
+            if os.path.exists(out_path):
+                os.remove(out_path)
+
+        await asyncio.to_thread(self._remember, source_cid, preview_cid, kind)
+        self._counters["rendered"] += 1
+        return preview_cid
+
+    def stats(self) -> Dict:
+        return {**self._counters, "kinds": sorted(self.kinds), "workers": self.workers}
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and DB pool threads isn't safe
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _remember(self, source_cid: str, preview_cid: str, kind: str) -> None:
+        conn = self.get_db()
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO previews (source_cid, preview_cid, kind, created_at) VALUES (?, ?, ?, ?)",
+                (source_cid, preview_cid, kind, time.time()),
+            )
+            conn.commit()
+        finally:
+            conn.close()
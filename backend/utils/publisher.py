@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("Publisher")
+
+
+def content_digest(snapshot: Any) -> str:
+    return hashlib.sha256(json.dumps(snapshot, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class DebouncedPublisher:
+    """
+    Coalesces bursts of "something changed" into one background publish.
+
+    `request()` is cheap and safe to call from any handler. Once requests
+    stop arriving for `debounce` seconds — or `max_delay` seconds after the
+    first unpublished request, whichever comes first — `snapshot()` is
+    taken and, if its digest differs from what was last published,
+    `publish(snapshot)` runs. Both are blocking callables and run in a
+    worker thread, never on the event loop. `fingerprint` picks what the
+    digest covers (default: the whole snapshot). A failed publish keeps
+    the change pending and is retried after `retry_delay` seconds,
+    doubling per consecutive failure up to `max_retry_delay`.
+    """
+
+    def __init__(self, name: str, snapshot: Callable[[], Any], publish: Callable[[Any], Optional[str]],
+                 debounce: float = 2.0, max_delay: float = 30.0, last_digest: Optional[str] = None,
+                 fingerprint: Callable[[Any], str] = content_digest, retry_delay: float = 5.0,
+                 max_retry_delay: float = 300.0):
+        self.name = name
+        self.snapshot = snapshot
+        self.publish = publish
+        self.fingerprint = fingerprint
+        self.debounce = debounce
+        self.max_delay = max(max_delay, debounce)
+        self.last_digest = last_digest
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max(max_retry_delay, retry_delay)
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._first_pending: Optional[float] = None
+        self._last_request: Optional[float] = None
+        self._failures = 0
+
+        self.last_cid: Optional[str] = None
+        self.last_published_at: Optional[str] = None
+        self.last_lag: Optional[float] = None
+        self._counters = {"requests": 0, "runs": 0, "published": 0, "unchanged": 0, "errors": 0}
+
+    def request(self) -> None:
+        """Note that the published content is out of date. Needs a running loop."""
+        now = time.monotonic()
+        self._counters["requests"] += 1
+        self._last_request = now
+        if self._first_pending is None:
+            self._first_pending = now
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    async def flush(self) -> Optional[str]:
+        """Publish any pending change now (used on shutdown)."""
+        if self._first_pending is None:
+            return self.last_cid
+        return await self._publish_pending()
+
+    async def stop(self, flush_timeout: float = 10.0) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await asyncio.wait_for(self.flush(), timeout=flush_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.name}: pending publish abandoned at shutdown")
+
+    def stats(self) -> Dict:
+        pending_for = None
+        if self._first_pending is not None:
+            pending_for = round(time.monotonic() - self._first_pending, 3)
+        return {
+            **self._counters,
+            "coalesced": max(self._counters["requests"] - self._counters["runs"], 0),
+            "pending": self._first_pending is not None,
+            "pending_for": pending_for,
+            "last_cid": self.last_cid,
+            "last_published_at": self.last_published_at,
+            "last_lag": self.last_lag,
+            "consecutive_failures": self._failures,
+        }
+
+    # ── Internals ──
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Wait out the burst, but never hold a change back past max_delay
+            while self._first_pending is not None:
+                now = time.monotonic()
+                quiet_at = self._last_request + self.debounce
+                deadline = self._first_pending + self.max_delay
+                fire_at = min(quiet_at, deadline)
+                if now >= fire_at:
+                    break
+                await asyncio.sleep(fire_at - now)
+            if self._first_pending is not None:
+                await self._publish_pending()
+            if self._failures and self._first_pending is not None:
+                await asyncio.sleep(min(self.retry_delay * 2 ** (self._failures - 1), self.max_retry_delay))
+                self._wakeup.set()
+
+    async def _publish_pending(self) -> Optional[str]:
+        first_pending = self._first_pending
+        # Requests arriving from here on belong to the next round
+        self._first_pending = None
+        self._counters["runs"] += 1
+        try:
+            snapshot = await asyncio.to_thread(self.snapshot)
+            digest = self.fingerprint(snapshot)
+            if digest == self.last_digest:
+                self._counters["unchanged"] += 1
+                self._failures = 0
+                return self.last_cid
+            cid = await asyncio.to_thread(self.publish, snapshot)
+            if cid:
+                self.last_digest = digest
+                self.last_cid = cid
+                self.last_published_at = datetime.now().isoformat()
+                self.last_lag = round(time.monotonic() - first_pending, 3)
+                self._counters["published"] += 1
+                self._failures = 0
+            else:
+                self._failed(first_pending)
+            return cid
+        except Exception as e:
+            self._failed(first_pending)
+            logger.error(f"{self.name} publish failed: {e}")
+            return None
+
+    def _failed(self, first_pending: float) -> None:
+        # Still unpublished: keep it pending (unless a newer request already is) so _run retries
+        self._counters["errors"] += 1
+        self._failures += 1
+        if self._first_pending is None:
+            self._first_pending = first_pending
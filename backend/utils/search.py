@@ -0,0 +1,115 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Text indexes behind /api/search. SQLite: FTS5 tables posts_fts / users_fts
+# (external content, kept in sync by triggers). Postgres: GIN expression
+# indexes over the tsvectors below — they must match database.py exactly or
+# the planner won't use the index.
+POSTS_TSVECTOR = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(author, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C') || "
+    "setweight(to_tsvector('simple', coalesce(filename, '')), 'D')"
+)
+USERS_TSVECTOR = (
+    "setweight(to_tsvector('simple', coalesce(username, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(handle, '')), 'B')"
+)
+
+# bm25 column weights for posts_fts(name, description, author, filename)
+_POSTS_BM25 = "bm25(posts_fts, 10.0, 2.0, 5.0, 1.0)"
+_USERS_BM25 = "bm25(users_fts, 10.0, 5.0)"
+
+_MAX_TERMS = 8
+
+
+def query_terms(text: str) -> List[str]:
+    """Words of a search box query, lowercased; punctuation is dropped."""
+    return re.findall(r"\w+", (text or "").lower())[:_MAX_TERMS]
+
+
+def fts5_match(terms: List[str]) -> str:
+    """FTS5 MATCH expression: every term must match, each as a prefix."""
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def tsquery(terms: List[str]) -> str:
+    """to_tsquery('simple', ...) expression: every term must match, each as a prefix."""
+    return " & ".join(f"{t}:*" for t in terms)
+
+
+def _identifier(text: str, offset: int) -> Optional[str]:
+    """A single whitespace-free token (CID, peer id, DID) worth an exact key lookup on the first page."""
+    needle = (text or "").strip()
+    if offset or not needle or any(ch.isspace() for ch in needle):
+        return None
+    return needle
+
+
+def _page(rows: List, limit: int) -> Tuple[List[Dict], bool]:
+    return [dict(r) for r in rows[:limit]], len(rows) > limit
+
+
+async def search_posts(conn, text: str, limit: int, offset: int) -> Tuple[List[Dict], bool]:
+    """Posts matching `text`, best match first. Returns (page, has_more)."""
+    terms = query_terms(text)
+    if not terms:
+        return [], False
+    if conn.is_postgres:
+        rows = await conn.fetchall(f"""
+            SELECT p.*, ts_rank_cd({POSTS_TSVECTOR}, q) AS rank
+            FROM posts p, to_tsquery('simple', ?) q
+            WHERE ({POSTS_TSVECTOR}) @@ q
+            ORDER BY rank DESC, p.timestamp DESC
+            LIMIT ? OFFSET ?
+        """, (tsquery(terms), limit + 1, offset))
+    else:
+        rows = await conn.fetchall(f"""
+            SELECT p.*, {_POSTS_BM25} AS rank
+            FROM posts_fts JOIN posts p ON p.rowid = posts_fts.rowid
+            WHERE posts_fts MATCH ?
+            ORDER BY rank, p.timestamp DESC
+            LIMIT ? OFFSET ?
+        """, (fts5_match(terms), limit + 1, offset))
+    page, has_more = _page(rows, limit)
+    needle = _identifier(text, offset)
+    if needle and not any(p["id"] == needle for p in page):
+        # A pasted CID isn't a word anyone types a prefix of; look it up directly
+        exact = await conn.fetchone("SELECT * FROM posts WHERE id = ?", (needle,))
+        if exact:
+            page.insert(0, dict(exact))
+    for p in page:
+        p.pop("rank", None)
+    return page, has_more
+
+
+async def search_users(conn, text: str, limit: int, offset: int) -> Tuple[List[Dict], bool]:
+    """Users whose username/handle match `text`, best match first. Returns (page, has_more)."""
+    terms = query_terms(text)
+    if not terms:
+        return [], False
+    if conn.is_postgres:
+        rows = await conn.fetchall(f"""
+            SELECT u.*, ts_rank_cd({USERS_TSVECTOR}, q) AS rank
+            FROM users u, to_tsquery('simple', ?) q
+            WHERE ({USERS_TSVECTOR}) @@ q
+            ORDER BY rank DESC, u.username
+            LIMIT ? OFFSET ?
+        """, (tsquery(terms), limit + 1, offset))
+    else:
+        rows = await conn.fetchall(f"""
+            SELECT u.*, {_USERS_BM25} AS rank
+            FROM users_fts JOIN users u ON u.rowid = users_fts.rowid
+            WHERE users_fts MATCH ?
+            ORDER BY rank, u.username
+            LIMIT ? OFFSET ?
+        """, (fts5_match(terms), limit + 1, offset))
+    page, has_more = _page(rows, limit)
+    needle = _identifier(text, offset)
+    if needle and not any(u["peer_id"] == needle for u in page):
+        exact = await conn.fetchone("SELECT * FROM users WHERE peer_id = ?", (needle,))
+        if exact:
+            page.insert(0, dict(exact))
+    for u in page:
+        u.pop("rank", None)
+    return page, has_more
@@ -1,6 +1,33 @@
+import asyncio
 from .ipfs_rpc import IPFSRPCClient
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import AsyncIterator, Optional, List, Dict
+
+# How many predecessor CIDs each post lists in `ancestors` (the prefetch window)
+ANCESTOR_LINKS = 8
+
+
+def _invert_lowest_one(n: int) -> int:
+    return n & (n - 1)
+
+
+def get_skip_height(height: int) -> int:
+    """
+    Height a post's `skip` pointer targets (Bitcoin's CBlockIndex::GetSkipHeight).
+
+    Any ancestor is reachable in O(log N) hops by mixing skip and prev
+    pointers; see _ancestor for the walk.
+    """
+    if height < 2:
+        return 0
+    if height & 1:
+        return _invert_lowest_one(_invert_lowest_one(height - 1)) + 1
+    return _invert_lowest_one(height)
+
+
+def _ts_key(timestamp: Optional[str]) -> str:
+    # Node timestamps are ISO ("T"), post data uses a space; compare either
+    return (timestamp or "").replace("T", " ")
 
 class SocialDAG:
     def __init__(self, rpc_client: IPFSRPCClient):
@@ -9,15 +36,48 @@ class SocialDAG:
     async def create_post(self, content: Dict, prev_post_cid: Optional[str] = None) -> str:
         """
         Create a post object in the Social DAG.
-        Structure: { "data": content, "prev": CID }
+        Structure: { "data": content, "prev": CID, "ancestors": [CID, ...],
+                     "height": n, "skip": CID }
+
+        v2.1 posts number themselves (`height`, 0 = oldest indexed post) and
+        carry a `skip` pointer to an older post, which lets traverse_feed
+        seek deep into a feed without walking every `prev`. A post written
+        on top of a legacy v2.0 chain starts the index at height 0; the
+        legacy tail behind it is still reachable through `prev`.
+
+        `ancestors` lists the next few predecessors (prev first), so a
+        reader can have them all in flight instead of learning each CID
+        only after fetching the post before it.
         """
+        timestamp = datetime.now().isoformat()
         post_obj = {
-            "version": "2.0",
+            "version": "2.1",
             "type": "social_post",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": timestamp,
             "data": content,
-            "prev": prev_post_cid
+            "prev": prev_post_cid,
+            "height": 0,
         }
+
+        try:
+            prev_node = await self._get_post(prev_post_cid) if prev_post_cid else None
+        except Exception:
+            prev_node = None  # unreadable predecessor: link it, but start a fresh index
+        if prev_post_cid:
+            inherited = prev_node.get("ancestors", []) if prev_node is not None else []
+            post_obj["ancestors"] = ([prev_post_cid] + inherited)[:ANCESTOR_LINKS]
+        if prev_node is not None and isinstance(prev_node.get("height"), int):
+            height = prev_node["height"] + 1
+            skip_height = get_skip_height(height)
+            if skip_height == height - 1:
+                skip_cid, skip_node = prev_post_cid, prev_node
+            else:
+                skip_cid, skip_node = await self._ancestor(prev_post_cid, prev_node, skip_height)
+            post_obj["height"] = height
+            if skip_node is not None:
+                post_obj["skip"] = skip_cid
+                post_obj["skip_timestamp"] = skip_node.get("timestamp")
+
         return await self.rpc.dag_put(post_obj)
 
     async def update_profile(self, profile: Dict, latest_post_cid: Optional[str] = None) -> str:
@@ -36,21 +96,134 @@ class SocialDAG:
         await self.rpc.name_publish(root_cid)
         return root_cid
 
-    async def traverse_feed(self, head_cid: str, limit: int = 20) -> List[Dict]:
-        """Traverse the Linked List of posts (DAG)."""
-        posts = []
-        current_cid = head_cid
-        
-        while current_cid and len(posts) < limit:
-            try:
-                node = await self.rpc.dag_get(current_cid)
-                if node.get("type") == "social_post":
-                    posts.append(node["data"])
-                    current_cid = node.get("prev")
-                elif node.get("type") == "profile_root":
-                    current_cid = node.get("feed_head")
-                else:
+    async def traverse_feed(self, head_cid: str, limit: int = 20, offset: int = 0,
+                            before: Optional[str] = None) -> List[Dict]:
+        """Traverse the Linked List of posts (DAG). See iter_feed."""
+        return [post async for post in self.iter_feed(head_cid, limit, offset, before)]
+
+    async def iter_feed(self, head_cid: str, limit: Optional[int] = None, offset: int = 0,
+                        before: Optional[str] = None) -> AsyncIterator[Dict]:
+        """
+        Stream posts newest-first, starting from a profile root or post CID.
+
+        `offset` skips that many of the newest posts and `before` starts at
+        the first post older than the given timestamp; on v2.1 chains both
+        seeks follow skip pointers (O(log N) fetches) and legacy v2.0 posts
+        are stepped through one `prev` at a time.
+
+        While walking, the CIDs a post lists in `ancestors` are fetched
+        ahead, so up to ANCESTOR_LINKS round-trips overlap. Legacy posts
+        have no such list and are read one at a time.
+        """
+        try:
+            current_cid, node = await self._feed_head(head_cid)
+            if node is not None and before:
+                current_cid, node = await self._seek_before(current_cid, node, before)
+            if node is not None and offset > 0:
+                current_cid, node = await self._seek_offset(current_cid, node, offset)
+        except Exception:
+            return
+
+        pending: Dict[str, asyncio.Task] = {}
+        yielded = 0
+        try:
+            while node is not None:
+                yield node["data"]
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    break
+
+                window = ANCESTOR_LINKS if limit is None else min(ANCESTOR_LINKS, limit - yielded)
+                for ancestor in node.get("ancestors", [])[:window]:
+                    if ancestor not in pending:
+                        pending[ancestor] = asyncio.create_task(self._prefetch(ancestor))
+
+                current_cid = node.get("prev")
+                if not current_cid:
+                    break
+                task = pending.pop(current_cid, None)
+                fetched = await task if task else None
+                try:
+                    node = fetched if fetched is not None else await self.rpc.dag_get(current_cid)
+                except Exception:
                     break
-            except:
-                break
-        return posts
+                if node.get("type") != "social_post":
+                    break
+        finally:
+            for task in pending.values():
+                task.cancel()
+
+    async def _prefetch(self, cid: str) -> Optional[Dict]:
+        try:
+            return await self.rpc.dag_get(cid)
+        except Exception:
+            return None  # the walk retries it directly if it gets that far
+
+    # ── Seeking ──
+
+    async def _get_post(self, cid: str) -> Optional[Dict]:
+        node = await self.rpc.dag_get(cid)
+        return node if node.get("type") == "social_post" else None
+
+    async def _feed_head(self, cid: Optional[str]):
+        """Resolve a profile root (or a post CID) to the newest post node."""
+        if not cid:
+            return None, None
+        node = await self.rpc.dag_get(cid)
+        if node.get("type") == "profile_root":
+            cid = node.get("feed_head")
+            if not cid:
+                return None, None
+            node = await self.rpc.dag_get(cid)
+        if node.get("type") != "social_post":
+            return None, None
+        return cid, node
+
+    async def _ancestor(self, cid: str, node: Dict, target_height: int):
+        """
+        Walk from an indexed post down to the post at `target_height`
+        (CBlockIndex::GetAncestor): take `skip` unless it overshoots or a
+        better skip is one `prev` away.
+        """
+        height = node["height"]
+        while node is not None and height > target_height:
+            skip_height = get_skip_height(height)
+            skip_height_prev = get_skip_height(height - 1)
+            if node.get("skip") and (
+                skip_height == target_height
+                or (skip_height > target_height
+                    and not (skip_height_prev < skip_height - 2 and skip_height_prev >= target_height))
+            ):
+                cid = node["skip"]
+                height = skip_height
+            else:
+                cid = node.get("prev")
+                height -= 1
+            node = await self._get_post(cid) if cid else None
+        return cid, node
+
+    async def _seek_offset(self, cid: str, node: Dict, offset: int):
+        while node is not None and offset > 0:
+            height = node.get("height")
+            if isinstance(height, int) and height > 0:
+                step = min(offset, height)
+                cid, node = await self._ancestor(cid, node, height - step)
+                offset -= step
+            else:
+                # Oldest indexed post or a legacy v2.0 post: plain prev walk
+                cid = node.get("prev")
+                node = await self._get_post(cid) if cid else None
+                offset -= 1
+        return cid, node
+
+    async def _seek_before(self, cid: str, node: Dict, before: str):
+        """Move to the newest post strictly older than `before`."""
+        before = _ts_key(before)
+        while node is not None and _ts_key(node.get("timestamp")) >= before:
+            if node.get("skip") and _ts_key(node.get("skip_timestamp")) >= before:
+                # Everything between here and the skip target is newer still
+                cid = node["skip"]
+            else:
+                cid = node.get("prev")
+            node = await self._get_post(cid) if cid else None
+        return cid, node
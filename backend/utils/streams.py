@@ -0,0 +1,130 @@
+import asyncio
+import json
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+# Event types where only the newest value matters; a queued one is replaced
+COALESCED_TYPES = ("unread",)
+
+
+class Subscription:
+    """One connected /api/stream response (one browser tab) and its bounded buffer."""
+
+    def __init__(self, did: str, maxsize: int):
+        self.did = did
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._events: Deque[Dict] = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, event: Dict) -> bool:
+        """Buffer an event. Returns False when the oldest buffered event had to be dropped for it."""
+        kept = True
+        if event.get("type") in COALESCED_TYPES:
+            for i, queued in enumerate(self._events):
+                if queued.get("type") == event["type"]:
+                    del self._events[i]
+                    break
+        if len(self._events) >= self.maxsize:
+            self._events.popleft()
+            self.dropped += 1
+            kept = False
+        self._events.append(event)
+        self._ready.set()
+        return kept
+
+    async def next_batch(self, timeout: float) -> List[Dict]:
+        """Everything buffered, waiting up to `timeout` seconds for the first event ([] on timeout)."""
+        if not self._events:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        batch = list(self._events)
+        self._events.clear()
+        self._ready.clear()
+        return batch
+
+
+class StreamRegistry:
+    """
+    Connected /api/stream subscribers, by DID.
+
+    Only connected streams have a buffer: events for a DID with no stream
+    in this process are not kept (they are in `notifications` for later).
+    Each tab gets its own subscription, so tabs don't steal each other's
+    events, and a subscription is removed as soon as its response ends.
+    Buffers hold `buffer_size` events; a slow reader loses the oldest.
+    """
+
+    def __init__(self, buffer_size: int = 100):
+        self.buffer_size = buffer_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._counters = {"delivered": 0, "dropped": 0, "undeliverable": 0}
+
+    def subscribe(self, did: str) -> Subscription:
+        sub = Subscription(did, self.buffer_size)
+        self._subscribers.setdefault(did, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subscribers.get(sub.did)
+        if subs is None:
+            return
+        subs.discard(sub)
+        if not subs:
+            del self._subscribers[sub.did]
+
+    def deliver(self, did: str, event: Dict) -> int:
+        """Buffer `event` for every stream `did` has open here. Returns how many received it."""
+        subs: Optional[Set[Subscription]] = self._subscribers.get(did)
+        if not subs:
+            self._counters["undeliverable"] += 1
+            return 0
+        for sub in subs:
+            if not sub.push(event):
+                self._counters["dropped"] += 1
+        self._counters["delivered"] += len(subs)
+        return len(subs)
+
+    def is_connected(self, did: str) -> bool:
+        return did in self._subscribers
+
+    def stats(self) -> Dict:
+        return {
+            **self._counters,
+            "streams": sum(len(s) for s in self._subscribers.values()),
+            "users": len(self._subscribers),
+        }
+
+
+def sse_frame(event: Dict) -> str:
+    """One SSE event. Notification events carry their `notifications.id` as the event id."""
+    frame = f"id: {event['id']}\n" if event.get("id") is not None else ""
+    return frame + f"data: {json.dumps(event, default=str)}\n\n"
+
+
+def notification_event(row) -> Dict:
+    """Stream shape of a `notifications` row (the same as a live notification event)."""
+    return {
+        "id": row["id"],
+        "type": row["type"],
+        "title": row["title"],
+        "message": row["message"],
+        "link": row["link"],
+        "timestamp": row["timestamp"],
+    }
+
+
+async def notifications_since(conn, did: str, last_id: int, limit: int) -> Tuple[List[Dict], bool]:
+    """
+    Notifications for `did` after `last_id`, oldest first, as stream events,
+    from the (user_peer_id, id) index. Returns (events, complete); not
+    complete means more than `limit` were missed.
+    """
+    rows = await conn.fetchall(
+        """SELECT id, type, title, message, link, timestamp FROM notifications
+           WHERE user_peer_id = ? AND id > ? ORDER BY id LIMIT ?""",
+        (did, last_id, limit + 1),
+    )
+    return [notification_event(r) for r in rows[:limit]], len(rows) <= limit
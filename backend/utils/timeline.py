@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .social_dag import SocialDAG
+
+logger = logging.getLogger("Timeline")
+
+# (user_peer_id, author_peer_id as stored in `following`, author username)
+Follower = Tuple[str, str, Optional[str]]
+
+
+def peer_id_variants(peer_id: str) -> List[str]:
+    """A peer can be followed as `did:ipfs:<id>` or as the bare id; match both."""
+    if peer_id.startswith("did:ipfs:"):
+        return [peer_id, peer_id[len("did:ipfs:"):]]
+    return [peer_id, f"did:ipfs:{peer_id}"]
+
+
+def local_followers(conn, author_peer_id: str) -> List[Follower]:
+    """Local users following `author_peer_id`, in the shape insert_timeline_posts expects."""
+    rows = conn.execute(
+        "SELECT user_peer_id, following_peer_id, username FROM following WHERE following_peer_id IN (?, ?)",
+        tuple(peer_id_variants(author_peer_id)),
+    ).fetchall()
+    return [(r["user_peer_id"], r["following_peer_id"], r["username"]) for r in rows]
+
+
+def insert_timeline_posts(conn, followers: Iterable[Follower], posts: Iterable[Dict]) -> int:
+    """Fan posts out into each follower's timeline. Existing rows are left alone."""
+    rows = []
+    posts = [p for p in posts if p.get("cid")]
+    for user_peer_id, author_peer_id, author_username in followers:
+        for post in posts:
+            payload = {k: v for k, v in post.items() if not k.startswith("_") and k != "peer_id"}
+            rows.append((
+                user_peer_id,
+                post["cid"],
+                post.get("timestamp") or "",
+                author_peer_id,
+                author_username,
+                json.dumps(payload),
+            ))
+    if rows:
+        conn.executemany("""
+            INSERT OR IGNORE INTO timeline
+            (user_peer_id, post_cid, timestamp, author_peer_id, author_username, payload)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows)
+    return len(rows)
+
+
+class TimelineStore:
+    """
+    Maintains the materialized `timeline` table.
+
+    Rows are written when a followed peer announces a new feed root on
+    pubsub (walking only the posts we haven't seen yet), when a local user
+    uploads, and by the backfill job for `following` rows that predate the
+    table. Reads are plain SQL in the feed handler.
+    """
+
+    def __init__(self, social_dag: SocialDAG, db_connection_factory, feed_engine=None,
+                 backfill_depth: int = 50, max_ingest: int = 200):
+        self.dag = social_dag
+        self.get_db = db_connection_factory
+        self.feed_engine = feed_engine
+        self.backfill_depth = backfill_depth
+        self.max_ingest = max_ingest
+
+    # ── Writes ──
+
+    def add_posts(self, author_peer_id: str, posts: List[Dict],
+                  followers: Optional[List[Follower]] = None) -> int:
+        """Insert posts by `author_peer_id` into every local follower's timeline."""
+        conn = self.get_db()
+        try:
+            if followers is None:
+                followers = local_followers(conn, author_peer_id)
+            count = insert_timeline_posts(conn, followers, posts)
+            conn.commit()
+            return count
+        finally:
+            conn.close()
+
+    async def ingest_root(self, author_peer_id: str, root_cid: str) -> int:
+        """
+        Pull the posts behind a newly announced feed root into followers' timelines.
+
+        The feed is a newest-first linked list, so the walk stops at the
+        first post every follower already has (or after `max_ingest`);
+        steady-state updates fetch just the new posts.
+        """
+        followers, known = await asyncio.to_thread(self._ingest_state, author_peer_id)
+        if not followers:
+            return 0
+
+        fresh: List[Dict] = []
+        async for post in self.dag.iter_feed(root_cid, limit=self.max_ingest):
+            if post.get("cid") in known:
+                break
+            fresh.append(post)
+
+        if not fresh:
+            return 0
+        return await asyncio.to_thread(self.add_posts, author_peer_id, fresh, followers)
+
+    # ── Backfill / rebuild ──
+
+    async def backfill(self, user_peer_id: Optional[str] = None, only_missing: bool = True) -> Dict:
+        """
+        Populate timelines from `following` rows.
+
+        With `only_missing` (the startup job) only (user, peer) pairs that
+        have no timeline rows yet are fetched; otherwise every followed peer
+        is re-read and new posts are added.
+        """
+        if self.feed_engine is None:
+            return {"peers": 0, "rows": 0}
+
+        rows = await asyncio.to_thread(self._following_rows, user_peer_id, only_missing)
+        by_peer: Dict[str, Dict] = {}
+        for r in rows:
+            peer = by_peer.setdefault(r["following_peer_id"], {
+                "following_peer_id": r["following_peer_id"],
+                "username": r["username"],
+                "library_cid": r["library_cid"],
+                "followers": [],
+            })
+            peer["followers"].append((r["user_peer_id"], r["following_peer_id"], r["username"]))
+
+        peers = list(by_peer.values())
+        feeds = await self.feed_engine.fetch_peers(peers, per_peer_limit=self.backfill_depth)
+
+        inserted = 0
+        for peer, posts in zip(peers, feeds):
+            if posts:
+                inserted += await asyncio.to_thread(
+                    self.add_posts, peer["following_peer_id"], posts, peer["followers"]
+                )
+        logger.info(f"Timeline backfill: {len(peers)} peers, {inserted} rows")
+        return {"peers": len(peers), "rows": inserted}
+
+    async def rebuild(self, user_peer_id: Optional[str] = None) -> Dict:
+        """Drop and re-materialize timelines (one user's, or everyone's)."""
+        await asyncio.to_thread(self._clear, user_peer_id)
+        return await self.backfill(user_peer_id, only_missing=False)
+
+    # ── Helpers (sync, run off the event loop) ──
+
+    def _ingest_state(self, author_peer_id: str) -> Tuple[List[Follower], Set[str]]:
+        conn = self.get_db()
+        try:
+            followers = local_followers(conn, author_peer_id)
+            if not followers:
+                return [], set()
+            # Only posts present for *every* follower count as known, so a
+            # newer follower's timeline still gets filled in.
+            rows = conn.execute("""
+                SELECT post_cid FROM timeline
+                WHERE author_peer_id IN (?, ?)
+                GROUP BY post_cid
+                HAVING COUNT(*) >= ?
+            """, (*peer_id_variants(author_peer_id), len(followers))).fetchall()
+            return followers, {r["post_cid"] for r in rows}
+        finally:
+            conn.close()
+
+    def _following_rows(self, user_peer_id: Optional[str], only_missing: bool):
+        query = "SELECT user_peer_id, following_peer_id, username, library_cid FROM following f"
+        clauses, params = [], []
+        if user_peer_id:
+            clauses.append("f.user_peer_id = ?")
+            params.append(user_peer_id)
+        if only_missing:
+            clauses.append("""NOT EXISTS (
+                SELECT 1 FROM timeline t
+                WHERE t.user_peer_id = f.user_peer_id AND t.author_peer_id = f.following_peer_id
+            )""")
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+
+        conn = self.get_db()
+        try:
+            return conn.execute(query, tuple(params)).fetchall()
+        finally:
+            conn.close()
+
+    def _clear(self, user_peer_id: Optional[str]) -> None:
+        conn = self.get_db()
+        try:
+            if user_peer_id:
+                conn.execute("DELETE FROM timeline WHERE user_peer_id = ?", (user_peer_id,))
+            else:
+                conn.execute("DELETE FROM timeline")
+            conn.commit()
+        finally:
+            conn.close()
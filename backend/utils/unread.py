@@ -0,0 +1,67 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Total unread for a party, summed from the per-conversation counters the
+# `conversations` triggers maintain (database.py) — two index ranges, no
+# scan of `messages`.
+_UNREAD_SQL = """
+    SELECT COALESCE(SUM(unread), 0) AS unread FROM (
+        SELECT unread_a AS unread FROM conversations WHERE peer_a = ?
+        UNION ALL
+        SELECT unread_b FROM conversations WHERE peer_b = ? AND peer_a <> peer_b
+    ) c
+"""
+
+
+class UnreadCounters:
+    """
+    Per-user unread message totals for the sidebar badge, kept in memory.
+
+    The database stays the source of truth: a total is loaded from
+    `conversations` on first use and again once it is `ttl` seconds old,
+    which picks up messages written by other server processes. In between,
+    this process's own inserts and mark-read updates adjust it in place
+    with adjust(). At most `max_entries` users are cached (least recently
+    used dropped first).
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._totals: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._counters = {"hits": 0, "loads": 0}
+
+    async def get(self, conn, party: str) -> int:
+        """Unread total for `party` (a uuid7 or peer id); `conn` is an async connection."""
+        cached = self._totals.get(party)
+        if cached is not None and time.monotonic() - cached[1] <= self.ttl:
+            self._totals.move_to_end(party)
+            self._counters["hits"] += 1
+            return cached[0]
+        row = await conn.fetchone(_UNREAD_SQL, (party, party))
+        total = int(row["unread"]) if row else 0
+        self._store(party, total, time.monotonic())
+        self._counters["loads"] += 1
+        return total
+
+    def adjust(self, party: str, delta: int) -> Optional[int]:
+        """Apply a change made by this process. Returns the new total, or None if `party` isn't cached."""
+        cached = self._totals.get(party)
+        if cached is None:
+            return None
+        total = max(0, cached[0] + delta)
+        self._store(party, total, cached[1])
+        return total
+
+    def forget(self, party: str) -> None:
+        self._totals.pop(party, None)
+
+    def stats(self) -> Dict:
+        return {**self._counters, "cached": len(self._totals)}
+
+    def _store(self, party: str, total: int, loaded_at: float) -> None:
+        self._totals[party] = (total, loaded_at)
+        self._totals.move_to_end(party)
+        while len(self._totals) > self.max_entries:
+            self._totals.popitem(last=False)
@@ -0,0 +1,156 @@
+import asyncio
+import bisect
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("UserIndex")
+
+# Fields autocomplete matches on, by prefix, case-insensitively
+PREFIX_FIELDS = ("username", "handle", "uuid7")
+USER_COLUMNS = "peer_id, did, uuid7, username, handle, avatar, bio"
+
+
+def _keys(username: Optional[str], handle: Optional[str], uuid7: Optional[str]) -> List[str]:
+    keys = set()
+    for value in (username, handle, uuid7):
+        if value:
+            key = value.lower()
+            keys.add(key)
+            if key.startswith("@"):
+                keys.add(key[1:])  # handles are stored as "@name"; match "name" too
+    return sorted(keys)
+
+
+def _upper_bound(prefix: str) -> str:
+    """Smallest string greater than every string starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class UserPrefixIndex:
+    """
+    In-memory sorted-prefix index for user autocomplete.
+
+    Holds one sorted list of (lowercased key, peer_id) pairs covering
+    username, handle and uuid7, so a prefix lookup is a bisect plus a short
+    scan. Only keys live in memory; the matching page of rows is fetched by
+    primary key. The list is reloaded from `users` in the background every
+    `ttl` seconds (other workers' writes) and patched in place by upsert()
+    for this worker's own writes. Past `max_users` rows the index turns
+    itself off and lookups use the lower() expression indexes instead.
+    """
+
+    def __init__(self, db_connection_factory, ttl: float = 30.0, max_users: int = 200_000):
+        self.get_db = db_connection_factory
+        self.ttl = ttl
+        self.max_users = max_users
+
+        self._entries: List[Tuple[str, str]] = []
+        self._by_peer: Dict[str, List[str]] = {}
+        self._loaded_at: Optional[float] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self.enabled = True
+        self._counters = {"lookups": 0, "sql_lookups": 0, "refreshes": 0}
+
+    # ── Maintenance ──
+
+    def load(self) -> None:
+        """Rebuild from `users` (blocking)."""
+        conn = self.get_db()
+        try:
+            rows = conn.execute(
+                "SELECT peer_id, username, handle, uuid7 FROM users LIMIT ?", (self.max_users + 1,)
+            ).fetchall()
+        finally:
+            conn.close()
+        if len(rows) > self.max_users:
+            if self.enabled:
+                logger.info(f"More than {self.max_users} users; autocomplete falls back to SQL")
+            self.enabled = False
+            self._entries, self._by_peer = [], {}
+        else:
+            self.enabled = True
+            by_peer = {r["peer_id"]: _keys(r["username"], r["handle"], r["uuid7"]) for r in rows if r["peer_id"]}
+            self._entries = sorted((key, peer_id) for peer_id, keys in by_peer.items() for key in keys)
+            self._by_peer = by_peer
+        self._loaded_at = time.monotonic()
+        self._counters["refreshes"] += 1
+
+    def upsert(self, peer_id: str, username: Optional[str], handle: Optional[str], uuid7: Optional[str]) -> None:
+        """Reflect a user written by this process without waiting for the next reload."""
+        if not self.enabled or self._loaded_at is None or not peer_id:
+            return
+        self.remove(peer_id)
+        keys = _keys(username, handle, uuid7)
+        for key in keys:
+            bisect.insort(self._entries, (key, peer_id))
+        self._by_peer[peer_id] = keys
+
+    def remove(self, peer_id: str) -> None:
+        for key in self._by_peer.pop(peer_id, []):
+            i = bisect.bisect_left(self._entries, (key, peer_id))
+            if i < len(self._entries) and self._entries[i] == (key, peer_id):
+                del self._entries[i]
+
+    async def ensure_fresh(self) -> None:
+        """Load on first use; afterwards reload in the background once `ttl` has passed."""
+        if self._loaded_at is None:
+            await asyncio.to_thread(self.load)
+        elif time.monotonic() - self._loaded_at > self.ttl and (self._refreshing is None or self._refreshing.done()):
+            self._refreshing = asyncio.get_running_loop().create_task(asyncio.to_thread(self.load))
+
+    # ── Lookups ──
+
+    def match(self, prefix: str, limit: int, offset: int = 0) -> Tuple[List[str], bool]:
+        """Peer ids whose username/handle/uuid7 starts with `prefix`, in key order. Returns (page, has_more)."""
+        prefix = prefix.lower()
+        seen, ordered = set(), []
+        i = bisect.bisect_left(self._entries, (prefix, ""))
+        while i < len(self._entries) and len(ordered) <= offset + limit:
+            key, peer_id = self._entries[i]
+            if not key.startswith(prefix):
+                break
+            if peer_id not in seen:
+                seen.add(peer_id)
+                ordered.append(peer_id)
+            i += 1
+        return ordered[offset:offset + limit], len(ordered) > offset + limit
+
+    async def search(self, conn, prefix: str, limit: int, offset: int = 0) -> Tuple[List[Dict], bool]:
+        """Page of user rows matching `prefix`, using the async `conn` for row data."""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return [], False
+        await self.ensure_fresh()
+        if not self.enabled:
+            return await self._search_sql(conn, prefix, limit, offset)
+
+        self._counters["lookups"] += 1
+        peer_ids, has_more = self.match(prefix, limit, offset)
+        if not peer_ids:
+            return [], has_more
+        placeholders = ",".join("?" * len(peer_ids))
+        rows = await conn.fetchall(f"SELECT {USER_COLUMNS} FROM users WHERE peer_id IN ({placeholders})", tuple(peer_ids))
+        by_id = {r["peer_id"]: dict(r) for r in rows}
+        return [by_id[p] for p in peer_ids if p in by_id], has_more
+
+    async def _search_sql(self, conn, prefix: str, limit: int, offset: int) -> Tuple[List[Dict], bool]:
+        # Range scans over the lower() expression indexes (idx_users_*_lower)
+        self._counters["sql_lookups"] += 1
+        collate = ' COLLATE "C"' if conn.is_postgres else ""
+        where = " OR ".join(f"(lower({f}){collate} >= ? AND lower({f}){collate} < ?)" for f in PREFIX_FIELDS)
+        bounds = (prefix, _upper_bound(prefix)) * len(PREFIX_FIELDS)
+        rows = await conn.fetchall(f"""
+            SELECT {USER_COLUMNS} FROM users
+            WHERE {where}
+            ORDER BY lower(username), peer_id
+            LIMIT ? OFFSET ?
+        """, (*bounds, limit + 1, offset))
+        return [dict(r) for r in rows[:limit]], len(rows) > limit
+
+    def size(self) -> Optional[int]:
+        """Users in the index (an estimate of the table size), or None when not loaded/disabled."""
+        return len(self._by_peer) if self.enabled and self._loaded_at is not None else None
+
+    def stats(self) -> Dict:
+        return {**self._counters, "enabled": self.enabled, "users": self.size(), "keys": len(self._entries)}
@@ -13,6 +13,15 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'backend', 'database.db')
 
 TABLES = [
+    "posts_fts",
+    "users_fts",
+    "jobs",
+    "previews",
+    "stream_events",
+    "conversations",
+    "post_counters",
+    "timeline",
+    "library_shards",
     "notifications",
     "recovery_approvals",
     "recovery_requests",
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+
+
+@pytest.fixture
+def temp_db(monkeypatch, tmp_path):
+    """A fresh SQLite database with the full schema, in place of the configured one."""
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("SUPABASE_DB_URL", raising=False)
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    database.close_pool()
+    database.init_db()
+    yield database.DB_PATH
+    database.close_pool()
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+from utils.conversations import conversation_summaries
+
+
+def _summaries(party, users_key="uuid7"):
+    async def scenario():
+        conn = await database.get_async_db_connection()
+        try:
+            return await conversation_summaries(conn, party, users_key=users_key)
+        finally:
+            await conn.close()
+    return {c["peer"]: c for c in asyncio.run(scenario())}
+
+
+def _chat(conn, sender, receiver, text, timestamp):
+    conn.execute(
+        "INSERT INTO messages (sender_uuid7, receiver_uuid7, text, timestamp, is_read) VALUES (?, ?, ?, ?, 0)",
+        (sender, receiver, text, timestamp),
+    )
+
+
+def test_triggers_track_last_message_and_unread(temp_db):
+    conn = database.get_db_connection()
+    conn.execute("INSERT INTO users (peer_id, uuid7, username, avatar) VALUES ('did:bob', 'u-bob', 'Bob', 'b.png')")
+    _chat(conn, "u-bob", "u-al", "hi", "2024-01-01T10:00")
+    _chat(conn, "u-bob", "u-al", "you there?", "2024-01-01T10:01")
+    _chat(conn, "u-al", "u-bob", "yes", "2024-01-01T10:02")
+    _chat(conn, "u-cy", "u-al", "late delivery", "2024-01-01T09:00")
+    conn.execute(
+        "INSERT INTO messages (sender_peer_id, receiver_peer_id, text, timestamp, is_read) VALUES (?, ?, ?, ?, 0)",
+        ("did:bob", "did:al", "over p2p", "2024-01-02T00:00"),
+    )
+    conn.commit()
+
+    mine = _summaries("u-al")
+    assert list(mine) == ["u-bob", "u-cy"]  # newest conversation first
+    assert mine["u-bob"]["last_message"] == "yes" and mine["u-bob"]["last_sender"] == "u-al"
+    assert mine["u-bob"]["unread"] == 2 and mine["u-bob"]["username"] == "Bob"
+    assert mine["u-cy"]["unread"] == 1 and mine["u-cy"]["username"] is None
+    assert _summaries("u-bob")["u-al"]["unread"] == 1
+
+    # An older message arriving late doesn't replace the last one
+    _chat(conn, "u-cy", "u-al", "earlier", "2024-01-01T08:00")
+    conn.execute("UPDATE messages SET is_read = 1 WHERE receiver_uuid7 = 'u-al' AND sender_uuid7 = 'u-bob'")
+    conn.commit()
+    mine = _summaries("u-al")
+    assert mine["u-bob"]["unread"] == 0
+    assert mine["u-cy"]["last_message"] == "late delivery" and mine["u-cy"]["unread"] == 2
+
+    by_peer_id = _summaries("did:al", users_key="peer_id")
+    assert by_peer_id["did:bob"]["last_message"] == "over p2p" and by_peer_id["did:bob"]["username"] == "Bob"
+
+    conn.execute("DELETE FROM messages WHERE sender_uuid7 = 'u-cy'")
+    conn.commit()
+    assert list(_summaries("u-al")) == ["u-bob"]
+    conn.close()
+
+
+def test_backfill_from_existing_messages(temp_db):
+    conn = database.get_db_connection()
+    _chat(conn, "u-bob", "u-al", "hi", "2024-01-01T10:00")
+    _chat(conn, "u-al", "u-bob", "hey", "2024-01-01T10:01")
+    _chat(conn, "u-bob", "u-al", "news", "2024-01-01T10:02")
+    conn.execute("DELETE FROM conversations")  # as on a database from before the table existed
+    conn.commit()
+    conn.close()
+
+    database.close_pool()
+    database.init_db()
+    mine = _summaries("u-al")
+    assert mine["u-bob"]["last_message"] == "news" and mine["u-bob"]["unread"] == 2
+    assert _summaries("u-bob")["u-al"]["unread"] == 1
@@ -4,7 +4,10 @@ print(f"Python Executable: {sys.executable}")
 print(f"Sys Path: {sys.path}")
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
-from utils.crypto import generate_keypair, sign_message, verify_message
+import asyncio
+
+import utils.crypto as crypto
+from utils.crypto import generate_keypair, sign_message, verify_message, verify_message_async, crypto_cache_stats
 
 def test_crypto_flow():
     print("Testing Crypto Flow...")
@@ -36,5 +39,23 @@ def test_crypto_flow():
     
     print("Crypto Flow Test Passed!")
 
+def test_verify_key_is_parsed_once_per_did(monkeypatch):
+    did, _, secret = generate_keypair()
+    signature = sign_message("payload", secret)
+    crypto.resolve_verify_key.cache_clear()
+
+    assert verify_message("payload", signature, did)
+    assert verify_message("payload", signature, did)
+    assert not verify_message("payload", signature, "did:key:zNotAKey")
+    stats = crypto_cache_stats()
+    assert stats["verify_key_misses"] == 2 and stats["verify_key_hits"] == 1
+
+    # Large payloads go through a worker thread with the same result
+    monkeypatch.setattr(crypto, "VERIFY_OFFLOAD_BYTES", 4)
+    offloaded = crypto_cache_stats()["offloaded"]
+    assert asyncio.run(verify_message_async("payload", signature, did))
+    assert not asyncio.run(verify_message_async("tampered", signature, did))
+    assert crypto_cache_stats()["offloaded"] == offloaded + 2
+
 if __name__ == "__main__":
     test_crypto_flow()
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from utils.dag_cache import DagCache
+from utils.ipfs_rpc import IPFSRPCClient
+
+
+def test_lru_evicts_least_recently_used():
+    async def scenario():
+        cache = DagCache(max_entries=2)
+        await cache.put("a", {"n": 1})
+        await cache.put("b", {"n": 2})
+        assert await cache.get("a") == {"n": 1}  # a is now most recent
+        await cache.put("c", {"n": 3})
+        assert await cache.get("b") is None
+        assert await cache.get("a") == {"n": 1}
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+
+def test_byte_budget_and_isolation_from_callers():
+    async def scenario():
+        cache = DagCache(max_entries=100, max_bytes=40)
+        await cache.put("a", {"data": "x" * 20})
+        await cache.put("b", {"data": "y" * 20})  # pushes the total past 40 bytes
+        assert await cache.get("a") is None
+
+        node = await cache.get("b")
+        node["_from_peer"] = "someone"
+        assert "_from_peer" not in await cache.get("b")
+
+    asyncio.run(scenario())
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "dag.db")
+
+    async def scenario():
+        first = DagCache(disk_path=path)
+        await first.put("bafy1", {"type": "social_post"})
+        first.close()
+
+        second = DagCache(disk_path=path)
+        assert await second.get("bafy1") == {"type": "social_post"}
+        stats = second.stats()
+        second.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["disk_hits"] == 1 and stats["misses"] == 0
+
+
+def test_rpc_client_fetches_each_node_once():
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.params["arg"])
+        return httpx.Response(200, content=json.dumps({"type": "social_post", "prev": None}))
+
+    async def scenario():
+        rpc = IPFSRPCClient()
+        rpc.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        await rpc.dag_get("bafyA")
+        await rpc.dag_get("bafyA")
+        await rpc.close()
+
+    asyncio.run(scenario())
+    assert calls == ["bafyA"]
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    async def scenario():
+        cache = DagCache(max_entries=1, disk_path=str(tmp_path / "dag.db"), disk_max_bytes=400)
+        for cid in ("a", "b", "c"):
+            await cache.put(cid, {"d": cid * 100})  # 108 bytes each
+        cache.clear()
+        await cache.put("c", {"d": "c" * 100})  # already on disk: not a write
+        assert await cache.get("a") is not None  # read from disk, now the most recent there
+        await cache.put("d", {"d": "d" * 100})  # over 400 bytes: trim one
+        cache.clear()
+        present = [cid for cid in ("a", "b", "c", "d") if await cache.get(cid) is not None]
+        stats = cache.stats()
+        cache.close()
+        return present, stats
+
+    present, stats = asyncio.run(scenario())
+    assert present == ["a", "c", "d"]
+    assert stats["disk_writes"] == 4 and stats["disk"]["bytes"] == 3 * 108
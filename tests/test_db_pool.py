@@ -0,0 +1,168 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+
+
+def _use_temp_sqlite(monkeypatch, tmp_path):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("SUPABASE_DB_URL", raising=False)
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "pool.db"))
+    database.close_pool()
+
+
+def test_connection_is_reused(monkeypatch, tmp_path):
+    _use_temp_sqlite(monkeypatch, tmp_path)
+
+    conn = database.get_db_connection()
+    raw = conn._conn
+    conn.close()
+    conn.close()  # double close must not return the connection twice
+
+    conn2 = database.get_db_connection()
+    assert conn2._conn is raw
+    conn2.close()
+
+    stats = database.get_pool_stats()
+    assert stats["opened"] == 1
+    assert stats["reused"] == 1
+    assert stats["idle"] == 1
+    assert stats["in_use"] == 0
+    database.close_pool()
+
+
+def test_uncommitted_work_is_rolled_back_on_release(monkeypatch, tmp_path):
+    _use_temp_sqlite(monkeypatch, tmp_path)
+
+    conn = database.get_db_connection()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t (x) VALUES (1)")
+    conn.close()  # no commit
+
+    conn = database.get_db_connection()
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    conn.close()
+    database.close_pool()
+
+
+def test_idle_connections_are_reaped(monkeypatch, tmp_path):
+    _use_temp_sqlite(monkeypatch, tmp_path)
+
+    conn = database.get_db_connection()
+    conn.close()
+    pool = database._get_pool()
+    pool.idle_timeout = 0
+
+    assert pool.reap_idle() == 1
+    stats = database.get_pool_stats()
+    assert stats["idle"] == 0
+    assert stats["reaped"] == 1
+    database.close_pool()
+
+
+def test_pool_keeps_at_most_max_idle(monkeypatch, tmp_path):
+    _use_temp_sqlite(monkeypatch, tmp_path)
+    pool = database._get_pool()
+    pool.max_idle = 2
+
+    conns = [database.get_db_connection() for _ in range(4)]
+    assert database.get_pool_stats()["in_use"] == 4
+    for c in conns:
+        c.close()
+
+    stats = database.get_pool_stats()
+    assert stats["idle"] == 2
+    assert stats["closed"] == 2
+    database.close_pool()
+
+
+def test_async_connection_shares_sqlite_pool(monkeypatch, tmp_path):
+    _use_temp_sqlite(monkeypatch, tmp_path)
+
+    async def scenario():
+        conn = await database.get_async_db_connection()
+        try:
+            await conn.execute("CREATE TABLE t (x INTEGER, y TEXT)")
+            await conn.execute("INSERT INTO t (x, y) VALUES (?, ?)", (1, "a"))
+            await conn.commit()
+            row = await conn.fetchone("SELECT x, y FROM t WHERE x = ?", (1,))
+            assert row["y"] == "a" and row[0] == 1
+            rows = await conn.fetchall("SELECT * FROM t")
+            assert len(rows) == 1
+        finally:
+            await conn.close()
+            await conn.close()
+
+    asyncio.run(scenario())
+    stats = database.get_pool_stats()
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 1
+    database.close_pool()
+
+
+def test_async_pool_of_a_previous_loop_is_closed(monkeypatch):
+    monkeypatch.setattr(database, "_async_pool", None)
+    monkeypatch.setattr(database, "_async_pool_key", None)
+    finished = []
+
+    class FakePgConn:
+        def finish(self):
+            finished.append(True)
+
+    class FakeAsyncConn:
+        pgconn = FakePgConn()
+
+    async def first_loop():
+        pool = database._get_async_pool("postgresql://example/db")
+        pool._mark_checkout(reused=False)
+        pool._park(FakeAsyncConn(), True)
+        return pool
+
+    async def second_loop():
+        return database._get_async_pool("postgresql://example/db")
+
+    # Two live loops, so their ids can't coincide
+    loops = [asyncio.new_event_loop(), asyncio.new_event_loop()]
+    try:
+        old = loops[0].run_until_complete(first_loop())
+        new = loops[1].run_until_complete(second_loop())
+    finally:
+        for loop in loops:
+            loop.close()
+    assert new is not old
+    assert finished == [True] and old.stats()["idle"] == 0
+
+
+def test_pool_is_capped_at_max_size(tmp_path):
+    path = str(tmp_path / "capped.db")
+    pool = database._ConnectionPool(lambda: database._connect_sqlite(path), False, max_size=2, timeout=0.05)
+    first, second = pool.acquire(), pool.acquire()
+
+    # Off the event loop a borrower waits, then gives up
+    try:
+        pool.acquire()
+        assert False, "expected PoolExhausted"
+    except database.PoolExhausted:
+        pass
+
+    # On the event loop it fails at once; a returned connection is handed out again
+    async def on_loop():
+        try:
+            pool.acquire()
+            assert False, "expected PoolExhausted"
+        except database.PoolExhausted:
+            pass
+        pool.release(first)
+        return pool.acquire()
+
+    assert asyncio.run(on_loop()) is first
+    stats = pool.stats()
+    assert stats["open"] == 2 and stats["max_size"] == 2 and stats["exhausted"] == 2
+    pool.release(first)
+    pool.release(second)
+    pool.close_all()
+    assert pool.stats()["open"] == 0
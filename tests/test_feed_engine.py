@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from utils.feed_engine import FeedEngine
+
+
+class FakeRPC:
+    def __init__(self, delays):
+        self.delays = delays
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def name_resolve(self, peer_id):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(peer_id, 0))
+        finally:
+            self.in_flight -= 1
+        return f"root-{peer_id}"
+
+
+class FakeDAG:
+    def __init__(self, feeds):
+        self.feeds = feeds
+
+    async def traverse_feed(self, head_cid, limit=20):
+        peer_id = head_cid.replace("root-", "")
+        return [dict(p) for p in self.feeds.get(peer_id, [])[:limit]]
+
+
+def _posts(peer, *timestamps):
+    return [{"cid": f"{peer}-{ts}", "timestamp": ts} for ts in timestamps]
+
+
+def test_fan_in_tags_each_peer_feed():
+    feeds = {
+        "a": _posts("a", "2024-01-05", "2024-01-03", "2024-01-01"),
+        "b": _posts("b", "2024-01-04", "2024-01-02"),
+    }
+    engine = FeedEngine(FakeRPC({}), FakeDAG(feeds))
+    peers = [{"following_peer_id": "a", "username": "A"}, {"following_peer_id": "b", "username": "B"}]
+
+    peer_feeds = asyncio.run(engine.fetch_peers(peers, per_peer_limit=2))
+
+    assert [[p["timestamp"] for p in feed] for feed in peer_feeds] == [
+        ["2024-01-05", "2024-01-03"], ["2024-01-04", "2024-01-02"],
+    ]
+    assert peer_feeds[1][0]["peer_id"] == "b"
+    assert peer_feeds[1][0]["_from_peer"] == "B"
+
+
+def test_slow_peer_times_out_without_blocking_others():
+    feeds = {"fast": _posts("fast", "2024-01-02"), "slow": _posts("slow", "2024-01-03")}
+    engine = FeedEngine(FakeRPC({"slow": 1.0}), FakeDAG(feeds), peer_timeout=0.05)
+    peers = [{"following_peer_id": "fast"}, {"following_peer_id": "slow"}]
+
+    peer_feeds = asyncio.run(engine.fetch_peers(peers, per_peer_limit=10))
+
+    assert [p["cid"] for p in peer_feeds[0]] == ["fast-2024-01-02"]
+    assert peer_feeds[1] == []
+
+
+def test_concurrency_is_bounded():
+    rpc = FakeRPC({f"p{i}": 0.01 for i in range(10)})
+    engine = FeedEngine(rpc, FakeDAG({}), max_concurrency=3)
+    peers = [{"following_peer_id": f"p{i}"} for i in range(10)]
+
+    asyncio.run(engine.fetch_peers(peers, per_peer_limit=5))
+
+    assert rpc.max_in_flight == 3
@@ -122,7 +122,8 @@ async def test_global_scale():
         
         update_msg = {
             "peer_id": "test_peer_id",
-            "new_root": post2_cid
+            "new_root": post2_cid,
+            "_from_peer_id": "test_peer_id"
         }
         # This should trigger a pin because it's followed
         await discovery.handle_feed_update(update_msg)
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from utils.ipfs_rpc import IPFSRPCClient
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+def test_add_stream_sends_chunked_multipart():
+    seen = {}
+
+    async def handler(request):
+        seen["content_type"] = request.headers["content-type"]
+        seen["chunked"] = request.headers.get("transfer-encoding")
+        seen["body"] = await request.aread()
+        return httpx.Response(200, content=json.dumps({"Hash": "bafyfile"}))
+
+    progress = []
+
+    async def scenario():
+        rpc = IPFSRPCClient()
+        rpc.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        cid = await rpc.add_stream(_chunks(b"hello ", b"", b"world"), "clip.mp4", on_progress=progress.append)
+        await rpc.close()
+        return cid
+
+    assert asyncio.run(scenario()) == "bafyfile"
+    boundary = seen["content_type"].split("boundary=")[1]
+    assert seen["chunked"] == "chunked"
+    assert seen["body"].startswith(f"--{boundary}\r\n".encode())
+    assert b'filename="clip.mp4"' in seen["body"]
+    assert seen["body"].endswith(f"\r\nhello world\r\n--{boundary}--\r\n".encode())
+    assert progress == [6, 11]
+
+
+def test_add_stream_propagates_source_errors():
+    async def failing():
+        yield b"part"
+        raise ValueError("too big")
+
+    async def handler(request):
+        await request.aread()
+        return httpx.Response(200, content=json.dumps({"Hash": "bafyfile"}))
+
+    async def scenario():
+        rpc = IPFSRPCClient()
+        rpc.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            await rpc.add_stream(failing())
+        finally:
+            await rpc.close()
+
+    with pytest.raises(ValueError):
+        asyncio.run(scenario())
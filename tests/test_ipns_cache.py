@@ -0,0 +1,76 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from utils.ipns_cache import IpnsCache
+
+
+class Resolver:
+    def __init__(self, answers, delay=0):
+        self.answers = answers
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, name):
+        self.calls.append(name)
+        await asyncio.sleep(self.delay)
+        answer = self.answers.get(name)
+        if isinstance(answer, list):
+            return answer.pop(0)
+        return answer
+
+
+def test_fresh_and_negative_entries_skip_the_resolver():
+    resolver = Resolver({"peerA": "bafyA"})
+    cache = IpnsCache(ttl=60, negative_ttl=60)
+
+    async def scenario():
+        assert await cache.resolve("did:ipfs:peerA", resolver) == "bafyA"
+        assert await cache.resolve("peerA", resolver) == "bafyA"
+        assert await cache.resolve("offline", resolver) is None
+        assert await cache.resolve("offline", resolver) is None
+
+    asyncio.run(scenario())
+    assert resolver.calls == ["peerA", "offline"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["negative_hits"] == 1
+
+
+def test_stale_entry_is_served_while_refreshing():
+    resolver = Resolver({"peerA": ["bafy1", "bafy2"]})
+    cache = IpnsCache(ttl=0, stale_ttl=60)
+
+    async def scenario():
+        assert await cache.resolve("peerA", resolver) == "bafy1"
+        assert await cache.resolve("peerA", resolver) == "bafy1"  # stale, refresh kicked off
+        await asyncio.sleep(0.01)
+        return cache._entries["peerA"].value
+
+    assert asyncio.run(scenario()) == "bafy2"
+    assert cache.stats()["refreshes"] == 1
+
+
+def test_concurrent_misses_share_one_resolve():
+    resolver = Resolver({"peerA": "bafyA"}, delay=0.02)
+    cache = IpnsCache()
+
+    async def scenario():
+        return await asyncio.gather(*(cache.resolve("peerA", resolver) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["bafyA"] * 5
+    assert len(resolver.calls) == 1
+
+
+def test_published_roots_are_served_and_announcements_force_a_resolve():
+    resolver = Resolver({"peerA": "bafy3"})
+    cache = IpnsCache()
+
+    async def scenario():
+        cache.update("did:ipfs:peerA", "bafy2")
+        assert await cache.resolve("peerA", resolver) == "bafy2"
+        cache.invalidate("did:ipfs:peerA")
+        return await cache.resolve("peerA", resolver)
+
+    assert asyncio.run(scenario()) == "bafy3"
+    assert resolver.calls == ["peerA"]
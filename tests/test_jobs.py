@@ -0,0 +1,68 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+from utils.jobs import JobQueue
+
+
+def test_enqueue_is_idempotent_and_runs_once(temp_db):
+    queue = JobQueue(database.get_db_connection)
+    ran = []
+
+    async def handler(payload):
+        ran.append(payload["cid"])
+        return {"ok": True}
+
+    queue.register("pin", handler)
+    first = queue.enqueue("pin", {"cid": "bafy1"}, key="pin:bafy1")
+    assert queue.enqueue("pin", {"cid": "bafy1"}, key="pin:bafy1") == first
+
+    async def scenario():
+        return [await queue.run_once(), await queue.run_once()]
+
+    assert asyncio.run(scenario()) == [True, False]
+    assert ran == ["bafy1"]
+    job = queue.get(first)
+    assert job["status"] == "done" and job["attempts"] == 1 and job["result"] == {"ok": True}
+
+
+def test_failures_back_off_then_fail(temp_db):
+    queue = JobQueue(database.get_db_connection, max_attempts=2, base_backoff=60)
+
+    async def handler(payload):
+        raise RuntimeError("daemon down")
+
+    queue.register("pubsub", handler)
+    job_id = queue.enqueue("pubsub", {})
+
+    assert asyncio.run(queue.run_once())
+    job = queue.get(job_id)
+    assert job["status"] == "queued" and job["attempts"] == 1
+    assert job["next_run_at"] >= time.time() + 29  # backoff * jitter(0.5..1)
+    assert "daemon down" in job["last_error"]
+    assert not asyncio.run(queue.run_once())  # not due yet
+
+    conn = database.get_db_connection()
+    conn.execute("UPDATE jobs SET next_run_at = 0 WHERE id = ?", (job_id,))
+    conn.commit()
+    conn.close()
+    assert asyncio.run(queue.run_once())
+    assert queue.get(job_id)["status"] == "failed"
+
+
+def test_expired_lease_is_requeued(temp_db):
+    queue = JobQueue(database.get_db_connection, lease=60)
+    job_id = queue.enqueue("thumbnail", {})
+    claimed = queue._claim()
+    assert claimed["id"] == job_id and queue._claim() is None
+
+    conn = database.get_db_connection()
+    conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time() - 120, job_id))
+    conn.commit()
+    conn.close()
+    queue._requeue_expired()
+    assert queue.get(job_id)["status"] == "queued"
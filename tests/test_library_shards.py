@@ -0,0 +1,88 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+import main
+from utils.library_shards import index_node, iter_library_index, shard_node
+
+
+def _add_post(cid, name="post"):
+    conn = database.get_db_connection()
+    conn.execute("INSERT INTO posts (id, name, timestamp) VALUES (?, ?, ?)", (cid, name, "2024-01-01"))
+    conn.commit()
+    conn.close()
+
+
+def _publish(snapshot):
+    # What _publish_manifest records once the puts succeed, minus the ipfs calls
+    main._mark_shards_published([
+        (shard, c["version"], c["digest"], f"cid-{shard}" if c["posts"] else None, len(c["posts"]))
+        for shard, c in snapshot["pending"].items()
+    ])
+
+
+def test_only_changed_shards_are_pending(temp_db):
+    for cid in ("bafya", "bafyb", "bafyc", "bafyd"):
+        _add_post(cid)
+
+    first = main._manifest_snapshot()
+    assert sorted(first["pending"]) == ["a", "b", "c", "d"]
+    _publish(first)
+
+    assert main._manifest_snapshot()["pending"] == {}
+
+    conn = database.get_db_connection()
+    conn.execute("UPDATE posts SET name = ? WHERE id = ?", ("edited", "bafyb"))
+    conn.execute("DELETE FROM posts WHERE id = ?", ("bafyd",))
+    conn.commit()
+    conn.close()
+
+    second = main._manifest_snapshot()
+    assert sorted(second["pending"]) == ["b", "d"]
+    assert sorted(second["clean"]) == ["a", "c"]
+    assert "d" not in second["shards"]
+    assert main._manifest_fingerprint(second) != main._manifest_fingerprint(first)
+
+    _publish(second)
+    conn = database.get_db_connection()
+    shards = [r["shard"] for r in conn.execute("SELECT shard FROM library_shards ORDER BY shard").fetchall()]
+    conn.close()
+    assert shards == ["a", "b", "c"]
+    database.close_pool()
+
+
+class MemoryRPC:
+    def __init__(self):
+        self.nodes = {}
+        self.gets = []
+
+    def put(self, node):
+        cid = f"bafy{len(self.nodes)}"
+        self.nodes[cid] = node
+        return cid
+
+    async def dag_get(self, cid):
+        self.gets.append(cid)
+        return self.nodes[cid]
+
+
+def test_index_is_read_a_shard_at_a_time():
+    rpc = MemoryRPC()
+    a = rpc.put(shard_node("a", [{"cid": "x1a"}, {"cid": "x2a"}]))
+    b = rpc.put(shard_node("b", [{"cid": "x1b"}]))
+    index = index_node({"a": (a, 2), "b": (b, 1)})
+    assert index["count"] == 3
+
+    async def first_two():
+        posts = []
+        async for post in iter_library_index(rpc, index):
+            posts.append(post["cid"])
+            if len(posts) == 2:
+                break
+        return posts
+
+    assert asyncio.run(first_two()) == ["x1a", "x2a"]
+    assert rpc.gets == [a]
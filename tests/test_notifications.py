@@ -0,0 +1,64 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+from utils.notifications import NotificationWriter, id_ranges
+
+
+def test_queued_notifications_flush_in_one_batch_with_ids(temp_db):
+    flushed = []
+
+    async def on_written(items):
+        flushed.append(items)
+
+    writer = NotificationWriter(database.get_db_connection, on_written, flush_interval=60, max_batch=3)
+
+    async def scenario():
+        writer.add("did:alice", "like", "Liked", "", "/p/1", "2024-01-01T00:00:00")
+        writer.add("did:bob", "comment", "Comment", "hi", "/p/2", "2024-01-01T00:00:01")
+        assert writer.pending() == 2  # nothing written yet
+        writer.add("did:alice", "like", "Liked", "", "/p/3", "2024-01-01T00:00:02")  # max_batch: flush now
+        for _ in range(100):
+            if flushed:
+                break
+            await asyncio.sleep(0.01)
+        writer.add("did:bob", "like", "Liked", "", "/p/4", "2024-01-01T00:00:03")
+        await writer.stop()  # flushes the rest
+
+    asyncio.run(scenario())
+    assert [len(batch) for batch in flushed] == [3, 1]
+    assert [(did, e["id"], e["link"]) for did, e in flushed[0]] == [
+        ("did:alice", 1, "/p/1"), ("did:bob", 2, "/p/2"), ("did:alice", 3, "/p/3"),
+    ]
+    conn = database.get_db_connection()
+    assert conn.execute("SELECT COUNT(*) AS n FROM notifications").fetchone()["n"] == 4
+    conn.close()
+    assert writer.stats() == {"queued": 4, "written": 4, "batches": 2, "errors": 0, "pending": 0}
+
+
+def test_failed_flush_keeps_rows_for_the_next_one(temp_db):
+    healthy = database.get_db_connection
+
+    def broken():
+        raise RuntimeError("database unavailable")
+
+    writer = NotificationWriter(broken, lambda items: None, flush_interval=60)
+
+    async def scenario():
+        writer.add("did:alice", "like", "Liked", "", "", "t")
+        assert await writer.flush() == 0
+        writer.get_db = healthy
+        written = await writer.flush()
+        await writer.stop()
+        return written
+
+    assert asyncio.run(scenario()) == 1
+    assert writer.stats()["errors"] == 1 and writer.pending() == 0
+
+
+def test_id_ranges():
+    assert id_ranges([7, 1, 3, 2, 2, 9, 8]) == [(1, 3), (7, 9)]
+    assert id_ranges([]) == []
@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+from utils.notify import NotificationBus, _notify_payload
+
+
+def test_events_reach_other_processes_once(temp_db):
+    seen_a, seen_b = [], []
+    # Two buses on one database stand in for two server processes
+    bus_a = NotificationBus(database.get_db_connection, lambda did, e: seen_a.append((did, e)), poll_interval=0.01)
+    bus_b = NotificationBus(database.get_db_connection, lambda did, e: seen_b.append((did, e)), poll_interval=0.01)
+
+    async def scenario():
+        bus_a.start()
+        bus_b.start()
+        await asyncio.sleep(0.05)  # tails start from the current end of the table
+        await bus_a.publish_many([("did:alice", {"type": "like", "title": "t"})])
+        await bus_b.publish_async("did:bob", {"type": "unread", "unread": 2})
+        for _ in range(100):
+            if len(seen_a) == 2 and len(seen_b) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        await bus_a.stop()
+        await bus_b.stop()
+
+    asyncio.run(scenario())
+    expected = [("did:alice", {"type": "like", "title": "t"}), ("did:bob", {"type": "unread", "unread": 2})]
+    assert seen_a == expected
+    assert sorted(seen_b, key=lambda x: x[0]) == expected  # its own event first, then the tailed one
+    assert bus_a.stats()["published"] == 1 and bus_a.stats()["received"] == 1
+
+
+def test_old_events_are_pruned(temp_db):
+    bus = NotificationBus(database.get_db_connection, lambda did, e: None, retention=0)
+    bus._share([("did:alice", {"type": "like"})])
+    bus._prune()
+    assert bus._read_since(0) == []
+
+
+def test_oversized_notify_payload_is_slimmed():
+    payload = _notify_payload("o", "did:a", {"id": 7, "type": "comment", "message": "x" * 10_000})
+    assert len(payload) < 8000 and '"id": 7' in payload and "message" not in payload
@@ -73,8 +73,8 @@ import asyncio
 
 @pytest.mark.asyncio
 async def test_handle_inbox_message(mock_db_user):
-    # Mock verify_message to return True
-    with patch("main.verify_message", return_value=True):
+    # Mock verify_message_async to return True
+    with patch("main.verify_message_async", new_callable=AsyncMock, return_value=True):
         
         payload = json.dumps({"text": "Incoming!", "timestamp": "2023-01-01"})
         data = {
@@ -0,0 +1,114 @@
+import asyncio
+import base64
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+import main
+from fastapi import HTTPException
+
+
+class FakeRequest:
+    def __init__(self, did):
+        self.headers = {"X-DID": did}
+
+
+def _pages(fetch, key):
+    """Follow next_cursor from the first page to the last; returns every row seen."""
+    seen, cursor = [], None
+    while True:
+        page = asyncio.run(fetch(cursor))
+        seen.extend(page[key])
+        if not page["has_more"]:
+            assert page["next_cursor"] is None
+            return seen
+        cursor = page["next_cursor"]
+
+
+def test_library_cursor_walks_ties_without_gaps(temp_db):
+    conn = database.get_db_connection()
+    for i in range(23):
+        # Four posts share each timestamp, so pages split inside a tie
+        conn.execute("INSERT INTO posts (id, name, timestamp) VALUES (?, ?, ?)",
+                     (f"bafy{i:02d}", "post", f"2024-01-{i // 4 + 1:02d}"))
+    conn.commit()
+    conn.close()
+
+    seen = _pages(lambda cursor: main.get_library(FakeRequest("did:me"), limit=5, cursor=cursor), "library")
+    newest_first = sorted(range(23), key=lambda i: (i // 4, i), reverse=True)
+    assert [p["cid"] for p in seen] == [f"bafy{i:02d}" for i in newest_first]
+
+
+def test_null_timestamps_page_last_instead_of_ending_the_walk(temp_db):
+    conn = database.get_db_connection()
+    for i in range(9):
+        timestamp = None if i in (2, 3, 7) else f"2024-01-{i + 1:02d}"
+        conn.execute("INSERT INTO posts (id, name, timestamp) VALUES (?, ?, ?)", (f"bafy{i}", "post", timestamp))
+        conn.execute(
+            "INSERT INTO messages (sender_peer_id, receiver_peer_id, text, timestamp, is_read) VALUES (?, ?, ?, ?, 1)",
+            ("did:me", "did:you", f"m{i}", timestamp),
+        )
+    conn.commit()
+    conn.close()
+
+    seen = _pages(lambda cursor: main.get_library(FakeRequest("did:me"), limit=2, cursor=cursor), "library")
+    assert [p["cid"] for p in seen] == ["bafy8", "bafy6", "bafy5", "bafy4", "bafy1", "bafy0", "bafy7", "bafy3", "bafy2"]
+
+    texts, cursor = [], None
+    while True:
+        page = asyncio.run(main.get_chat_history("did:you", FakeRequest("did:me"), limit=2, cursor=cursor))
+        texts = [m["text"] for m in page["history"]] + texts
+        if not page["has_more"]:
+            break
+        cursor = page["next_cursor"]
+    assert texts == ["m2", "m3", "m7", "m0", "m1", "m4", "m5", "m6", "m8"]
+
+
+def test_user_cursor_pages_by_peer_id(temp_db):
+    conn = database.get_db_connection()
+    for i in range(11):
+        conn.execute("INSERT INTO users (peer_id, uuid7, username) VALUES (?, ?, ?)",
+                     (f"did:u{i:02d}", f"u{i:02d}", f"user{i}"))
+    conn.commit()
+    conn.close()
+
+    seen = _pages(lambda cursor: main.list_users(limit=3, cursor=cursor), "users")
+    assert [u["peer_id"] for u in seen] == [f"did:u{i:02d}" for i in range(11)]
+
+
+def test_chat_cursor_merges_both_directions(temp_db):
+    conn = database.get_db_connection()
+    for i in range(17):
+        sender, receiver = ("did:me", "did:you") if i % 3 else ("did:you", "did:me")
+        conn.execute(
+            "INSERT INTO messages (sender_peer_id, receiver_peer_id, text, timestamp, is_read) VALUES (?, ?, ?, ?, 1)",
+            (sender, receiver, f"m{i:02d}", f"2024-01-01T10:{i // 3:02d}"),
+        )
+    conn.execute(
+        "INSERT INTO messages (sender_peer_id, receiver_peer_id, text, timestamp, is_read) VALUES (?, ?, ?, ?, 1)",
+        ("did:you", "did:other", "not ours", "2024-01-01T10:03"),
+    )
+    conn.commit()
+    conn.close()
+
+    pages, cursor = [], None
+    while True:
+        page = asyncio.run(main.get_chat_history("did:you", FakeRequest("did:me"), limit=4, cursor=cursor))
+        pages.insert(0, [m["text"] for m in page["history"]])  # each page is older than the last
+        if not page["has_more"]:
+            break
+        cursor = page["next_cursor"]
+    assert [text for page in pages for text in page] == [f"m{i:02d}" for i in range(17)]
+
+
+@pytest.mark.parametrize("values", [[{}, []], ["2024-01-01", True], ["2024-01-01"]])
+def test_malformed_cursor_is_a_400(values):
+    cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+    with pytest.raises(HTTPException) as err:
+        main.decode_cursor(cursor, 2)
+    assert err.value.status_code == 400
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+from utils import counters
+from utils.counters import counts_from_row, interaction_summaries, reconcile_post_counters
+
+
+def _counts(conn, cid):
+    return counts_from_row(conn.execute(
+        "SELECT likes, dislikes, views FROM post_counters WHERE post_cid = ?", (cid,)
+    ).fetchone())
+
+
+def test_triggers_track_interactions(temp_db):
+    conn = database.get_db_connection()
+    conn.execute("INSERT INTO posts (id, name) VALUES ('bafy1', 'p')")
+    for user, kind in [("alice", "like"), ("bob", "like"), ("carol", "dislike"), ("alice", "view")]:
+        conn.execute(
+            "INSERT INTO interactions (post_cid, user_peer_id, type, timestamp) VALUES (?, ?, ?, '')",
+            ("bafy1", user, kind),
+        )
+    assert _counts(conn, "bafy1") == {"likes_count": 2, "dislikes_count": 1, "views": 1}
+
+    conn.execute("DELETE FROM interactions WHERE user_peer_id = 'bob' AND type = 'like'")
+    conn.execute("UPDATE interactions SET type = 'like' WHERE user_peer_id = 'carol'")
+    conn.commit()
+    assert _counts(conn, "bafy1") == {"likes_count": 2, "dislikes_count": 0, "views": 1}
+    assert _counts(conn, "bafy-missing") == {"likes_count": 0, "dislikes_count": 0, "views": 0}
+    conn.close()
+
+
+def test_reconcile_repairs_drift(temp_db):
+    conn = database.get_db_connection()
+    conn.execute("INSERT INTO posts (id, name) VALUES ('bafy1', 'p')")
+    conn.execute("INSERT INTO interactions (post_cid, user_peer_id, type, timestamp) VALUES ('bafy1', 'a', 'like', '')")
+    conn.execute("UPDATE post_counters SET likes = 7, dislikes = 3")
+    conn.execute("INSERT INTO post_counters (post_cid, likes) VALUES ('bafy-gone', 4)")
+    conn.commit()
+
+    assert reconcile_post_counters(conn, ["bafy1"]) == 1
+    assert _counts(conn, "bafy1") == {"likes_count": 1, "dislikes_count": 0, "views": 0}
+    assert reconcile_post_counters(conn) == 1
+    assert conn.execute("SELECT 1 FROM post_counters WHERE post_cid = 'bafy-gone'").fetchone() is None
+    assert reconcile_post_counters(conn) == 0
+    conn.close()
+
+
+def test_interaction_summaries_batch(temp_db):
+    conn = database.get_db_connection()
+    conn.execute("INSERT INTO posts (id, name) VALUES ('bafy1', 'p'), ('bafy2', 'q')")
+    for cid, user, kind in [("bafy1", "me", "like"), ("bafy1", "bob", "like"), ("bafy2", "me", "dislike")]:
+        conn.execute(
+            "INSERT INTO interactions (post_cid, user_peer_id, type, timestamp) VALUES (?, ?, ?, '')",
+            (cid, user, kind),
+        )
+    conn.execute("INSERT INTO comments (post_cid, user_peer_id, username, text, timestamp) VALUES ('bafy2', 'bob', 'bob', 'hi', '')")
+    conn.commit()
+    conn.close()
+
+    async def scenario():
+        conn = await database.get_async_db_connection()
+        try:
+            return await interaction_summaries(conn, ["bafy1", "bafy2", "bafy1", "bafy-none"], "me")
+        finally:
+            await conn.close()
+
+    summaries = asyncio.run(scenario())
+    assert list(summaries) == ["bafy1", "bafy2", "bafy-none"]
+    assert summaries["bafy1"] == {
+        "likes_count": 2, "dislikes_count": 0, "views": 0,
+        "recommended": True, "not_recommended": False, "comments_count": 0,
+    }
+    assert summaries["bafy2"]["not_recommended"] and summaries["bafy2"]["comments_count"] == 1
+    assert summaries["bafy-none"]["likes_count"] == 0 and not summaries["bafy-none"]["recommended"]
+
+
+def test_reconcile_holds_off_interaction_writes(temp_db, monkeypatch):
+    conn = database.get_db_connection()
+    conn.execute("INSERT INTO posts (id, name) VALUES ('bafy1', 'p')")
+    conn.execute("INSERT INTO interactions (post_cid, user_peer_id, type, timestamp) VALUES ('bafy1', 'a', 'like', '')")
+    conn.commit()
+    blocked = []
+    recount = counters._reconcile
+
+    def recount_while_someone_likes(*args):
+        other = sqlite3.connect(temp_db, timeout=0)
+        try:
+            other.execute("INSERT INTO interactions (post_cid, user_peer_id, type, timestamp) VALUES ('bafy1', 'b', 'like', '')")
+        except sqlite3.OperationalError:
+            blocked.append(True)
+        finally:
+            other.close()
+        return recount(*args)
+
+    monkeypatch.setattr(counters, "_reconcile", recount_while_someone_likes)
+    assert reconcile_post_counters(conn) == 0
+    assert blocked == [True]
+    conn.close()
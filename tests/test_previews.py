@@ -0,0 +1,54 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+from utils import previews
+from utils.previews import PreviewPipeline, preview_kind
+
+
+def test_preview_kind_follows_media_type():
+    assert preview_kind("cat.JPG", "image") == "image"
+    assert preview_kind("logo.svg", "image") is None
+    assert preview_kind("talk.mkv", "video") == "video"
+    assert preview_kind("paper.pdf", "text") == "pdf"
+    assert preview_kind("notes.md", "text") is None
+
+
+def test_cached_preview_skips_rendering(temp_db):
+    pipeline = PreviewPipeline(database.get_db_connection)
+    pipeline.kinds = {"pdf"}
+    pipeline._remember("bafysrc", "bafythumb", "pdf")
+
+    async def add(data):
+        raise AssertionError("nothing should be added")
+
+    result = asyncio.run(pipeline.preview_for("bafysrc", None, "pdf", add))
+    assert result == "bafythumb" and pipeline.stats()["cache_hits"] == 1
+
+
+def test_missing_tool_is_skipped_without_spawning(temp_db, tmp_path):
+    pipeline = PreviewPipeline(database.get_db_connection)
+    pipeline.kinds = set()
+    src = tmp_path / "clip.mp4"
+    src.write_bytes(b"not really a video")
+
+    async def add(data):
+        raise AssertionError("nothing should be added")
+
+    assert asyncio.run(pipeline.preview_for("bafyclip", str(src), "video", add)) is None
+    assert pipeline._pool is None
+
+
+def test_image_preview_is_downscaled(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    src, out = tmp_path / "big.png", tmp_path / "out.jpg"
+    Image.new("RGBA", (2000, 1000), (255, 0, 0, 255)).save(src)
+
+    assert previews.render_preview("image", str(src), str(out), max_size=256)
+    with Image.open(out) as img:
+        assert img.format == "JPEG" and img.size == (256, 128)
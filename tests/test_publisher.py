@@ -0,0 +1,99 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from utils.publisher import DebouncedPublisher
+
+
+class Source:
+    def __init__(self):
+        self.content = {"library": []}
+        self.published = []
+
+    def snapshot(self):
+        return dict(self.content)
+
+    def publish(self, snapshot):
+        self.published.append(snapshot)
+        return f"cid-{len(self.published)}"
+
+
+def test_burst_is_coalesced_into_one_publish():
+    source = Source()
+    publisher = DebouncedPublisher("test", source.snapshot, source.publish, debounce=0.05, max_delay=1)
+
+    async def scenario():
+        for i in range(10):
+            source.content = {"library": list(range(i))}
+            publisher.request()
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.15)
+        await publisher.stop()
+
+    asyncio.run(scenario())
+    assert source.published == [{"library": list(range(9))}]
+    stats = publisher.stats()
+    assert stats["requests"] == 10 and stats["published"] == 1
+    assert stats["last_cid"] == "cid-1" and stats["last_lag"] is not None
+
+
+def test_unchanged_content_is_not_republished():
+    source = Source()
+    publisher = DebouncedPublisher("test", source.snapshot, source.publish, debounce=0.01)
+
+    async def scenario():
+        publisher.request()
+        await asyncio.sleep(0.05)
+        publisher.request()  # e.g. like then unlike
+        await asyncio.sleep(0.05)
+        await publisher.stop()
+
+    asyncio.run(scenario())
+    assert len(source.published) == 1
+    assert publisher.stats()["unchanged"] == 1
+
+
+def test_max_delay_caps_a_continuous_stream():
+    source = Source()
+    publisher = DebouncedPublisher("test", source.snapshot, source.publish, debounce=0.05, max_delay=0.1)
+
+    async def scenario():
+        for i in range(30):
+            source.content = {"n": i}
+            publisher.request()
+            await asyncio.sleep(0.01)
+        await publisher.stop()
+
+    asyncio.run(scenario())
+    # Requests never paused for the debounce window, yet publishes still went out
+    assert len(source.published) >= 2
+
+
+def test_failed_publish_is_retried():
+    source = Source()
+    outcomes = [RuntimeError("ipfs down"), None]
+
+    def flaky_publish(snapshot):
+        if outcomes:
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return source.publish(snapshot)
+
+    publisher = DebouncedPublisher("test", source.snapshot, flaky_publish, debounce=0.01, retry_delay=0.02)
+
+    async def scenario():
+        source.content = {"library": [1]}
+        publisher.request()
+        await asyncio.sleep(0.03)
+        assert publisher.stats()["pending"] and publisher.stats()["consecutive_failures"] == 1
+        await asyncio.sleep(0.2)
+        await publisher.stop()
+
+    asyncio.run(scenario())
+    assert source.published == [{"library": [1]}]
+    stats = publisher.stats()
+    assert stats["errors"] == 2 and stats["consecutive_failures"] == 0 and not stats["pending"]
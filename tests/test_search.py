@@ -0,0 +1,64 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+from utils.search import fts5_match, query_terms, search_posts, search_users, tsquery
+
+
+def _search(fn, text, limit=20, offset=0):
+    async def scenario():
+        conn = await database.get_async_db_connection()
+        try:
+            return await fn(conn, text, limit, offset)
+        finally:
+            await conn.close()
+    return asyncio.run(scenario())
+
+
+def test_query_translation():
+    assert query_terms("  Café, \"drop\" table; ") == ["café", "drop", "table"]
+    assert fts5_match(["caf", "vid"]) == '"caf"* "vid"*'
+    assert tsquery(["caf", "vid"]) == "caf:* & vid:*"
+
+
+def test_posts_ranked_prefix_search_tracks_writes(temp_db):
+    conn = database.get_db_connection()
+    conn.executemany(
+        "INSERT INTO posts (id, name, description, author, filename, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            ("bafy1", "Holiday video", "beach", "alice", "holiday.mp4", "2024-01-01"),
+            ("bafy2", "Notes", "some holiday plans", "bob", "notes.md", "2024-01-02"),
+            ("bafy3", "Recipes", "soup", "carol", "soup.pdf", "2024-01-03"),
+        ],
+    )
+    conn.commit()
+
+    page, more = _search(search_posts, "holi")
+    assert [p["id"] for p in page] == ["bafy1", "bafy2"]  # title match outranks description
+    assert not more and "rank" not in page[0]
+
+    page, more = _search(search_posts, "holi", limit=1)
+    assert [p["id"] for p in page] == ["bafy1"] and more
+    assert [p["id"] for p in _search(search_posts, "holi", limit=1, offset=1)[0]] == ["bafy2"]
+
+    conn.execute("UPDATE posts SET name = 'Soup video' WHERE id = 'bafy3'")
+    conn.execute("DELETE FROM posts WHERE id = 'bafy1'")
+    conn.commit()
+    conn.close()
+    assert [p["id"] for p in _search(search_posts, "video")[0]] == ["bafy3"]
+    assert [p["id"] for p in _search(search_posts, "bafy2")[0]] == ["bafy2"]  # exact cid
+
+
+def test_users_search_and_existing_rows_are_indexed(temp_db):
+    conn = database.get_db_connection()
+    conn.execute("INSERT INTO users (peer_id, username, handle) VALUES ('did:ipfs:a', 'Marguerite', 'marg')")
+    conn.execute("DROP TABLE users_fts")
+    conn.commit()
+    conn.close()
+    database.init_db()  # recreated and rebuilt from the existing row
+
+    assert [u["peer_id"] for u in _search(search_users, "MARG")[0]] == ["did:ipfs:a"]
+    assert [u["peer_id"] for u in _search(search_users, "did:ipfs:a")[0]] == ["did:ipfs:a"]
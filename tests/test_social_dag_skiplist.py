@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from utils.social_dag import SocialDAG, get_skip_height
+
+
+class MemoryRPC:
+    """Content store standing in for the IPFS DAG API; counts fetches."""
+
+    def __init__(self):
+        self.nodes = {}
+        self.gets = 0
+
+    async def dag_put(self, data):
+        cid = f"bafy{len(self.nodes)}"
+        self.nodes[cid] = json.loads(json.dumps(data))
+        return cid
+
+    async def dag_get(self, cid):
+        self.gets += 1
+        return json.loads(json.dumps(self.nodes[cid]))
+
+    async def name_publish(self, cid):
+        return "self"
+
+
+def _build_feed(rpc, count, legacy=0):
+    """`legacy` v2.0 posts first (no index), then v2.1 posts on top."""
+    async def build():
+        dag = SocialDAG(rpc)
+        head = None
+        for i in range(count):
+            if i < legacy:
+                head = await rpc.dag_put({"version": "2.0", "type": "social_post",
+                                          "timestamp": f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}",
+                                          "data": {"n": i}, "prev": head})
+            else:
+                head = await dag.create_post({"n": i}, head)
+                rpc.nodes[head]["timestamp"] = f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}"
+        # Rewrite skip_timestamp to match the pinned test timestamps
+        for node in rpc.nodes.values():
+            if node.get("skip"):
+                node["skip_timestamp"] = rpc.nodes[node["skip"]]["timestamp"]
+        return head
+    return asyncio.run(build())
+
+
+def test_skip_heights_point_backwards():
+    for h in range(2, 2000):
+        assert 0 <= get_skip_height(h) < h
+
+
+def test_offset_seek_is_logarithmic():
+    rpc = MemoryRPC()
+    head = _build_feed(rpc, 1000)
+    dag = SocialDAG(rpc)
+
+    rpc.gets = 0
+    posts = asyncio.run(dag.traverse_feed(head, limit=3, offset=900))
+    assert [p["n"] for p in posts] == [99, 98, 97]
+    assert rpc.gets < 60  # a linear walk would be ~900 fetches
+
+
+def test_before_seek_finds_first_older_post():
+    rpc = MemoryRPC()
+    head = _build_feed(rpc, 600)
+    dag = SocialDAG(rpc)
+
+    rpc.gets = 0
+    posts = asyncio.run(dag.traverse_feed(head, limit=2, before="2024-01-01 00:02:00"))
+    assert [p["n"] for p in posts] == [119, 118]
+    assert rpc.gets < 100
+
+
+def test_legacy_chain_is_still_readable():
+    rpc = MemoryRPC()
+    head = _build_feed(rpc, 40, legacy=30)
+    dag = SocialDAG(rpc)
+
+    assert rpc.nodes[head]["height"] == 9
+    assert [p["n"] for p in asyncio.run(dag.traverse_feed(head, limit=50))] == list(range(39, -1, -1))
+    assert [p["n"] for p in asyncio.run(dag.traverse_feed(head, limit=2, offset=15))] == [24, 23]
+
+
+class SlowRPC(MemoryRPC):
+    def __init__(self):
+        super().__init__()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def dag_get(self, cid):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            return await super().dag_get(cid)
+        finally:
+            self.in_flight -= 1
+
+
+def test_walk_prefetches_listed_ancestors():
+    rpc = SlowRPC()
+    head = _build_feed(rpc, 30)
+    dag = SocialDAG(rpc)
+
+    async def first_ten():
+        return [p["n"] async for p in dag.iter_feed(head, limit=10)]
+
+    rpc.gets = 0
+    assert asyncio.run(first_ten()) == list(range(29, 19, -1))
+    assert rpc.max_in_flight > 1
+    assert rpc.gets == 10  # nothing fetched twice, nothing past the limit
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+from utils.streams import StreamRegistry, notifications_since, sse_frame
+
+
+def test_only_connected_streams_buffer_and_each_tab_gets_events():
+    registry = StreamRegistry(buffer_size=10)
+    assert registry.deliver("did:alice", {"type": "like"}) == 0  # nobody connected: nothing kept
+
+    tab1, tab2 = registry.subscribe("did:alice"), registry.subscribe("did:alice")
+    assert registry.deliver("did:alice", {"type": "like"}) == 2
+
+    async def scenario():
+        return await tab1.next_batch(1), await tab2.next_batch(1), await tab1.next_batch(0.01)
+
+    first, second, empty = asyncio.run(scenario())
+    assert first == second == [{"type": "like"}] and empty == []
+    assert registry.stats()["streams"] == 2 and registry.stats()["users"] == 1
+
+    registry.unsubscribe(tab1)
+    registry.unsubscribe(tab2)
+    assert not registry.is_connected("did:alice")
+    assert registry.stats() == {"delivered": 2, "dropped": 0, "undeliverable": 1, "streams": 0, "users": 0}
+
+
+def test_bursts_coalesce_and_full_buffers_drop_oldest():
+    registry = StreamRegistry(buffer_size=3)
+    sub = registry.subscribe("did:alice")
+    registry.deliver("did:alice", {"type": "unread", "unread": 1})
+    registry.deliver("did:alice", {"type": "comment", "id": 1})
+    registry.deliver("did:alice", {"type": "unread", "unread": 2})  # replaces the queued unread
+    registry.deliver("did:alice", {"type": "comment", "id": 2})
+    registry.deliver("did:alice", {"type": "comment", "id": 3})  # buffer full: oldest goes
+
+    batch = asyncio.run(sub.next_batch(1))
+    assert batch == [{"type": "unread", "unread": 2}, {"type": "comment", "id": 2}, {"type": "comment", "id": 3}]
+    assert sub.dropped == 1 and registry.stats()["dropped"] == 1
+
+
+def test_replay_returns_only_missed_notifications(temp_db):
+    conn = database.get_db_connection()
+    for did, title in [("did:alice", "a1"), ("did:bob", "b1"), ("did:alice", "a2"), ("did:alice", "a3")]:
+        conn.execute(
+            "INSERT INTO notifications (user_peer_id, type, title, message, link, timestamp) VALUES (?, 'like', ?, '', '', '')",
+            (did, title),
+        )
+    conn.commit()
+    conn.close()
+
+    def since(last_id, limit):
+        async def scenario():
+            aconn = await database.get_async_db_connection()
+            try:
+                return await notifications_since(aconn, "did:alice", last_id, limit)
+            finally:
+                await aconn.close()
+        return asyncio.run(scenario())
+
+    events, complete = since(1, 10)
+    assert [e["title"] for e in events] == ["a2", "a3"] and complete
+    assert [e["id"] for e in events] == [3, 4]
+    events, complete = since(0, 2)
+    assert [e["title"] for e in events] == ["a1", "a2"] and not complete
+    assert since(4, 10) == ([], True)
+
+
+def test_sse_frames_carry_notification_ids():
+    assert sse_frame({"id": 7, "type": "like"}) == 'id: 7\ndata: {"id": 7, "type": "like"}\n\n'
+    assert sse_frame({"type": "unread", "unread": 1}) == 'data: {"type": "unread", "unread": 1}\n\n'
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+import main
+from utils.discovery import DiscoveryHub
+from utils.feed_engine import FeedEngine
+from utils.timeline import TimelineStore
+
+
+class FakeRPC:
+    async def name_resolve(self, peer_id):
+        return f"root-{peer_id}"
+
+
+class FakeDAG:
+    def __init__(self, feeds):
+        self.feeds = feeds
+        self.walked = 0
+
+    async def iter_feed(self, head_cid, limit=None):
+        for post in self.feeds.get(head_cid.replace("root-", ""), [])[:limit]:
+            self.walked += 1
+            yield dict(post)
+
+    async def traverse_feed(self, head_cid, limit=20):
+        return [p async for p in self.iter_feed(head_cid, limit)]
+
+
+def _setup(feeds):
+    conn = database.get_db_connection()
+    for user in ("alice", "bob"):
+        conn.execute(
+            "INSERT INTO following (user_peer_id, following_peer_id, username) VALUES (?, ?, ?)",
+            (user, "did:ipfs:carol", "carol"),
+        )
+    conn.commit()
+    conn.close()
+
+    dag = FakeDAG(feeds)
+    return dag, TimelineStore(dag, database.get_db_connection, FeedEngine(FakeRPC(), dag))
+
+
+def _timeline(user):
+    conn = database.get_db_connection()
+    rows = conn.execute(
+        "SELECT post_cid, author_peer_id FROM timeline WHERE user_peer_id = ? ORDER BY timestamp DESC", (user,)
+    ).fetchall()
+    conn.close()
+    return [(r["post_cid"], r["author_peer_id"]) for r in rows]
+
+
+def test_ingest_stops_at_known_posts(temp_db):
+    posts = [{"cid": f"p{i}", "timestamp": f"2024-01-{i:02d}"} for i in range(30, 0, -1)]
+    feeds = {"carol": posts[1:]}
+    dag, store = _setup(feeds)
+
+    # Pubsub announces the bare peer id; followers stored the did:ipfs: form
+    assert asyncio.run(store.ingest_root("carol", "root-carol")) == 2 * 29
+    assert _timeline("alice")[0] == ("p29", "did:ipfs:carol")
+
+    feeds["carol"] = posts
+    dag.walked = 0
+    asyncio.run(store.ingest_root("carol", "root-carol"))
+    assert [cid for cid, _ in _timeline("bob")][:2] == ["p30", "p29"]
+    assert dag.walked == 2  # the new post, then the first known one
+
+
+def test_backfill_only_missing_then_rebuild(temp_db):
+    feeds = {"carol": [{"cid": "c2", "timestamp": "2024-01-02"}, {"cid": "c1", "timestamp": "2024-01-01"}]}
+    _, store = _setup(feeds)
+
+    assert asyncio.run(store.backfill()) == {"peers": 1, "rows": 4}
+    assert asyncio.run(store.backfill()) == {"peers": 0, "rows": 0}
+
+    assert asyncio.run(store.rebuild("alice")) == {"peers": 1, "rows": 2}
+    assert [cid for cid, _ in _timeline("alice")] == ["c2", "c1"]
+
+
+def test_feed_update_only_from_the_announcing_node(temp_db, monkeypatch):
+    feeds = {"carol": [{"cid": "c1", "timestamp": "2024-01-01"}]}
+    dag, store = _setup(feeds)
+    hub = DiscoveryHub(FakeRPC(), dag, database.get_db_connection, timeline=store)
+
+    # What _job_feed_pubsub publishes from carol's node
+    published = []
+
+    class AnnouncingRPC:
+        async def pubsub_pub(self, topic, data):
+            published.append(json.loads(data))
+
+    monkeypatch.setattr(main, "rpc_client", AnnouncingRPC())
+    monkeypatch.setattr(main, "social_dag", dag)
+    monkeypatch.setattr(main, "get_my_peer_id", lambda: "carol")
+    asyncio.run(main._job_feed_pubsub({"peer_id": "did:key:zCarol", "new_root": "root-carol", "post_cid": "c1"}))
+    announcement = published[0]
+
+    # Relayed by another node, it is ignored entirely
+    asyncio.run(hub.handle_feed_update({**announcement, "_from_peer_id": "mallory"}))
+    assert _timeline("alice") == []
+    conn = database.get_db_connection()
+    assert conn.execute("SELECT 1 FROM discovered_peers WHERE peer_id = 'did:key:zCarol'").fetchone() is None
+    conn.close()
+
+    asyncio.run(hub.handle_feed_update({**announcement, "_from_peer_id": "carol"}))
+    assert _timeline("alice") == [("c1", "did:ipfs:carol")]
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+from utils.unread import UnreadCounters
+
+
+def _get(counters, party):
+    async def scenario():
+        conn = await database.get_async_db_connection()
+        try:
+            return await counters.get(conn, party)
+        finally:
+            await conn.close()
+    return asyncio.run(scenario())
+
+
+def _chat(conn, sender, receiver, is_read=0):
+    conn.execute(
+        "INSERT INTO messages (sender_uuid7, receiver_uuid7, text, timestamp, is_read) VALUES (?, ?, 'hi', '2024-01-01', ?)",
+        (sender, receiver, is_read),
+    )
+
+
+def test_totals_load_from_conversations_and_adjust_in_place(temp_db):
+    conn = database.get_db_connection()
+    _chat(conn, "u-bob", "u-al")
+    _chat(conn, "u-bob", "u-al")
+    _chat(conn, "u-cy", "u-al")
+    _chat(conn, "u-cy", "u-al", is_read=1)
+    _chat(conn, "u-al", "u-bob")
+    conn.commit()
+
+    counters = UnreadCounters()
+    assert counters.adjust("u-al", 1) is None  # not cached yet
+    assert _get(counters, "u-al") == 3
+    assert _get(counters, "u-bob") == 1
+
+    # Served from memory: a write this process didn't report isn't seen...
+    _chat(conn, "u-cy", "u-al")
+    conn.commit()
+    assert _get(counters, "u-al") == 3
+    assert counters.adjust("u-al", 1) == 4
+    assert counters.adjust("u-al", -10) == 0
+    assert counters.stats()["hits"] == 1 and counters.stats()["loads"] == 2
+
+    # ...until the total expires and is re-read from the database
+    counters.ttl = 0
+    assert _get(counters, "u-al") == 4
+    conn.close()
+
+
+def test_least_recently_used_totals_are_dropped(temp_db):
+    counters = UnreadCounters(max_entries=2)
+    for party in ("a", "b", "c"):
+        _get(counters, party)
+    assert counters.adjust("a", 1) is None
+    assert counters.adjust("c", 1) == 1
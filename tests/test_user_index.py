@@ -0,0 +1,75 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import database
+from utils.user_index import UserPrefixIndex
+
+
+@pytest.fixture
+def users(temp_db):
+    conn = database.get_db_connection()
+    conn.executemany(
+        "INSERT INTO users (peer_id, did, uuid7, username, handle) VALUES (?, ?, ?, ?, ?)",
+        [
+            ("did:a", "did:a", "0190aaaa", "Alice", "@alice"),
+            ("did:b", "did:b", "0190bbbb", "Alfred", "@alf"),
+            ("did:c", "did:c", "0190cccc", "Carol", "@carol"),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _search(index, prefix, limit=20, offset=0):
+    async def scenario():
+        conn = await database.get_async_db_connection()
+        try:
+            return await index.search(conn, prefix, limit, offset)
+        finally:
+            await conn.close()
+    return asyncio.run(scenario())
+
+
+def test_prefix_match_dedups_and_pages(users):
+    index = UserPrefixIndex(database.get_db_connection)
+
+    page, more = _search(index, "AL")
+    assert [u["peer_id"] for u in page] == ["did:b", "did:a"]  # "alf" < "alfred" < "alice"
+    assert not more and page[1]["username"] == "Alice"
+
+    page, more = _search(index, "al", limit=1)
+    assert [u["peer_id"] for u in page] == ["did:b"] and more
+    assert [u["peer_id"] for u in _search(index, "al", limit=1, offset=1)[0]] == ["did:a"]
+
+    assert [u["peer_id"] for u in _search(index, "@car")[0]] == ["did:c"]
+    assert [u["peer_id"] for u in _search(index, "0190c")[0]] == ["did:c"]
+    assert _search(index, "zed") == ([], False)
+    assert index.size() == 3
+
+
+def test_upsert_and_remove_patch_the_index(users):
+    index = UserPrefixIndex(database.get_db_connection)
+    index.load()
+
+    index.upsert("did:c", "Alicia", "@alicia", "0190cccc")
+    assert index.match("ali", 10) == (["did:a", "did:c"], False)
+    assert index.match("car", 10) == ([], False)
+
+    index.remove("did:a")
+    assert index.match("ali", 10) == (["did:c"], False)
+    assert index.size() == 2
+
+
+def test_falls_back_to_sql_past_max_users(users):
+    index = UserPrefixIndex(database.get_db_connection, max_users=2)
+
+    page, more = _search(index, "al")
+    assert not index.enabled and index.size() is None
+    assert [u["username"] for u in page] == ["Alfred", "Alice"] and not more
+    assert [u["peer_id"] for u in _search(index, "0190c")[0]] == ["did:c"]
+    assert index.stats()["sql_lookups"] == 2